@@ -14,7 +14,10 @@ import os
 import logging
 import numpy as np
 from torch.autograd import Variable
-from skimage.metrics import structural_similarity as ssim
+import sys
+# shared image quality assessment of the SCI models (in `[utils]` of the repo)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '[utils]'))
+from sci_metrics import (psnr, ssim)
 from os.path import join as opj
 import cv2
 
@@ -133,24 +136,12 @@ def test(test_path, epoch, result_path, logger):
             out_pic2 = rnn2(out_pic1, meas, mask, h1, meas_re, block_size, Cr)        #  out_pic1[:, fn-1, :, :]
         
         # calculate psnr and ssim
-            psnr_1 = 0
-            psnr_2 = 0
-            ssim_1 = 0
-            ssim_2 = 0
-
-            for ii in range(meas.shape[0] * Cr):
-                out_pic_forward = out_pic1[ii // Cr, ii % Cr, :, :]
-                out_pic_backward = out_pic2[ii // Cr, ii % Cr, :, :]
-                gt_t = pic_gt[ii // Cr, ii % Cr, :, :]
-                mse_forward = loss(out_pic_forward * 255, gt_t * 255)
-                mse_forward = mse_forward.data
-                mse_backward = loss(out_pic_backward * 255, gt_t * 255)
-                mse_backward = mse_backward.data
-                psnr_1 += 10 * torch.log10(255 * 255 / mse_forward)
-                psnr_2 += 10 * torch.log10(255 * 255 / mse_backward)
-
-                ssim_1 += ssim(out_pic_forward.cpu().numpy(), gt_t.cpu().numpy())
-                ssim_2 += ssim(out_pic_backward.cpu().numpy(), gt_t.cpu().numpy())
+            # frame-wise PSNR and SSIM of all the frames at once on the GPU, with
+            # the data range skimage assumes for float images (2) in the SSIM
+            psnr_1 = psnr(pic_gt * 255, out_pic1 * 255, 255.).sum()
+            psnr_2 = psnr(pic_gt * 255, out_pic2 * 255, 255.).sum()
+            ssim_1 = ssim(pic_gt, out_pic1, 2.).sum().item()
+            ssim_2 = ssim(pic_gt, out_pic2, 2.).sum().item()
 
             psnr_1 = psnr_1 / (meas.shape[0] * Cr)
             psnr_2 = psnr_2 / (meas.shape[0] * Cr)
@@ -1,11 +1,16 @@
+import os
+import sys
 import numpy as np
-from skimage.metrics import structural_similarity as ssim
-from skimage.metrics import peak_signal_noise_ratio as psnr
+
+# shared image quality assessment of the SCI models (in `[utils]` of the repo)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '[utils]'))
+from sci_metrics import (psnr, ssim)
+
 def cal_psnrssim(img_gt,img_hat):
     """[summary]
 
     Args:
-        img_gt ([type]): H W C
+        img_gt ([type]): H W C (or H W)
         img_hat ([type]): [description]
 
     Returns:
@@ -13,6 +18,7 @@ def cal_psnrssim(img_gt,img_hat):
     """
     # img_hat=img_hat*img_gt.mean()/img_hat.mean()
     # H,W,C=img_gt.shape
-    img_hat_psnr=psnr(img_gt,img_hat,data_range=img_gt.max())
-    img_hat_ssim = ssim(img_gt,img_hat,data_range=img_gt.max(),multichannel=True)
+    channel_axis = -1 if img_gt.ndim > 2 else None
+    img_hat_psnr = psnr(img_gt,img_hat,data_range=img_gt.max(),channel_axis=channel_axis)
+    img_hat_ssim = ssim(img_gt,img_hat,data_range=img_gt.max(),channel_axis=channel_axis)
     return img_hat_psnr,img_hat_ssim
@@ -189,17 +189,17 @@ def gap_denoise_bayer_demosaic(y_bayer, Phi_bayer, _lambda=1, accelerate=True,
                 xall[...,1] = xrgb4[...,1] # G2=G1 channel (average over two)
                 xall[...,3] = xrgb4[...,0] # B  channel (average over two)
             elif denoiser.lower() == 'ffdnet_color_demosaic':
-                x_rgb = np.zeros([nrow, ncol, 3,nmask], dtype=np.float32)
                 for ib in range(len(bayer)): 
                     b = bayer[ib]
                     x_bayer[b[0]::2, b[1]::2] = xall[...,ib]
-                for imask in range(nmask):
-                    if demosaic_method.lower == 'bilinear':
-                        x_rgb[:,:,:,imask] = demosaicing_CFA_Bayer_bilinear(x_bayer[:,:,imask])
-                    elif demosaic_method.lower == 'malvar2004':
-                        x_rgb[:,:,:,imask] = demosaicing_CFA_Bayer_Malvar2004(x_bayer[:,:,imask])
-                    else:
-                        x_rgb[:,:,:,imask] = demosaicing_CFA_Bayer_Menon2007(x_bayer[:,:,imask]) #cv2.cvtColor(np.uint8(np.clip(x_bayer[:,:,imask],0,1)*255), cv2.COLOR_BAYER_RG2BGR)
+                # all the frames demosaiced at once (H x W x F x 3)
+                if demosaic_method.lower == 'bilinear':
+                    x_rgb = demosaicing_CFA_Bayer_bilinear(x_bayer)
+                elif demosaic_method.lower == 'malvar2004':
+                    x_rgb = demosaicing_CFA_Bayer_Malvar2004(x_bayer)
+                else:
+                    x_rgb = demosaicing_CFA_Bayer_Menon2007(x_bayer) #cv2.cvtColor(np.uint8(np.clip(x_bayer[:,:,imask],0,1)*255), cv2.COLOR_BAYER_RG2BGR)
+                x_rgb = np.float32(x_rgb.transpose(0,1,3,2)) # H x W x 3 x F
                 xbgr3 = ffdnet_rgb_denoise(x_rgb, nsig,model)
                 #xbgr4 = np.transpose(xbgr3,(0,1,3,2))
                 xall[...,0] = xbgr3[0::2,0::2,0,:] # R  channel (average over two)
@@ -228,17 +228,17 @@ def gap_denoise_bayer_demosaic(y_bayer, Phi_bayer, _lambda=1, accelerate=True,
                 xall[...,1] = xrgb1[...,1] # G2=G1 channel (average over two)
                 xall[...,3] = xrgb1[...,2] # B  channel (average over two)
             elif denoiser.lower() == 'fastdvdnet_demosaic': # FastDVDnet video denoising
-                x_rgb = np.zeros([nrow, ncol, nmask, 3], dtype=np.float32)
                 for ib in range(len(bayer)): 
                     b = bayer[ib]
                     x_bayer[b[0]::2, b[1]::2] = xall[...,ib]
-                for imask in range(nmask):
-                    if demosaic_method.lower == 'bilinear':
-                        x_rgb[:,:,imask,:] = demosaicing_CFA_Bayer_bilinear(x_bayer[:,:,imask])
-                    elif demosaic_method.lower == 'malvar2004':
-                        x_rgb[:,:,imask,:] = demosaicing_CFA_Bayer_Malvar2004(x_bayer[:,:,imask])
-                    else:
-                        x_rgb[:,:,imask,:] = demosaicing_CFA_Bayer_Menon2007(x_bayer[:,:,imask])
+                # all the frames demosaiced at once (H x W x F x 3)
+                if demosaic_method.lower == 'bilinear':
+                    x_rgb = demosaicing_CFA_Bayer_bilinear(x_bayer)
+                elif demosaic_method.lower == 'malvar2004':
+                    x_rgb = demosaicing_CFA_Bayer_Malvar2004(x_bayer)
+                else:
+                    x_rgb = demosaicing_CFA_Bayer_Menon2007(x_bayer)
+                x_rgb = np.float32(x_rgb)
                 xrgb1 = fastdvdnet_denoiser(x_rgb, nsig, model)
                 #xrgb1 = np.single(xrgb1)//255;
                 xall[...,0] = xrgb1[0::2,0::2,:,0] # R  channel (average over two)
@@ -464,12 +464,11 @@ def gap_denoise_bayer(y_bayer, Phi_bayer, _lambda=1, accelerate=True,
                 xall[...,1] = xrgb4[...,1] # G2=G1 channel (average over two)
                 xall[...,3] = xrgb4[...,0] # B  channel (average over two)
             elif denoiser.lower() == 'ffdnet_color_demosaic':
-                x_rgb = np.zeros([nrow, ncol, 3,nmask], dtype=np.float32)
                 for ib in range(len(bayer)): 
                     b = bayer[ib]
                     x_bayer[b[0]::2, b[1]::2] = xall[...,ib]
-                for imask in range(nmask):
-                    x_rgb[:,:,:,imask] = demosaicing_CFA_Bayer_Menon2007(x_bayer[:,:,imask]) #cv2.cvtColor(np.uint8(np.clip(x_bayer[:,:,imask],0,1)*255), cv2.COLOR_BAYER_RG2BGR)
+                # all the frames demosaiced at once (H x W x F x 3 to H x W x 3 x F)
+                x_rgb = np.float32(demosaicing_CFA_Bayer_Menon2007(x_bayer).transpose(0,1,3,2)) #cv2.cvtColor(np.uint8(np.clip(x_bayer[:,:,imask],0,1)*255), cv2.COLOR_BAYER_RG2BGR)
                 xbgr3 = ffdnet_rgb_denoise(x_rgb, nsig,model)
                 #xbgr4 = np.transpose(xbgr3,(0,1,3,2))
                 xall[...,0] = xbgr3[0::2,0::2,0,:] # R  channel (average over two)
@@ -498,15 +497,12 @@ def gap_denoise_bayer(y_bayer, Phi_bayer, _lambda=1, accelerate=True,
                 xall[...,1] = xrgb1[...,1] # G2=G1 channel (average over two)
                 xall[...,3] = xrgb1[...,2] # B  channel (average over two)
             elif denoiser.lower() == 'fastdvdnet_demosaic': # FastDVDnet video denoising
-                x_rgb = np.zeros([nrow, ncol, nmask, 3], dtype=np.float32)
                 for ib in range(len(bayer)): 
                     b = bayer[ib]
                     x_bayer[b[0]::2, b[1]::2] = xall[...,ib]
-                for imask in range(nmask):
-                    #plt.subplot(2, 4, nt+1)
-                  # plt.imshow(orig_bayer[:,:,nt], cmap=plt.cm.gray, vmin=0, vmax=1)
                 #    x_rgb[:,:,nt,:] = cv2.cvtColor(np.uint8(x_bayer[:,:,nt]*255), cv2.COLOR_BAYER_RG2BGR)
-                    x_rgb[:,:,imask,:] = demosaicing_CFA_Bayer_Menon2007(x_bayer[:,:,imask])
+                # all the frames demosaiced at once (H x W x F x 3)
+                x_rgb = np.float32(demosaicing_CFA_Bayer_Menon2007(x_bayer))
                 # # option 1 - run denoising twice
                 # xrgb1 = xall[..., [0,1,3]] # R-G1-B (H x W x F x C)
                 # xrgb2 = xall[..., [0,2,3]] # R-G2-B (H x W x F x C)
@@ -0,0 +1,236 @@
+''' Plug-and-play (PnP) denoisers '''
+import inspect
+from collections import OrderedDict
+import numpy as np
+from tv_denoisers import (denoise_tv_cham, denoise_tv_fgp)
+from utils import (batch2frames, frames2batch, seq_denoise, is_tensor, lazy_function)
+
+# skimage and the deep denoisers (torch) are imported when first requested
+denoise_tv_chambolle = lazy_function('skimage.restoration', 'denoise_tv_chambolle')
+denoise_wavelet = lazy_function('skimage.restoration', 'denoise_wavelet')
+ffdnet_vdenoiser = lazy_function('packages.ffdnet.test_ffdnet_ipol', 'ffdnet_vdenoiser')
+ffdnet_tensor_denoiser = lazy_function('packages.ffdnet.test_ffdnet_ipol', 'ffdnet_tensor_denoiser')
+load_ffdnet = lazy_function('packages.ffdnet.test_ffdnet_ipol', 'load_ffdnet')
+fastdvdnet_denoiser = lazy_function('packages.fastdvdnet.test_fastdvdnet', 'fastdvdnet_denoiser')
+fastdvdnet_tensor_denoiser = lazy_function('packages.fastdvdnet.test_fastdvdnet', 'fastdvdnet_tensor_denoiser')
+load_fastdvdnet = lazy_function('packages.fastdvdnet.test_fastdvdnet', 'load_fastdvdnet')
+
+_registry = {}  # denoiser classes, keyed by name
+_instances = OrderedDict() # process-wide cache of the denoiser instances
+_max_instances = 8 # least recently used ones evicted beyond this number
+
+def register_denoiser(name):
+    '''
+    Class decorator registering a denoiser under `name` for `get_denoiser`.
+    '''
+    def decorator(cls):
+        _registry[name.lower()] = cls
+        return cls
+    return decorator
+
+def _hashable(value):
+    try:
+        hash(value)
+        return value
+    except TypeError: # lists, ndarrays, ...
+        return repr(value)
+
+def get_denoiser(name, **params):
+    '''
+    Get the denoiser registered as `name` (case-insensitive), i.e., 'tv',
+    'wavelet', 'ffdnet', 'fastdvdnet', 'tv+ffdnet' or 'tv+fastdvdnet'.
+
+    The denoiser is created only once per process for the same parameters
+    and the same (resident) instance is handed to all the following calls,
+    keeping the `_max_instances` most recently used ones (e.g., along a 
+    sweep of `tv_weight`, each with its own workspace buffers).
+    The parameters not taken by the denoiser are ignored, so that the
+    solvers can pass all their denoising parameters for every denoiser.
+    '''
+    cls = _registry.get(name.lower())
+    if cls is None:
+        raise ValueError('Unsupported denoiser {}!'.format(name))
+    accepted = inspect.signature(cls).parameters
+    params = {key: val for key, val in params.items() if key in accepted}
+    key = (name.lower(), tuple(sorted((k, _hashable(v)) for k, v in params.items())))
+    if key in _instances:
+        _instances.move_to_end(key)
+    else:
+        _instances[key] = cls(**params)
+        while len(_instances) > _max_instances:
+            _instances.popitem(last=False)
+    return _instances[key]
+
+class Denoiser:
+    '''
+    Base class of the plug-and-play denoisers with a uniform call
+    `denoise(x, sigma)` on an H x W x nmask (x C) volume `x`, where `sigma` is
+    the noise standard deviation of the current iteration (None for noise
+    estimation or for denoisers without a noise level).
+
+    The torch tensors (of the torch backend of the solvers) are denoised by
+    `denoise_tensor` on their device, through NumPy (a host round trip) for
+    the denoisers without a native tensor path (`tensor = False`).
+    '''
+    temporal = False # True for video denoisers using the neighbouring frames
+    tensor = False   # True for denoisers running on torch tensors
+
+    def denoise(self, x, sigma=None):
+        raise NotImplementedError
+
+    def denoise_tensor(self, x, sigma=None):
+        import torch
+        out = self.denoise(x.detach().cpu().numpy(), sigma)
+        return torch.from_numpy(np.ascontiguousarray(out)).to(x)
+
+    def __call__(self, x, sigma=None, nbatch=0):
+        '''
+        Denoise `x` (an array or a torch tensor), or a batch of `nbatch` 
+        reconstructions (B x H x W x nmask) at once in the frame-stacked 
+        layout (see `utils.batch2frames`).
+        '''
+        denoise = self.denoise_tensor if is_tensor(x) else self.denoise
+        if not nbatch:
+            return denoise(x, sigma)
+        x = batch2frames(x)
+        if self.temporal: # no temporal window across the coded frame blocks
+            x = seq_denoise(denoise, x, nbatch, sigma)
+        else:
+            x = denoise(x, sigma)
+        return frames2batch(x, nbatch)
+
+@register_denoiser('tv')
+class TVDenoiser(Denoiser):
+    '''
+    Total variation (TV) denoising, where `tvm` selects the TV denoiser
+    'tv_chambolle' of skimage or the native vectorized ones
+    {'ATV_cham', 'ATV_FGP', 'ITV2D_cham', 'ITV2D_FGP', 'ITV3D_cham', 
+    'ITV3D_FGP'} (see `tv_denoisers`), i.e., anisotropic, frame-wise 
+    isotropic or frame-coupled isotropic TV with Chambolle's algorithm or
+    the fast gradient projection (FGP).
+    '''
+    tvms = ('tv_chambolle', 'ATV_cham', 'ATV_FGP', 'ITV2D_cham', 'ITV2D_FGP', 
+            'ITV3D_cham', 'ITV3D_FGP')
+
+    def __init__(self, tv_weight=0.1, tv_iter_max=5, multichannel=True,
+                 tvm='tv_chambolle'):
+        if tvm not in self.tvms:
+            raise ValueError('Unsupported TV denoiser {}!'.format(tvm))
+        self.tv_weight = tv_weight
+        self.tv_iter_max = tv_iter_max
+        self.multichannel = multichannel
+        self.tvm = tvm
+        # ITV3D couples the frames, so not across the coded frame blocks
+        self.temporal = tvm.startswith('ITV3D')
+        self._ws = {} # workspace buffers of the native TV denoisers
+
+    def denoise(self, x, sigma=None):
+        if self.tvm == 'tv_chambolle':
+            return denoise_tv_chambolle(x, self.tv_weight, n_iter_max=self.tv_iter_max,
+                                        multichannel=self.multichannel)
+        (tv, meth) = self.tvm.split('_')
+        tv_denoise = denoise_tv_fgp if meth == 'FGP' else denoise_tv_cham
+        return tv_denoise(x, self.tv_weight, n_iter_max=self.tv_iter_max, tv=tv,
+                          ws=self._ws)
+
+@register_denoiser('wavelet')
+class WaveletDenoiser(Denoiser):
+    '''
+    Wavelet denoising, with noise estimation if `noise_estimate` is enabled
+    or `sigma` is None.
+    '''
+    def __init__(self, noise_estimate=False, multichannel=True):
+        self.noise_estimate = noise_estimate
+        self.multichannel = multichannel
+
+    def denoise(self, x, sigma=None):
+        if self.noise_estimate or sigma is None: # noise estimation enabled
+            return denoise_wavelet(x, multichannel=self.multichannel)
+        return denoise_wavelet(x, sigma=sigma, multichannel=self.multichannel)
+
+@register_denoiser('ffdnet')
+class FFDNetDenoiser(Denoiser):
+    '''
+    FFDNet frame-wise video denoising, with the pretrained `model` (loaded
+    once by `load_ffdnet` if None) kept resident, on the GPU if `useGPU` (if
+    available when None).
+    '''
+    tensor = True
+
+    def __init__(self, model=None, useGPU=None):
+        if model is None:
+            model = load_ffdnet(useGPU=useGPU)
+        self.model = model
+        self.useGPU = useGPU
+
+    def denoise(self, x, sigma=None):
+        return ffdnet_vdenoiser(x, sigma, self.model, useGPU=self.useGPU)
+
+    def denoise_tensor(self, x, sigma=None):
+        return ffdnet_tensor_denoiser(x, sigma, self.model)
+
+@register_denoiser('fastdvdnet')
+class FastDVDnetDenoiser(Denoiser):
+    '''
+    FastDVDnet grayscale video denoising, with the pretrained `model` (loaded
+    once by `load_fastdvdnet` if None) kept resident, on the GPU if `useGPU`
+    (if available when None). The temporal windows of all the frames are
+    denoised in micro-batches of `window_batch` windows (all at once if None).
+    '''
+    temporal = True
+    tensor = True
+
+    def __init__(self, model=None, useGPU=None, window_batch=None):
+        if model is None:
+            model = load_fastdvdnet(gray=True, useGPU=useGPU)
+        self.model = model
+        self.useGPU = useGPU
+        self.window_batch = window_batch
+
+    def denoise(self, x, sigma=None):
+        return fastdvdnet_denoiser(x, sigma, self.model, useGPU=self.useGPU,
+                                   gray=True, batch_size=self.window_batch)
+
+    def denoise_tensor(self, x, sigma=None):
+        return fastdvdnet_tensor_denoiser(x, sigma, self.model, gray=True,
+                                          batch_size=self.window_batch)
+
+class CompositeDenoiser(Denoiser):
+    '''
+    Multistep denoising, applying the denoisers one after another with the
+    same `sigma`.
+    '''
+    def __init__(self, *denoisers):
+        self.denoisers = denoisers
+        self.temporal = any(d.temporal for d in denoisers)
+        self.tensor = all(d.tensor for d in denoisers)
+
+    def denoise(self, x, sigma=None):
+        for d in self.denoisers:
+            x = d.denoise(x, sigma)
+        return x
+
+    def denoise_tensor(self, x, sigma=None):
+        for d in self.denoisers:
+            x = d.denoise_tensor(x, sigma)
+        return x
+
+@register_denoiser('tv+ffdnet')
+class TVFFDNetDenoiser(CompositeDenoiser):
+    '''
+    TV denoising followed by FFDNet frame-wise video denoising.
+    '''
+    def __init__(self, tv_weight=0.1, tv_iter_max=5, multichannel=True,
+                 tvm='tv_chambolle', model=None, useGPU=None):
+        super().__init__(TVDenoiser(tv_weight, tv_iter_max, multichannel, tvm),
+                         FFDNetDenoiser(model, useGPU))
+
+@register_denoiser('tv+fastdvdnet')
+class TVFastDVDnetDenoiser(CompositeDenoiser):
+    '''
+    TV denoising followed by FastDVDnet video denoising.
+    '''
+    def __init__(self, tv_weight=0.1, tv_iter_max=5, multichannel=True,
+                 tvm='tv_chambolle', model=None, useGPU=None, window_batch=None):
+        super().__init__(TVDenoiser(tv_weight, tv_iter_max, multichannel, tvm),
+                         FastDVDnetDenoiser(model, useGPU, window_batch))
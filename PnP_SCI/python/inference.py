@@ -0,0 +1,372 @@
+''' Inference backends of the plug-and-play (PnP) deep denoisers
+
+The pretrained FFDNet and FastDVDnet models run as eager PyTorch modules by
+default. `export_denoiser` freezes a model for a fixed frame size into a
+TorchScript module ('torchscript') or an ONNX graph ('onnx', exported with
+`torch.onnx` and run with ONNX Runtime, both optional dependencies), checked
+for numerical parity against the eager model, and `load_denoiser` loads it
+back for the CPU with a given number of threads. The loaded `FrozenDenoiser`
+takes the place of the eager `model` of the solvers, e.g.,
+
+    model = load_ffdnet(useGPU=False)
+    model = export_denoiser(model, (256, 256, 8), 'ffdnet_256x256x8.onnx',
+                            backend='onnx', threads=8)
+    admmdenoise_cacti(meas, mask, A, At, denoiser='ffdnet', model=model, ...)
+
+where the frame size (H, W, F) is the one of the reconstruction, i.e., the
+F frames of FFDNet or the F temporal windows of FastDVDnet (`window_batch`)
+of each forward pass. Only H x W is frozen, while the number of frames (the
+batch axis of the forward pass) stays dynamic, e.g., for the last (smaller)
+micro-batch of the windows or the B*F frames of the batched solvers.
+
+For CPU-only runs, `quantize_denoiser` trades some accuracy for speed with
+the post-training static int8 quantization of the model ('int8'), calibrated
+on the denoiser inputs of a float32 reconstruction recorded by
+`CalibrationRecorder`, or the bfloat16 autocast of the model ('bf16'), and
+`quantization_report` measures the PSNR deltas and the speedups of the
+denoising against float32 on a benchmark scene.
+'''
+import os
+import copy
+import json
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from packages.ffdnet.models import FFDNet
+from packages.ffdnet.network_ffdnet import FFDNet as FFDNetRGB
+from packages.fastdvdnet.models import FastDVDnet
+
+BACKENDS = ('torchscript', 'onnx')
+QUANT_MODES = ('int8', 'bf16')
+
+class _TraceableFFDNet(nn.Module):
+    '''
+    FFDNet with the de-interleaving of its input and output (the custom
+    autograd functions of `packages.ffdnet.functions`, which cannot be
+    exported) as the equivalent pixel (un)shuffle, sharing the weights of
+    the FFDNet `model`.
+    '''
+    def __init__(self, model):
+        super().__init__()
+        self.intermediate_dncnn = model.intermediate_dncnn
+
+    def forward(self, x, noise_sigma):
+        (N, C, H, W) = x.shape
+        noise_map = noise_sigma.view(N, 1, 1, 1).expand(N, C, H//2, W//2)
+        h = self.intermediate_dncnn(torch.cat((noise_map, F.pixel_unshuffle(x, 2)), 1))
+        return F.pixel_shuffle(h, 2)
+
+def _unwrap(model):
+    '''
+    Eager module of `model` (without the DataParallel wrapper) on the CPU,
+    a copy (leaving `model` on its device).
+    '''
+    if isinstance(model, nn.DataParallel):
+        model = model.module
+    return copy.deepcopy(model).cpu().eval()
+
+def example_inputs(model, shape, sigma=25/255):
+    '''
+    Random inputs of the forward pass of the denoiser `model` for the frame
+    size `shape` (H, W, F), i.e., F frames (FFDNet) or the F temporal
+    windows (FastDVDnet) of H x W at the noise level `sigma`.
+    '''
+    (H, W, nframe) = shape
+    gen = torch.Generator().manual_seed(0)
+    if isinstance(model, FastDVDnet): # padded to multiples of 4 (see `denoise_windows`)
+        (Hp, Wp) = (H + (-H)%4, W + (-W)%4)
+        C = model.num_color_channels
+        x = torch.rand((nframe, model.num_input_frames*C, Hp, Wp), generator=gen)
+        return (x, torch.full((nframe, 1, Hp, Wp), sigma))
+    if isinstance(model, FFDNet):
+        C = model.num_input_channels
+        return (torch.rand((nframe, C, H, W), generator=gen), torch.full((nframe,), sigma))
+    if isinstance(model, FFDNetRGB): # noise level map of N x 1 x 1 x 1
+        head = next(m for m in model.modules() if isinstance(m, nn.Conv2d))
+        C = (head.in_channels-1)//4 # de-interleaved input and noise map
+        return (torch.rand((nframe, C, H, W), generator=gen), torch.full((nframe, 1, 1, 1), sigma))
+    raise ValueError('Unsupported denoiser model {}!'.format(type(model).__name__))
+
+def check_parity(reference, model, inputs, rtol=1e-4, atol=1e-4):
+    '''
+    Check the output of the (frozen) denoiser `model` against the eager
+    `reference` on the same `inputs`, raising a RuntimeError if any element
+    differs by more than `atol + rtol*|reference|`.
+
+    Returns
+    -------
+    err : float
+        Maximum absolute difference of the outputs.
+    '''
+    with torch.no_grad():
+        ref = reference(*inputs)
+        out = model(*inputs)
+    diff = (out - ref).abs()
+    err = float(diff.max())
+    if bool((diff > atol + rtol*ref.abs()).any()):
+        raise RuntimeError('Frozen denoiser differs from the eager model by up to '
+                           '{:.3g} (atol {:g}, rtol {:g}).'.format(err, atol, rtol))
+    return err
+
+class FrozenDenoiser:
+    '''
+    Denoiser frozen for a fixed frame size H x W by `export_denoiser` (or
+    for any frame size by `quantize_denoiser`), a drop-in replacement of the
+    eager `model` of the solvers (run on the CPU), i.e., called with the
+    same inputs (of the exported shapes, but for any batch size) as the
+    model.
+
+    Parameters
+    ----------
+    runner : callable
+        Forward pass of the backend, taking and returning torch tensors.
+    shapes : list of tuples or None
+        Shapes of the inputs of the exported forward pass (any if None),
+        where the leading (batch) axis is dynamic.
+    backend : str
+        Name of the backend, 'torchscript', 'onnx', 'float32', 'int8' or
+        'bf16'.
+    source : str or object, optional
+        Exported file, or the eager model (and the calibration samples) of
+        the denoiser, identifying it together with `backend` in the keys of
+        the stage cache (see `utils.StageCache`).
+    '''
+    def __init__(self, runner, shapes, backend, source=None):
+        self.runner = runner
+        self.shapes = None if shapes is None else [tuple(shape) for shape in shapes]
+        self.backend = backend
+        self.source = source
+
+    def eval(self):
+        return self
+
+    def __call__(self, *inputs):
+        shapes = [tuple(x.shape) for x in inputs]
+        if self.shapes is not None and [shape[1:] for shape in shapes] != \
+                [shape[1:] for shape in self.shapes]: # any batch size
+            raise ValueError('{} denoiser exported for inputs of {}, called with {}.'
+                             .format(self.backend, self.shapes, shapes))
+        device = inputs[0].device
+        return self.runner(*(x.cpu() for x in inputs)).to(device)
+
+def export_denoiser(model, shape, path, backend='torchscript', threads=None,
+                    check=True, rtol=1e-4, atol=1e-4):
+    '''
+    Freeze the pretrained denoiser `model` (FFDNet or FastDVDnet) for the
+    frame size `shape` (H, W, F) into the TorchScript module or the ONNX
+    graph `path`, and load it back for inference (see `load_denoiser`).
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        Eager model (wrapped in DataParallel or not).
+    shape : tuple
+        Frame size (H, W, F) of each forward pass of the solvers.
+    path : str
+        Output file of the frozen denoiser.
+    backend : {'torchscript', 'onnx'}, optional
+        Inference backend.
+    threads : int, optional
+        Number of CPU threads of the backend (see `load_denoiser`).
+    check : bool, optional
+        Check the numerical parity of the frozen denoiser against the eager
+        model (see `check_parity`).
+
+    Returns
+    -------
+    model : FrozenDenoiser
+        Frozen denoiser loaded from `path`.
+    '''
+    if backend not in BACKENDS:
+        raise ValueError('Unsupported inference backend {}!'.format(backend))
+    eager = _unwrap(model)
+    traceable = _TraceableFFDNet(eager).eval() if isinstance(eager, FFDNet) else eager
+    inputs = example_inputs(eager, shape)
+    with torch.no_grad():
+        if backend == 'torchscript':
+            frozen = torch.jit.freeze(torch.jit.trace(traceable, inputs))
+            torch.jit.save(frozen, path, _extra_files={
+                'shapes.json': json.dumps([list(x.shape) for x in inputs])})
+        else: # ONNX
+            torch.onnx.export(traceable, inputs, path, input_names=['x', 'sigma'],
+                              output_names=['out'], dynamic_axes={
+                                  name: {0: 'batch'} for name in ('x', 'sigma', 'out')})
+    frozen = load_denoiser(path, backend, threads)
+    if check:
+        err = check_parity(eager, frozen, inputs, rtol, atol)
+        print('{} denoiser {} exported, max deviation {:.3g}.'.format(backend,
+              os.path.basename(path), err))
+    return frozen
+
+def load_denoiser(path, backend=None, threads=None):
+    '''
+    Load the frozen denoiser `path` exported by `export_denoiser` for the
+    CPU, where `backend` is inferred from the file extension ('.onnx' for
+    ONNX Runtime, TorchScript otherwise) if None and `threads` sets the
+    number of intra-op threads (the default of the backend if None).
+
+    Returns
+    -------
+    model : FrozenDenoiser
+        Frozen denoiser.
+    '''
+    if backend is None:
+        backend = 'onnx' if path.endswith('.onnx') else 'torchscript'
+    if backend == 'torchscript':
+        if threads is not None:
+            torch.set_num_threads(threads)
+        files = {'shapes.json': ''}
+        module = torch.jit.load(path, map_location='cpu', _extra_files=files)
+        module = torch.jit.optimize_for_inference(module)
+        def runner(*inputs):
+            with torch.no_grad():
+                return module(*inputs)
+        return FrozenDenoiser(runner, json.loads(files['shapes.json']), backend, path)
+    if backend == 'onnx':
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads is not None:
+            options.intra_op_num_threads = threads
+        session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        names = [arg.name for arg in session.get_inputs()]
+        def runner(*inputs):
+            feed = {name: np.ascontiguousarray(x.numpy(), dtype=np.float32)
+                    for (name, x) in zip(names, inputs)}
+            return torch.from_numpy(session.run(None, feed)[0])
+        return FrozenDenoiser(runner, [arg.shape for arg in session.get_inputs()], backend, path)
+    raise ValueError('Unsupported inference backend {}!'.format(backend))
+
+class CalibrationRecorder:
+    '''
+    Denoiser `model` recording its inputs for the calibration of the int8
+    quantization (see `quantize_denoiser`), a drop-in replacement of the
+    `model` of the solvers, run unchanged. The inputs of every `every`-th
+    call are kept on the CPU, up to `max_samples` of them, i.e., the
+    intermediate iterates of the SCI reconstruction at the noise levels of
+    its denoising steps.
+    '''
+    def __init__(self, model, every=1, max_samples=16):
+        self.model = model
+        self.every = every
+        self.max_samples = max_samples
+        self.samples = []
+        self.ncall = 0
+
+    def eval(self):
+        self.model.eval()
+        return self
+
+    def __call__(self, *inputs):
+        if self.ncall % self.every == 0 and len(self.samples) < self.max_samples:
+            self.samples.append(tuple(x.detach().cpu().clone() for x in inputs))
+        self.ncall += 1
+        return self.model(*inputs)
+
+def _quantized_engine():
+    '''
+    Quantized engine of the int8 kernels of this CPU, 'x86' (or 'fbgemm' of
+    the older versions of PyTorch) and 'qnnpack' otherwise (ARM).
+    '''
+    engines = torch.backends.quantized.supported_engines
+    for engine in ('x86', 'fbgemm', 'qnnpack'):
+        if engine in engines:
+            return engine
+    raise RuntimeError('No quantized engine available on this CPU!')
+
+def quantize_denoiser(model, mode='int8', samples=None, engine=None):
+    '''
+    Quantized CPU inference of the pretrained denoiser `model` (FFDNet or
+    FastDVDnet), either the post-training static int8 quantization ('int8',
+    FX graph mode with per-channel weights) calibrated on the recorded input
+    `samples` of the model (see `CalibrationRecorder`), or the bfloat16
+    autocast of the float32 model ('bf16', which needs no calibration).
+
+    Parameters
+    ----------
+    model : torch.nn.Module
+        Eager model (wrapped in DataParallel or not).
+    mode : {'int8', 'bf16'}, optional
+        Quantization mode.
+    samples : list of tuples of tensors, optional
+        Calibration inputs of the model (required for 'int8').
+    engine : str, optional
+        Quantized engine of the int8 kernels ('x86', 'fbgemm' or 'qnnpack',
+        the one of this CPU if None).
+
+    Returns
+    -------
+    model : FrozenDenoiser
+        Quantized denoiser, for any frame size.
+    '''
+    eager = _unwrap(model)
+    if mode == 'bf16':
+        def runner(*inputs):
+            with torch.no_grad(), torch.autocast('cpu', dtype=torch.bfloat16):
+                return eager(*inputs).float()
+        return FrozenDenoiser(runner, None, mode, eager)
+    if mode != 'int8':
+        raise ValueError('Unsupported quantization mode {}!'.format(mode))
+    if not samples:
+        raise ValueError('The int8 quantization requires calibration samples '
+                         '(see CalibrationRecorder).')
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import (prepare_fx, convert_fx)
+    if engine is None:
+        engine = _quantized_engine()
+    torch.backends.quantized.engine = engine
+    traceable = _TraceableFFDNet(eager).eval() if isinstance(eager, FFDNet) else eager
+    with torch.no_grad():
+        prepared = prepare_fx(traceable, get_default_qconfig_mapping(engine), samples[0])
+        for inputs in samples: # calibration of the activation ranges
+            prepared(*inputs)
+        quantized = convert_fx(prepared)
+    def runner(*inputs):
+        with torch.no_grad():
+            return quantized(*inputs)
+    return FrozenDenoiser(runner, None, mode, (eager, engine, samples))
+
+def quantization_report(data, test_algo_flag, model, modes=QUANT_MODES,
+                        calib_data=None, every=1, max_samples=16, **args):
+    '''
+    PSNR deltas and speedups of the quantized denoisers (see
+    `quantize_denoiser`) against float32, all on the CPU, for the
+    reconstruction of the benchmark scene `data` (meas, mask, orig, see
+    `sweep.load_simu_data`) with the algorithm `test_algo_flag` and the
+    parameters `args` of `sweep.pnp_recon`. The int8 quantization is
+    calibrated on the denoiser inputs of the float32 reconstruction of
+    `calib_data` (`data` if None), recorded by `CalibrationRecorder`.
+
+    Returns
+    -------
+    table : list of dicts
+        'mode', mean 'psnr', 'dpsnr' against float32, denoising time
+        't_denoise' and its 'speedup' against float32 of each mode.
+    '''
+    from sweep import (pnp_recon, print_table)
+    from utils import Profiler
+    eager = _unwrap(model)
+    def fp32(*inputs):
+        with torch.no_grad():
+            return eager(*inputs)
+    def run(mode, model, data):
+        profiler = Profiler()
+        res = pnp_recon(data, test_algo_flag, model=model, callback=profiler,
+                        show_iqa=False, **args)
+        return dict(mode=mode, psnr=res['psnr'],
+                    t_denoise=profiler.summary()['time']['denoise'])
+    reference = FrozenDenoiser(fp32, None, 'float32', eager)
+    recorder = CalibrationRecorder(reference, every, max_samples)
+    if calib_data is None:
+        table = [run('float32', recorder, data)]
+    else:
+        run('float32', recorder, calib_data)
+        table = [run('float32', reference, data)]
+    for mode in modes:
+        table.append(run(mode, quantize_denoiser(model, mode, recorder.samples), data))
+    for record in table:
+        record['dpsnr'] = record['psnr'] - table[0]['psnr']
+        record['speedup'] = table[0]['t_denoise'] / max(record['t_denoise'], 1e-12)
+    print_table(table, ['mode', 'psnr', 'dpsnr', 't_denoise', 'speedup'])
+    return table
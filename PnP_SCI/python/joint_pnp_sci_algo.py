@@ -1,69 +1,166 @@
 import time
+_t0 = time.perf_counter()
 import math
-import skimage
 import numpy as np
-from skimage.restoration import (denoise_tv_chambolle, denoise_tv_bregman, 
-                                 denoise_bilateral, denoise_wavelet, estimate_sigma)
+from denoisers import get_denoiser
+from pnp_sci_algo import (_frame_iqa, _solve_stats)
+from utils import (A_, At_, psnr, SCIOperator, parallel_map, EarlyStopping, DtypePolicy,
+                   StageCache, IterationHooks, IQAMonitor,
+                   lazy_function, record_import)
+# skimage and the deep denoisers (torch) are imported on their first call
+denoise_tv_chambolle = lazy_function('skimage.restoration', 'denoise_tv_chambolle')
 # from packages.vnlnet.test import vnlnet
-from packages.ffdnet.test_ffdnet_ipol import ffdnet_vdenoiser
-from packages.fastdvdnet.test_fastdvdnet import fastdvdnet_denoiser
-from utils import (A_, At_, psnr)
-if skimage.__version__ < '0.18':
-    from skimage.measure import (compare_psnr, compare_ssim)
-else: # skimage.measure deprecated in version 0.18 ( -> skimage.metrics )
-    from skimage.metrics import peak_signal_noise_ratio as compare_psnr
-    from skimage.metrics import structural_similarity   as compare_ssim
+ffdnet_vdenoiser = lazy_function('packages.ffdnet.test_ffdnet_ipol', 'ffdnet_vdenoiser')
+fastdvdnet_denoiser = lazy_function('packages.fastdvdnet.test_fastdvdnet', 'fastdvdnet_denoiser')
 
 
 
+def _cached_stage(solver, y, Phi_sum, A, At, cache=None, **args):
+    '''
+    Run the stage `solver`, or load its results from the stage cache `cache`
+    (see `utils.StageCache`) if already run on the same measurements `y`, 
+    the same masks (probed as `At(1)`) and the same parameters.
+    '''
+    if cache is None:
+        return solver(y, Phi_sum, A, At, **args)
+    stats = args.pop('stats', None)
+    params = {key: val for key, val in args.items() if key != 'operator'}
+    try:
+        key = cache.key(y, At(np.ones_like(y)), solver=solver.__name__, **params)
+    except TypeError as e: # parameters not identified by their content
+        print('Stage {} not cached: {}'.format(solver.__name__, e))
+        return solver(y, Phi_sum, A, At, stats=stats, **args)
+    entry = cache.load(key)
+    if entry is None:
+        stats_s = {}
+        x, psnr_, ssim_, psnr_all = solver(y, Phi_sum, A, At, stats=stats_s, **args)
+        cache.save(key, x=x, psnr=psnr_, ssim=ssim_, psnrall=psnr_all, 
+                   iters=stats_s.get('iters', []))
+    else:
+        print('Stage {} loaded from the cache {}.'.format(solver.__name__, key[:8]))
+        x = entry['x']
+        (psnr_, ssim_, psnr_all) = (entry[name].tolist() for name in ('psnr', 'ssim', 'psnrall'))
+        stats_s = {'iters': entry['iters'].tolist()}
+    if stats is not None:
+        stats.setdefault('iters', []).extend(stats_s.get('iters', []))
+    return x, psnr_, ssim_, psnr_all
+
 # joint admm(gap) denosie cacti (including gap)
 def joint_admmdenoise_cacti(meas, mask, A, At, projmeth='admm', v0=None, orig=None, 
                       iframe=0, nframe=1, MAXB=1., maskdirection='plain', denoiser='tv',
-                      iter_max1=50, iter_max2=50, sigma1 = None, sigma2=None, **args):
+                      iter_max1=50, iter_max2=50, sigma1 = None, sigma2=None, 
+                      batch=False, workers=1, **args):
     '''
     Alternating direction method of multipliers (ADMM) or generalized 
     alternating projection (GAP) -based denoising (based on the 
     plug-and-play (PnP) framework) algorithms for video snapshot compressive
     imaging (SCI) or coded aperture compressive temporal imaging (CACTI, 
     Llull et al. Opt. Express 2013).
+
+    With `batch=True`, all the `nframe` coded frames are reconstructed at once
+    as a batch of measurements (nframe x H x W) sharing the same masks, where
+    `A` and `At` are replaced by the batched forward model `SCIOperator(mask)`.
+
+    With `workers > 1`, the coded frames are sharded across a pool of 
+    `workers` processes (see `utils.parallel_map`), where the masks and the
+    preloaded denoiser `model` are handed to each worker only once. The 
+    workers rebuild the forward model from the masks (see `_solve_stats`), 
+    i.e., `A` and `At` are only called in this process. With CUDA models 
+    (or the torch backend on the GPU), the workers are spawned instead of 
+    forked (see `utils.parallel_map`), i.e., each worker loads the model 
+    onto the GPU again.
+
+    With the early termination tolerances (`tol_res`, `tol_rel`, see 
+    `gap_denoise`), the number of iterations actually used of each sigma 
+    stage (of both periods) is appended for each coded frame to 
+    `stats['iters']` if a `stats` dict is given.
+
+    All the coded frames are reconstructed in the data type policy `dtype`
+    (float32 by default, see `gap_denoise` and `utils.DtypePolicy`).
+
+    With `cache` (a `utils.StageCache` or its directory), the results of 
+    both periods are cached on disk (see `gap_joint_denoise`).
+
+    The per-iteration profiling hooks `callback` (see `utils.IterationHooks`)
+    are called by the solver of each coded frame, i.e., in the worker 
+    processes with `workers > 1`.
     '''
     nrow, ncol, nmask = mask.shape
-    x_ = np.zeros((nrow,ncol,nmask*nframe), dtype=np.float32)
+    stats = args.pop('stats', None)
+    if isinstance(args.get('cache'), str): # cache directory
+        args['cache'] = StageCache(args['cache'])
+    policy = DtypePolicy.get(args.get('dtype', np.float32))
+    mask = policy(mask)
+    if projmeth.lower() == 'admm': # alternating direction method of multipliers (ADMM)-based projection
+        solver = admm_joint_denoise
+    elif projmeth.lower() == 'gap': # generalized alternating projection (GAP)-based projection
+        solver = gap_joint_denoise
+    else:
+        raise ValueError('Unsupported projection method %s' % projmeth.upper())
+
+    mask_sum = np.sum(mask, axis=2)
+    mask_sum[mask_sum==0] = 1
+    x_ = np.zeros((nrow,ncol,nmask*nframe), dtype=policy.dtype)
     psnr_, ssim_, psnrall_ = ([], [], [])
-    begin_time = time.time()
-    # loop over all the coded frames [nframe]
+    meas_, orig_, v0_, flip_ = ([], [], [], [])
     for kf in range(nframe):
-        print('\n=== %s-%s Reconstruction coded frame block %2d of %2d ==='
-              %(projmeth.upper(), denoiser.upper(), kf+1, nframe))
         if orig is not None:
-            orig_k = orig[:,:,(kf+iframe)*nmask:(kf+iframe+1)*nmask]/MAXB
+            orig_.append(orig[:,:,(kf+iframe)*nmask:(kf+iframe+1)*nmask]/MAXB)
         else:
-            orig_k = None
-        meas_k = meas[:,:,kf+iframe]/MAXB
+            orig_.append(None)
+        meas_.append(policy(meas[:,:,kf+iframe]/MAXB))
+        # direction of the masks [up as calibration]
+        flip_.append((maskdirection.lower() == 'updown' and (kf+iframe) % 2 == 1) or \
+                     (maskdirection.lower() == 'downup' and (kf+iframe) % 2 == 0))  # down (up as mask)
         if v0 is None:
-            v0_k = None
-        else: # initialization according to the direction of the masks [up as calibration]
+            v0_.append(None)
+        else: # initialization according to the direction of the masks
             v0_k = v0[:,:,kf*nmask:(kf+1)*nmask]
-            if (maskdirection.lower() == 'updown' and (kf+iframe) % 2 == 1) or \
-               (maskdirection.lower() == 'downup' and (kf+iframe) % 2 == 0):  # down (up as mask)
-               v0_k = v0_k[:,:,::-1]
-
-        mask_sum = np.sum(mask, axis=2)
-        mask_sum[mask_sum==0] = 1
-        if projmeth.lower() == 'admm': # alternating direction method of multipliers (ADMM)-based projection
-            x_k, psnr_k, ssim_k, psnrall_k = admm_joint_denoise(meas_k, mask_sum, A, At, x0=v0_k, X_orig=orig_k, 
-                                                                denoiser=denoiser, iter_max1=iter_max1, 
-                                                                iter_max2=iter_max2, sigma1 = sigma1, sigma2=sigma2, **args)
-
-        elif projmeth.lower() == 'gap': # generalized alternating projection (GAP)-based projection
-            x_k, psnr_k, ssim_k, psnrall_k =  gap_joint_denoise(meas_k, mask_sum, A, At, x0=v0_k, X_orig=orig_k, 
-                                                                denoiser=denoiser, iter_max1=iter_max1, 
-                                                                iter_max2=iter_max2, sigma1 = sigma1, sigma2=sigma2, **args)
+            v0_.append(v0_k[:,:,::-1] if flip_[kf] else v0_k)
+
+    stats_b = {}
+    begin_time = time.time()
+    if batch: # reconstruct all the coded frames at once [nframe x H x W x nmask]
+        print('\n=== %s-%s Reconstruction coded frame blocks 1-%d as a batch ==='
+              %(projmeth.upper(), denoiser.upper(), nframe))
+        operator = SCIOperator(mask)
+        x_b, psnr_b, ssim_b, psnrall_b = solver(np.stack(meas_), operator.Phi_sum, 
+                                                operator.forward, operator.adjoint, 
+                                                x0=None if v0 is None else np.stack(v0_), 
+                                                X_orig=None if orig is None else np.stack(orig_), 
+                                                denoiser=denoiser, iter_max1=iter_max1, 
+                                                iter_max2=iter_max2, sigma1 = sigma1, sigma2=sigma2, 
+                                                stats=stats_b, **args)
+    elif workers > 1: # shard the coded frames across a process pool
+        print('\n=== %s-%s Reconstruction of %2d coded frame blocks with %d workers ==='
+              %(projmeth.upper(), denoiser.upper(), nframe, workers))
+        res_ = parallel_map(_solve_stats, [dict(y=meas_[kf], x0=v0_[kf], X_orig=orig_[kf])
+                                           for kf in range(nframe)], workers=workers,
+                            solver=solver, Phi_sum=mask_sum, mask=mask, denoiser=denoiser, 
+                            iter_max1=iter_max1, iter_max2=iter_max2, 
+                            sigma1=sigma1, sigma2=sigma2, **args)
+    # loop over all the coded frames [nframe]
+    for kf in range(nframe):
+        if batch:
+            x_k = x_b[kf]
+            psnr_k = psnr_b[kf] if psnr_b else []
+            ssim_k = ssim_b[kf] if ssim_b else []
+            psnrall_k = [psnr_it[kf] for psnr_it in psnrall_b]
+            stats_k = stats_b
+        elif workers > 1:
+            ((x_k, psnr_k, ssim_k, psnrall_k), stats_k), t_k = res_[kf]
+            print('=== %s-%s coded frame block %2d of %2d finished in %.1f seconds ==='
+                  %(projmeth.upper(), denoiser.upper(), kf+1, nframe, t_k))
         else:
-            print('Unsupported projection method %s' % projmeth.upper())
+            print('\n=== %s-%s Reconstruction coded frame block %2d of %2d ==='
+                  %(projmeth.upper(), denoiser.upper(), kf+1, nframe))
+            stats_k = {}
+            x_k, psnr_k, ssim_k, psnrall_k = solver(meas_[kf], mask_sum, A, At, x0=v0_[kf], X_orig=orig_[kf], 
+                                                    denoiser=denoiser, iter_max1=iter_max1, 
+                                                    iter_max2=iter_max2, sigma1 = sigma1, sigma2=sigma2, 
+                                                    stats=stats_k, **args)
         
-        if (maskdirection.lower() == 'updown' and (kf+iframe) % 2 == 1) or \
-           (maskdirection.lower() == 'downup' and (kf+iframe) % 2 == 0):   # down (up as mask)
+        if flip_[kf]:   # down (up as mask)
             x_k = x_k[:,:,::-1]
             psnr_k = psnr_k[::-1]
             ssim_k = ssim_k[::-1]
@@ -74,6 +171,8 @@ def joint_admmdenoise_cacti(meas, mask, A, At, projmeth='admm', v0=None, orig=No
         psnr_.extend(psnr_k)
         ssim_.extend(ssim_k)
         psnrall_.append(psnrall_k)
+        if stats is not None:
+            stats.setdefault('iters', []).append(stats_k.get('iters', []))
         
     return x_, t_, psnr_, ssim_, psnrall_
 
@@ -82,16 +181,20 @@ def admm_joint_denoise(y, Phi_sum, A, At, x0=None, X_orig=None, denoiser='tv+ffd
                       iter_max1=50, iter_max2=50, sigma1 = None, sigma2=None, **args):
     '''
     ADMM-based joint denoise: multi period and multi step denoise
-    
+
+    With a stage cache `cache` (see `utils.StageCache`), the results of both
+    periods are cached and loaded instead of recomputed for the same 
+    measurements, masks and parameters of the period, e.g., the first period
+    shared by a sweep over `sigma2` and `iter_max2`.
     '''
     # [1] 1st period denoising: gaptv_denoising
     print('*** 1st period denoising ***')
-    x, psnr, ssim, psnrall =  admm_denoise(y, Phi_sum, A, At, x0=x0, 
+    x, psnr, ssim, psnrall =  _cached_stage(admm_denoise, y, Phi_sum, A, At, x0=x0, 
                                            X_orig=X_orig, denoiser='tv', iter_max=iter_max1, sigma=sigma1, **args)  
     
     # [2] 2nd period denoising: gap tv+ffdnet multistep denoising
     print('*** 2nd period denoising ***')
-    x, psnr, ssim, psnrall =  admm_multistep_denoise(y, Phi_sum, A, At, 
+    x, psnr, ssim, psnrall =  _cached_stage(admm_multistep_denoise, y, Phi_sum, A, At, 
                                           x0=x, X_orig=X_orig, denoiser=denoiser,iter_max=iter_max2,sigma = sigma2,**args) 
 
     return x, psnr, ssim, psnrall
@@ -101,30 +204,38 @@ def gap_joint_denoise(y, Phi_sum, A, At, x0=None, X_orig=None, denoiser='tv+ffdn
                       iter_max1=50, iter_max2=50, sigma1 = None, sigma2=None, **args):
     '''
     GAP-based joint denoise: multi period and multi step denoise
-    
+
+    With a stage cache `cache` (see `utils.StageCache`), the results of both
+    periods are cached and loaded instead of recomputed for the same 
+    measurements, masks and parameters of the period, e.g., the first period
+    shared by a sweep over `sigma2` and `iter_max2`.
     '''
     # [1] 1st period denoising: gaptv_denoising
     print('*** 1st period denoising ***')
-    x, psnr, ssim, psnrall =  gap_denoise(y, Phi_sum, A, At,x0=x0, 
+    x, psnr, ssim, psnrall =  _cached_stage(gap_denoise, y, Phi_sum, A, At,x0=x0, 
                                           X_orig=X_orig, denoiser='tv',iter_max=iter_max1,sigma = sigma1, **args)    
     
     # [2] 2nd period denoising: gap tv+ffdnet multistep denoising
     print('*** 2nd period denoising ***')
-    x, psnr, ssim, psnrall =  gap_multistep_denoise(y, Phi_sum, A, At, x0=x, 
+    x, psnr, ssim, psnrall =  _cached_stage(gap_multistep_denoise, y, Phi_sum, A, At, x0=x, 
                                           X_orig=X_orig, denoiser=denoiser,iter_max=iter_max2,sigma = sigma2,**args) 
 
     return x, psnr, ssim, psnrall
 
 def admm_multistep_denoise(y, Phi_sum, A, At, _lambda=1, gamma=0.0, accelerate=None,
                 denoiser='tv', iter_max=50, noise_estimate=False, sigma=None, 
-                tv_weight=0.1, tv_iter_max=5, multichannel=True, x0=None, model=None, X_orig=None, show_iqa=True, tvm='tv_chambolle'):
+                tv_weight=0.1, tv_iter_max=5, multichannel=True, x0=None, model=None, X_orig=None, show_iqa=True, tvm='tv_chambolle',
+                tol_res=None, tol_rel=None, patience=1, stats=None, callback=None,
+                iqa_every=1, window_batch=None, dtype=np.float32):
     '''
     ADMM-based multistep denoise
 
     Parameters
     ----------
     y : two-dimensional (2D) ndarray of ints, uints or floats
-        Input single measurement of the snapshot compressive imager (SCI).
+        Input single measurement of the snapshot compressive imager (SCI), or
+        a batch of measurements (B x H x W) sharing the same masks, with `A`
+        and `At` (or `operator`) taking the leading batch dimension.
     Phi : three-dimensional (3D) ndarray of ints, uints or floats, omitted
         Input sensing matrix of SCI with the third dimension as the 
         time-variant, spectral-variant, volume-variant, or angular-variant 
@@ -167,6 +278,34 @@ def admm_multistep_denoise(y, Phi_sum, A, At, _lambda=1, gamma=0.0, accelerate=N
     x0 : 3D ndarray 
         Start point (initialized value) for the iteration process of the 
         reconstruction.
+    tol_res : float, optional
+        Tolerance of the relative measurement residual ||y-A(x)||/||y|| for
+        the early termination of each sigma stage (see `utils.EarlyStopping`).
+    tol_rel : float, optional
+        Tolerance of the relative update ||x-x_prev||/||x_prev|| for the 
+        early termination of each sigma stage.
+    patience : int, optional
+        Number of consecutive iterations meeting the tolerances to stop a 
+        sigma stage and skip ahead to the next sigma level.
+    stats : dict, optional
+        Statistics of the reconstruction, where the number of iterations 
+        actually used of each sigma stage is appended to `stats['iters']`.
+    iqa_every : int, optional
+        Interval (in iterations) of the PSNR evaluation against `X_orig`
+        with `show_iqa`, done in a background thread on a snapshot of the
+        reconstruction, where the last iteration of each sigma stage is
+        always evaluated and `psnr_all` is the PSNR curve sampled at this
+        interval (see `utils.IQAMonitor`).
+    callback : callable or list of callables, optional
+        Per-iteration profiling hooks called with the timings of the 
+        projection, the denoising and the IQA, the residual norm, the sigma
+        stage and the memory high-water mark of each iteration (see 
+        `utils.IterationHooks`, and `utils.Profiler` for a built-in one).
+    dtype : data-type or DtypePolicy, optional
+        Data type policy of the reconstruction (see `utils.DtypePolicy`), 
+        float32 by default, e.g., `DtypePolicy(np.float32, storage=np.float16,
+        check=True)` for the float16 storage of the state arrays with the 
+        check of unintended upcasts.
 
     Returns
     -------
@@ -198,125 +337,95 @@ def admm_multistep_denoise(y, Phi_sum, A, At, _lambda=1, gamma=0.0, accelerate=N
     gap_denoise
     '''
     # [0] initialization
+    nbatch = y.shape[0] if y.ndim > 2 else 0 # batch of measurements (B x H x W)
+    policy = DtypePolicy.get(dtype) # compute (and storage) data type
+    y = policy(y)
     if x0 is None:
         x0 = At(y) # default start point (initialized value)
+        x0 = policy(x0, 'At')
+    x0 = policy(x0) # start point in the compute data type
     if not isinstance(sigma, list):
         sigma = [sigma]
     if not isinstance(iter_max, list):
         iter_max = [iter_max] * len(sigma)
     # [1] start iteration for reconstruction
     x = x0 # initialization
-    theta = x0
-    b = np.zeros_like(x0)
-    psnr_all = []
+    theta = policy.store(x0)
+    b = policy.store(np.zeros_like(x0))
+    # denoiser created once per process and kept resident (see `denoisers`)
+    denoise = get_denoiser(denoiser, tv_weight=tv_weight, tv_iter_max=tv_iter_max,
+                           multichannel=multichannel, tvm=tvm, noise_estimate=noise_estimate,
+                           model=model, window_batch=window_batch)
+    print(' --- {}_denoising ---'.format(denoiser.lower()))
+    # early termination of the sigma stages (disabled by default)
+    stopper = EarlyStopping(tol_res, tol_rel, patience, nbatch, stats)
+    # per-iteration profiling hooks (disabled without callback)
+    hooks = IterationHooks(callback, 'ADMM-'+denoiser.upper(), nbatch)
+    # throttled IQA in a background thread (disabled without X_orig)
+    iqa = IQAMonitor(X_orig, iqa_every, hooks.solver, nbatch, show_iqa, stats=stats)
     k = 0
     time_start = time.time() # timing
     print('---> gap_multistep_denoise')
     for idx, nsig in enumerate(sigma): # iterate all noise levels
+        stopper.start()
         for it in range(iter_max[idx]):
+            hooks.start()
+            (theta, b) = (policy(theta), policy(b)) # from storage
             # Euclidean projection
             yb = A(theta+b)
             x = (theta+b) + _lambda*(At((y-yb)/(Phi_sum+gamma))) # ADMM 
-            # switch denoiser 
-            if denoiser.lower() == 'tv+ffdnet': # total variation (TV) + ffdnet denoising
-                if idx== 0 and it==0:
-                    print(' --- tv+ffdnet_denoising ---')
-                    
-                # [.0] pre-denoise
-                # x = denoise_tv_chambolle(x, tv_weight, n_iter_max=tv_iter_max, multichannel=multichannel)
-                # [.1] denoise_step1: tv denoising
-                try:
-                    if tvm == 'tv_chambolle':
-                        theta = denoise_tv_chambolle(x-b, tv_weight, n_iter_max=tv_iter_max, multichannel=multichannel)
-                    elif tvm == 'tv_bregman':
-                        theta = denoise_tv_bregman(x-b, tv_weight, max_iter=tv_iter_max)
-                    elif tvm == 'ITV3D_FGP':
-                        theta = denoise_tv_chambolle(x-b, tv_weight, n_iter_max=tv_iter_max, multichannel=multichannel)
-                    elif tvm == 'ITV2D_cham':
-                        theta = denoise_tv_chambolle(x-b, tv_weight, n_iter_max=tv_iter_max, multichannel=multichannel)                  
-                    else:
-                        raise TypeError("no such tv denoiser")
-                except TypeError as e:
-                    print("Exception: ",repr(e))
-                  
-                # [.2] denoise_step2: ffdnet_denoising
-                theta = ffdnet_vdenoiser(theta, nsig, model)
-                # theta = ffdnet_vdenoiser(x-b, nsig, model)     
-                            
-            elif denoiser.lower() == 'tv+fastdvdnet':
-                if idx== 0 and it==0:
-                    print(' --- tv+fastdvdnet_denoising ---')
-                # [.0] pre-denoise
-                # x = denoise_tv_chambolle(x, tv_weight, n_iter_max=tv_iter_max, multichannel=multichannel)                
-                # [.1] denoise_step1: tv denoising
-                try:
-                    if tvm == 'tv_chambolle':
-                        theta = denoise_tv_chambolle(x-b, tv_weight, n_iter_max=tv_iter_max, multichannel=multichannel)
-                    elif tvm == 'tv_bregman':
-                        theta = denoise_tv_bregman(x-b, tv_weight, max_iter=tv_iter_max)
-                    elif tvm == 'ITV3D_FGP':
-                        theta = denoise_tv_chambolle(x-b, tv_weight, n_iter_max=tv_iter_max, multichannel=multichannel)
-                    elif tvm == 'ITV2D_cham':
-                        theta = denoise_tv_chambolle(x-b, tv_weight, n_iter_max=tv_iter_max, multichannel=multichannel)                  
-                    else:
-                        raise TypeError("no such tv denoiser")
-                except TypeError as e:
-                    print("Exception: ",repr(e))
-                  
-                # [.2] denoise_step2: ffdnet_denoising
-                theta = fastdvdnet_denoiser(theta, nsig, model, gray=True)
-                # theta = fastdvdnet_denoiser(x-b, nsig, model, gray=True)                  
-                    
-            else:
-                raise ValueError('Unsupported denoiser {}!'.format(denoiser))
+            x = policy(x, 'ADMM projection')
+            hooks.lap('proj')
+            # denoising [all the frames of the batch at once]
+            theta = policy(denoise(x-b, nsig, nbatch), 
+                           'Denoiser {}'.format(denoiser))
+            hooks.lap('denoise')
             
             theta = np.clip(theta,0,1) # [zzh]  this is optional, sometimes, when you are sure that theta \in [0 1], you can use this to compress the noise
             
             b = b - (x-theta) # update residual
+            hooks.lap('proj')
             
-            # [optional] calculate image quality assessment, i.e., PSNR for 
-            # every five iterations
-            if show_iqa and X_orig is not None:
-                psnr_all.append(psnr(X_orig, x))
-                if (k+1)%5 == 0:
-                    if not noise_estimate and nsig is not None:
-                        if nsig < 1:
-                            print('  ADMM-{0} iteration {1: 3d}, sigma {2: 3g}/255, ' 
-                              'PSNR {3:2.2f} dB.'.format(denoiser.upper(), 
-                               k+1, nsig*255, psnr_all[k]))
-                        else:
-                            print('  ADMM-{0} iteration {1: 3d}, sigma {2: 3g}, ' 
-                                'PSNR {3:2.2f} dB.'.format(denoiser.upper(), 
-                                k+1, nsig, psnr_all[k]))
-                    else:
-                        print('  ADMM-{0} iteration {1: 3d}, ' 
-                              'PSNR {2: 2.2f} dB.'.format(denoiser.upper(), 
-                               k+1, psnr_all[k]))
+            # [optional] image quality assessment, i.e., PSNR of every `iqa_every`
+            # iterations (in the background)
+            iqa(k, x, None if noise_estimate else nsig)
+            hooks.lap('iqa')
+            hooks(k, idx, nsig, y, yb)
             k = k+1
+            if stopper(x, y, yb) and it+1 < iter_max[idx]: # stage converged
+                print('  ADMM-{0} sigma stage {1} of {2} converged after '
+                      '{3} of {4} iterations.'.format(denoiser.upper(), 
+                      idx+1, len(sigma), it+1, iter_max[idx]))
+                break
+            (theta, b) = map(policy.store, (theta, b)) # state kept in the storage data type
+        iqa.stage_end(x, None if noise_estimate else nsig)
+        stopper.finish()
         time_now = time.time()
         print('----> finish {}/{} time cost {:.2f} min'.format(idx+1, len(sigma),(time_now-time_start)/60))     
+    x = policy(x)
     psnr_ = []
     ssim_ = []
-    nmask = x.shape[2]
     if X_orig is not None:
-        for imask in range(nmask):
-            psnr_.append(compare_psnr(X_orig[:,:,imask], x[:,:,imask], data_range=1.))
-            ssim_.append(compare_ssim(X_orig[:,:,imask], x[:,:,imask], data_range=1.))
-    return x, psnr_, ssim_, psnr_all
+        psnr_, ssim_ = _frame_iqa(X_orig, x, nbatch)
+    return x, psnr_, ssim_, iqa.results()
 
 
 
 def gap_multistep_denoise(y, Phi_sum, A, At, _lambda=1, gamma=None, accelerate=True, 
                 denoiser='tv+ffdnet', iter_max=50, noise_estimate=False, sigma=None, 
                 tv_weight=0.1, tv_iter_max=5, multichannel=True, x0=None, 
-                X_orig=None, model=None, show_iqa=True, tvm='tv_chambolle'):
+                X_orig=None, model=None, show_iqa=True, tvm='tv_chambolle',
+                tol_res=None, tol_rel=None, patience=1, stats=None, callback=None,
+                iqa_every=1, window_batch=None, dtype=np.float32):
     '''
     GAP-based multistep denoise
 
     Parameters
     ----------
     y : two-dimensional (2D) ndarray of ints, uints or floats
-        Input single measurement of the snapshot compressive imager (SCI).
+        Input single measurement of the snapshot compressive imager (SCI), or
+        a batch of measurements (B x H x W) sharing the same masks, with `A`
+        and `At` (or `operator`) taking the leading batch dimension.
     Phi : three-dimensional (3D) ndarray of ints, uints or floats, omitted
         Input sensing matrix of SCI with the third dimension as the 
         time-variant, spectral-variant, volume-variant, or angular-variant 
@@ -360,9 +469,40 @@ def gap_multistep_denoise(y, Phi_sum, A, At, _lambda=1, gamma=None, accelerate=T
         Start point (initialized value) for the iteration process of the 
         reconstruction.
     model : pretrained model for image/video denoising.
-    tvm : string, optional, {'tv_chambolle', 'ATV_ClipA', 'ATV_ClipB','ATV_cham','ATV_FGP',
+    window_batch : int, optional
+        Number of temporal windows per forward pass of FastDVDnet (all the
+        frames at once by default, see `fastdvdnet.denoise_windows`).
+    tvm : string, optional, {'tv_chambolle', 'ATV_cham','ATV_FGP',
         'ITV2D_cham','ITV2D_FGP','ITV3D_cham','ITV3D_FGP'}
         tv denoiser type, default value = 'tv_chambolle' (zzh)
+    tol_res : float, optional
+        Tolerance of the relative measurement residual ||y-A(x)||/||y|| for
+        the early termination of each sigma stage (see `utils.EarlyStopping`).
+    tol_rel : float, optional
+        Tolerance of the relative update ||x-x_prev||/||x_prev|| for the 
+        early termination of each sigma stage.
+    patience : int, optional
+        Number of consecutive iterations meeting the tolerances to stop a 
+        sigma stage and skip ahead to the next sigma level.
+    stats : dict, optional
+        Statistics of the reconstruction, where the number of iterations 
+        actually used of each sigma stage is appended to `stats['iters']`.
+    iqa_every : int, optional
+        Interval (in iterations) of the PSNR evaluation against `X_orig`
+        with `show_iqa`, done in a background thread on a snapshot of the
+        reconstruction, where the last iteration of each sigma stage is
+        always evaluated and `psnr_all` is the PSNR curve sampled at this
+        interval (see `utils.IQAMonitor`).
+    callback : callable or list of callables, optional
+        Per-iteration profiling hooks called with the timings of the 
+        projection, the denoising and the IQA, the residual norm, the sigma
+        stage and the memory high-water mark of each iteration (see 
+        `utils.IterationHooks`, and `utils.Profiler` for a built-in one).
+    dtype : data-type or DtypePolicy, optional
+        Data type policy of the reconstruction (see `utils.DtypePolicy`), 
+        float32 by default, e.g., `DtypePolicy(np.float32, storage=np.float16,
+        check=True)` for the float16 storage of the state arrays with the 
+        check of unintended upcasts.
 
     Returns
     -------
@@ -394,9 +534,14 @@ def gap_multistep_denoise(y, Phi_sum, A, At, _lambda=1, gamma=None, accelerate=T
     admm_denoise
     '''
     # [0] initialization
+    nbatch = y.shape[0] if y.ndim > 2 else 0 # batch of measurements (B x H x W)
+    policy = DtypePolicy.get(dtype) # compute (and storage) data type
+    y = policy(y)
     if x0 is None:
         # x0 = At(y, Phi) # default start point (initialized value)
         x0 = At(y) # default start point (initialized value)
+        x0 = policy(x0, 'At')
+    x0 = policy(x0) # start point in the compute data type
     if not isinstance(sigma, list):
         sigma = [sigma]
     if not isinstance(iter_max, list):
@@ -405,103 +550,65 @@ def gap_multistep_denoise(y, Phi_sum, A, At, _lambda=1, gamma=None, accelerate=T
     y1 = np.zeros_like(y) 
     # [1] start iteration for reconstruction
     x = x0 # initialization
-    psnr_all = []
+    # denoiser created once per process and kept resident (see `denoisers`)
+    denoise = get_denoiser(denoiser, tv_weight=tv_weight, tv_iter_max=tv_iter_max,
+                           multichannel=multichannel, tvm=tvm, noise_estimate=noise_estimate,
+                           model=model, window_batch=window_batch)
+    print(' --- {}_denoising ---'.format(denoiser.lower()))
+    # early termination of the sigma stages (disabled by default)
+    stopper = EarlyStopping(tol_res, tol_rel, patience, nbatch, stats)
+    # per-iteration profiling hooks (disabled without callback)
+    hooks = IterationHooks(callback, 'GAP-'+denoiser.upper(), nbatch)
+    # throttled IQA in a background thread (disabled without X_orig)
+    iqa = IQAMonitor(X_orig, iqa_every, hooks.solver, nbatch, show_iqa, stats=stats)
     k = 0
     time_start = time.time() # timing
     print('---> gap_multistep_denoise')
     for idx, nsig in enumerate(sigma): # iterate all noise levels
+        stopper.start()
         for it in range(iter_max[idx]):
+            hooks.start()
+            x = policy(x) # from storage
             yb = A(x)
             if accelerate: # accelerated version of GAP
                 y1 = y1 + (y-yb)
                 x = x + _lambda*(At((y1-yb)/Phi_sum)) # GAP_acc
             else:
                 x = x + _lambda*(At((y-yb)/Phi_sum)) # GAP
-            # switch denoiser 
-            if denoiser.lower() == 'tv+ffdnet': # total variation (TV) + ffdnet denoising
-                if idx== 0 and it==0:
-                    print(' --- tv+ffdnet_denoising ---')
-                    
-                # [.0] pre-denoise
-                # x = denoise_tv_chambolle(x, tv_weight, n_iter_max=tv_iter_max, multichannel=multichannel)
-                # [.1] denoise_step1: tv denoising
-                try:
-                    if tvm == 'tv_chambolle':
-                        x = denoise_tv_chambolle(x, tv_weight, n_iter_max=tv_iter_max, multichannel=multichannel)
-                    elif tvm == 'tv_bregman':
-                        x = denoise_tv_bregman(x, tv_weight, max_iter=tv_iter_max)
-                    elif tvm == 'ITV3D_FGP':
-                        x = denoise_tv_FGP_ITV3D(x, tv_weight, n_iter_max=tv_iter_max)
-                    elif tvm == 'ITV2D_cham':
-                        x = denoise_tv_cham_ITV2D(x, tv_weight, n_iter_max=tv_iter_max)                        
-                    else:
-                        raise TypeError("no such tv denoiser")
-                except TypeError as e:
-                    print("Exception: ",repr(e))
-                # [.2] denoise_step2: ffdnet_denoising
-                x = ffdnet_vdenoiser(x, nsig, model)
-                  
-                    
-            elif denoiser.lower() == 'tv+fastdvdnet':
-                if idx== 0 and it==0:
-                    print(' --- tv+fastdvdnet_denoising ---')
-                    
-                # [.0] pre-denoise
-                # x = denoise_tv_chambolle(x, tv_weight, n_iter_max=tv_iter_max, multichannel=multichannel)                
-                # [.1] denoise_step1: tv denoising
-                try:
-                    if tvm == 'tv_chambolle':
-                        x = denoise_tv_chambolle(x, tv_weight, n_iter_max=tv_iter_max, multichannel=multichannel)
-                    elif tvm == 'tv_bregman':
-                        x = denoise_tv_bregman(x, tv_weight, max_iter=tv_iter_max)
-                    elif tvm == 'ITV3D_FGP':
-                        x = denoise_tv_FGP_ITV3D(x, tv_weight, n_iter_max=tv_iter_max)
-                    elif tvm == 'ITV2D_cham':
-                        x = denoise_tv_cham_ITV2D(x, tv_weight, n_iter_max=tv_iter_max)                        
-                    else:
-                        raise TypeError("no such tv denoiser")
-                except TypeError as e:
-                    print("Exception: ",repr(e))  
-                    
-                # [.2] denoise_step2: ffdnet_denoising
-                x = fastdvdnet_denoiser(x, nsig, model, gray=True)
-                
-            else:
-                raise ValueError('Unsupported denoiser {}!'.format(denoiser))
-            # [optional] calculate image quality assessment, i.e., PSNR for 
-            # every five iterations
-            if show_iqa and X_orig is not None:
-                psnr_all.append(psnr(X_orig, x))
-                if (k+1)%5 == 0:
-                    if not noise_estimate and nsig is not None:
-                        if nsig < 1:
-                            print('  GAP-{0} iteration {1: 3d}, sigma {2: 3g}/255, ' 
-                            'PSNR {3:2.2f} dB.'.format(denoiser.upper(), 
-                            k+1, nsig*255, psnr_all[k]))
-                        else:
-                            print('  GAP-{0} iteration {1: 3d}, sigma {2: 3g}, ' 
-                                'PSNR {3:2.2f} dB.'.format(denoiser.upper(), 
-                                k+1, nsig, psnr_all[k]))
-                    else:
-                        print('  GAP-{0} iteration {1: 3d}, ' 
-                            'PSNR {2:2.2f} dB.'.format(denoiser.upper(), 
-                            k+1, psnr_all[k]))
+            x = policy(x, 'GAP projection')
+            hooks.lap('proj')
+            # denoising [all the frames of the batch at once]
+            x = policy(denoise(x, nsig, nbatch), 'Denoiser {}'.format(denoiser))
+            hooks.lap('denoise')
+            # [optional] image quality assessment, i.e., PSNR of every `iqa_every`
+            # iterations (in the background)
+            iqa(k, x, None if noise_estimate else nsig)
+            hooks.lap('iqa')
+            hooks(k, idx, nsig, y, yb)
             k = k+1
+            if stopper(x, y, yb) and it+1 < iter_max[idx]: # stage converged
+                print('  GAP-{0} sigma stage {1} of {2} converged after '
+                      '{3} of {4} iterations.'.format(denoiser.upper(), 
+                      idx+1, len(sigma), it+1, iter_max[idx]))
+                break
+            x = policy.store(x) # state kept in the storage data type
+        iqa.stage_end(x, None if noise_estimate else nsig)
+        stopper.finish()
         time_now = time.time()
         print('----> finish {}/{} time cost {:.2f} min'.format(idx+1, len(sigma),(time_now-time_start)/60))        
+    x = policy(x)
     psnr_ = []
     ssim_ = []
-    nmask = x.shape[2]
     if X_orig is not None:
-        for imask in range(nmask):
-            psnr_.append(compare_psnr(X_orig[:,:,imask], x[:,:,imask], data_range=1.))
-            ssim_.append(compare_ssim(X_orig[:,:,imask], x[:,:,imask], data_range=1.))
-    return x, psnr_, ssim_, psnr_all
+        psnr_, ssim_ = _frame_iqa(X_orig, x, nbatch)
+    return x, psnr_, ssim_, iqa.results()
 
 
 def admm_denoise(y, Phi_sum, A, At, _lambda=1, gamma=0.0, accelerate=None,
                 denoiser='tv', iter_max=50, noise_estimate=False, sigma=None, 
-                tv_weight=0.1, tv_iter_max=5, multichannel=True, x0=None, model=None, X_orig=None, show_iqa=True, tvm='tv_chambolle'):
+                tv_weight=0.1, tv_iter_max=5, multichannel=True, x0=None, model=None, X_orig=None, show_iqa=True, tvm='tv_chambolle',
+                tol_res=None, tol_rel=None, patience=1, stats=None, callback=None,
+                iqa_every=1, window_batch=None, dtype=np.float32):
     '''
     Alternating direction method of multipliers (ADMM)[1]-based denoising 
     regularization for snapshot compressive imaging (SCI).
@@ -509,7 +616,9 @@ def admm_denoise(y, Phi_sum, A, At, _lambda=1, gamma=0.0, accelerate=None,
     Parameters
     ----------
     y : two-dimensional (2D) ndarray of ints, uints or floats
-        Input single measurement of the snapshot compressive imager (SCI).
+        Input single measurement of the snapshot compressive imager (SCI), or
+        a batch of measurements (B x H x W) sharing the same masks, with `A`
+        and `At` (or `operator`) taking the leading batch dimension.
     Phi : three-dimensional (3D) ndarray of ints, uints or floats, omitted
         Input sensing matrix of SCI with the third dimension as the 
         time-variant, spectral-variant, volume-variant, or angular-variant 
@@ -552,6 +661,34 @@ def admm_denoise(y, Phi_sum, A, At, _lambda=1, gamma=0.0, accelerate=None,
     x0 : 3D ndarray 
         Start point (initialized value) for the iteration process of the 
         reconstruction.
+    tol_res : float, optional
+        Tolerance of the relative measurement residual ||y-A(x)||/||y|| for
+        the early termination of each sigma stage (see `utils.EarlyStopping`).
+    tol_rel : float, optional
+        Tolerance of the relative update ||x-x_prev||/||x_prev|| for the 
+        early termination of each sigma stage.
+    patience : int, optional
+        Number of consecutive iterations meeting the tolerances to stop a 
+        sigma stage and skip ahead to the next sigma level.
+    stats : dict, optional
+        Statistics of the reconstruction, where the number of iterations 
+        actually used of each sigma stage is appended to `stats['iters']`.
+    iqa_every : int, optional
+        Interval (in iterations) of the PSNR evaluation against `X_orig`
+        with `show_iqa`, done in a background thread on a snapshot of the
+        reconstruction, where the last iteration of each sigma stage is
+        always evaluated and `psnr_all` is the PSNR curve sampled at this
+        interval (see `utils.IQAMonitor`).
+    callback : callable or list of callables, optional
+        Per-iteration profiling hooks called with the timings of the 
+        projection, the denoising and the IQA, the residual norm, the sigma
+        stage and the memory high-water mark of each iteration (see 
+        `utils.IterationHooks`, and `utils.Profiler` for a built-in one).
+    dtype : data-type or DtypePolicy, optional
+        Data type policy of the reconstruction (see `utils.DtypePolicy`), 
+        float32 by default, e.g., `DtypePolicy(np.float32, storage=np.float16,
+        check=True)` for the float16 storage of the state arrays with the 
+        check of unintended upcasts.
 
     Returns
     -------
@@ -583,90 +720,80 @@ def admm_denoise(y, Phi_sum, A, At, _lambda=1, gamma=0.0, accelerate=None,
     gap_denoise
     '''
     # [0] initialization
+    nbatch = y.shape[0] if y.ndim > 2 else 0 # batch of measurements (B x H x W)
+    policy = DtypePolicy.get(dtype) # compute (and storage) data type
+    y = policy(y)
     if x0 is None:
         x0 = At(y) # default start point (initialized value)
+        x0 = policy(x0, 'At')
+    x0 = policy(x0) # start point in the compute data type
     if not isinstance(sigma, list):
         sigma = [sigma]
     if not isinstance(iter_max, list):
         iter_max = [iter_max] * len(sigma)
     # [1] start iteration for reconstruction
     x = x0 # initialization
-    theta = x0
-    b = np.zeros_like(x0)
-    psnr_all = []
+    theta = policy.store(x0)
+    b = policy.store(np.zeros_like(x0))
+    # denoiser created once per process and kept resident (see `denoisers`)
+    denoise = get_denoiser(denoiser, tv_weight=tv_weight, tv_iter_max=tv_iter_max,
+                           multichannel=multichannel, tvm=tvm, noise_estimate=noise_estimate,
+                           model=model, window_batch=window_batch)
+    # early termination of the sigma stages (disabled by default)
+    stopper = EarlyStopping(tol_res, tol_rel, patience, nbatch, stats)
+    # per-iteration profiling hooks (disabled without callback)
+    hooks = IterationHooks(callback, 'ADMM-'+denoiser.upper(), nbatch)
+    # throttled IQA in a background thread (disabled without X_orig)
+    iqa = IQAMonitor(X_orig, iqa_every, hooks.solver, nbatch, show_iqa, stats=stats)
     k = 0
     for idx, nsig in enumerate(sigma): # iterate all noise levels
+        stopper.start()
         for it in range(iter_max[idx]):
+            hooks.start()
+            (theta, b) = (policy(theta), policy(b)) # from storage
             # Euclidean projection
             yb = A(theta+b)
             x = (theta+b) + _lambda*(At((y-yb)/(Phi_sum+gamma))) # ADMM
-            # switch denoiser 
-            if denoiser.lower() == 'tv': # total variation (TV) denoising
-                try:
-                    if tvm == 'tv_chambolle':
-                        theta = denoise_tv_chambolle(x-b, tv_weight, n_iter_max=tv_iter_max, multichannel=multichannel)
-                    elif tvm == 'ITV3D_FGP':
-                        theta = denoise_tv_chambolle(x-b, tv_weight, n_iter_max=tv_iter_max, multichannel=multichannel)
-                    elif tvm == 'ITV2D_cham':
-                        theta = denoise_tv_chambolle(x-b, tv_weight, n_iter_max=tv_iter_max, multichannel=multichannel)                   
-                    else:
-                        raise TypeError("no such tv denoiser")
-                except TypeError as e:
-                    print("Exception: ",repr(e))
-            elif denoiser.lower() == 'wavelet': # wavelet denoising
-                if noise_estimate or nsig is None: # noise estimation enabled
-                    theta = denoise_wavelet(x-b, multichannel=multichannel)
-                else:
-                    theta = denoise_wavelet(x-b, sigma=nsig, multichannel=multichannel)
-            # elif denoiser.lower() == 'vnlnet': # Video Non-local net denoising
-            #     theta = vnlnet(np.expand_dims((x-b).transpose(2,0,1),3), nsig)
-            #     theta = np.transpose(theta.squeeze(3),(1,2,0))
-            elif denoiser.lower() == 'ffdnet': # FFDNet frame-wise video denoising
-                # x = ffdnet_vdenoiser(x, nsig, model)                  # [zzh] original
-                theta = ffdnet_vdenoiser(x-b, nsig, model)              # [zzh] new code from xinyuan(1/3)
-            elif denoiser.lower() == 'fastdvdnet': # FastDVDnet video denoising
-                # x = fastdvdnet_denoiser(x, nsig, model, gray=True)    # [zzh] original
-                theta = fastdvdnet_denoiser(x-b, nsig, model, gray=True) # [zzh] new code from xinyuan(2/3)
-            else:
-                raise ValueError('Unsupported denoiser {}!'.format(denoiser))
+            x = policy(x, 'ADMM projection')
+            hooks.lap('proj')
+            # denoising [all the frames of the batch at once]
+            theta = policy(denoise(x-b, nsig, nbatch), 
+                           'Denoiser {}'.format(denoiser))
+            hooks.lap('denoise')
             
             theta = np.clip(theta,0,1) # [zzh] new code from xinyuan(3/3)
             
             b = b - (x-theta) # update residual
-            # [optional] calculate image quality assessment, i.e., PSNR for 
-            # every five iterations
-            if show_iqa and X_orig is not None:
-                psnr_all.append(psnr(X_orig, x))
-                if (k+1)%5 == 0:
-                    if not noise_estimate and nsig is not None:
-                        if nsig < 1:
-                            print('  ADMM-{0} iteration {1: 3d}, sigma {2: 3g}/255, ' 
-                              'PSNR {3:2.2f} dB.'.format(denoiser.upper(), 
-                               k+1, nsig*255, psnr_all[k]))
-                        else:
-                            print('  ADMM-{0} iteration {1: 3d}, sigma {2: 3g}, ' 
-                                'PSNR {3:2.2f} dB.'.format(denoiser.upper(), 
-                                k+1, nsig, psnr_all[k]))
-                    else:
-                        print('  ADMM-{0} iteration {1: 3d}, ' 
-                              'PSNR {2: 2.2f} dB.'.format(denoiser.upper(), 
-                               k+1, psnr_all[k]))
+            hooks.lap('proj')
+            # [optional] image quality assessment, i.e., PSNR of every `iqa_every`
+            # iterations (in the background)
+            iqa(k, x, None if noise_estimate else nsig)
+            hooks.lap('iqa')
+            hooks(k, idx, nsig, y, yb)
             k = k+1
+            if stopper(x, y, yb) and it+1 < iter_max[idx]: # stage converged
+                print('  ADMM-{0} sigma stage {1} of {2} converged after '
+                      '{3} of {4} iterations.'.format(denoiser.upper(), 
+                      idx+1, len(sigma), it+1, iter_max[idx]))
+                break
+            (theta, b) = map(policy.store, (theta, b)) # state kept in the storage data type
+        iqa.stage_end(x, None if noise_estimate else nsig)
+        stopper.finish()
+    x = policy(x)
     
     psnr_ = []
     ssim_ = []
-    nmask = x.shape[2]
     if X_orig is not None:
-        for imask in range(nmask):
-            psnr_.append(compare_psnr(X_orig[:,:,imask], x[:,:,imask], data_range=1.))
-            ssim_.append(compare_ssim(X_orig[:,:,imask], x[:,:,imask], data_range=1.))
-    return x, psnr_, ssim_, psnr_all
+        psnr_, ssim_ = _frame_iqa(X_orig, x, nbatch)
+    return x, psnr_, ssim_, iqa.results()
 
 
 def gap_denoise(y, Phi_sum, A, At, _lambda=1, gamma=None, accelerate=True, 
                 denoiser='tv', iter_max=50, noise_estimate=False, sigma=None, 
                 tv_weight=0.1, tv_iter_max=5, multichannel=True, x0=None, 
-                X_orig=None, model=None, show_iqa=True, tvm='tv_chambolle'):
+                X_orig=None, model=None, show_iqa=True, tvm='tv_chambolle',
+                tol_res=None, tol_rel=None, patience=1, stats=None, callback=None,
+                iqa_every=1, window_batch=None, dtype=np.float32):
     '''
     Alternating direction method of multipliers (ADMM)[1]-based denoising 
     regularization for snapshot compressive imaging (SCI).
@@ -674,7 +801,9 @@ def gap_denoise(y, Phi_sum, A, At, _lambda=1, gamma=None, accelerate=True,
     Parameters
     ----------
     y : two-dimensional (2D) ndarray of ints, uints or floats
-        Input single measurement of the snapshot compressive imager (SCI).
+        Input single measurement of the snapshot compressive imager (SCI), or
+        a batch of measurements (B x H x W) sharing the same masks, with `A`
+        and `At` (or `operator`) taking the leading batch dimension.
     Phi : three-dimensional (3D) ndarray of ints, uints or floats, omitted
         Input sensing matrix of SCI with the third dimension as the 
         time-variant, spectral-variant, volume-variant, or angular-variant 
@@ -718,9 +847,40 @@ def gap_denoise(y, Phi_sum, A, At, _lambda=1, gamma=None, accelerate=True,
         Start point (initialized value) for the iteration process of the 
         reconstruction.
     model : pretrained model for image/video denoising.
-    tvm : string, optional, {'tv_chambolle', 'ATV_ClipA', 'ATV_ClipB','ATV_cham','ATV_FGP',
+    window_batch : int, optional
+        Number of temporal windows per forward pass of FastDVDnet (all the
+        frames at once by default, see `fastdvdnet.denoise_windows`).
+    tvm : string, optional, {'tv_chambolle', 'ATV_cham','ATV_FGP',
         'ITV2D_cham','ITV2D_FGP','ITV3D_cham','ITV3D_FGP'}
         tv denoiser type, default value = 'tv_chambolle' (zzh)
+    tol_res : float, optional
+        Tolerance of the relative measurement residual ||y-A(x)||/||y|| for
+        the early termination of each sigma stage (see `utils.EarlyStopping`).
+    tol_rel : float, optional
+        Tolerance of the relative update ||x-x_prev||/||x_prev|| for the 
+        early termination of each sigma stage.
+    patience : int, optional
+        Number of consecutive iterations meeting the tolerances to stop a 
+        sigma stage and skip ahead to the next sigma level.
+    stats : dict, optional
+        Statistics of the reconstruction, where the number of iterations 
+        actually used of each sigma stage is appended to `stats['iters']`.
+    iqa_every : int, optional
+        Interval (in iterations) of the PSNR evaluation against `X_orig`
+        with `show_iqa`, done in a background thread on a snapshot of the
+        reconstruction, where the last iteration of each sigma stage is
+        always evaluated and `psnr_all` is the PSNR curve sampled at this
+        interval (see `utils.IQAMonitor`).
+    callback : callable or list of callables, optional
+        Per-iteration profiling hooks called with the timings of the 
+        projection, the denoising and the IQA, the residual norm, the sigma
+        stage and the memory high-water mark of each iteration (see 
+        `utils.IterationHooks`, and `utils.Profiler` for a built-in one).
+    dtype : data-type or DtypePolicy, optional
+        Data type policy of the reconstruction (see `utils.DtypePolicy`), 
+        float32 by default, e.g., `DtypePolicy(np.float32, storage=np.float16,
+        check=True)` for the float16 storage of the state arrays with the 
+        check of unintended upcasts.
 
     Returns
     -------
@@ -752,9 +912,14 @@ def gap_denoise(y, Phi_sum, A, At, _lambda=1, gamma=None, accelerate=True,
     admm_denoise
     '''
     # [0] initialization
+    nbatch = y.shape[0] if y.ndim > 2 else 0 # batch of measurements (B x H x W)
+    policy = DtypePolicy.get(dtype) # compute (and storage) data type
+    y = policy(y)
     if x0 is None:
         # x0 = At(y, Phi) # default start point (initialized value)
         x0 = At(y) # default start point (initialized value)
+        x0 = policy(x0, 'At')
+    x0 = policy(x0) # start point in the compute data type
     if not isinstance(sigma, list):
         sigma = [sigma]
     if not isinstance(iter_max, list):
@@ -763,76 +928,58 @@ def gap_denoise(y, Phi_sum, A, At, _lambda=1, gamma=None, accelerate=True,
     y1 = np.zeros_like(y) 
     # [1] start iteration for reconstruction
     x = x0 # initialization
-    psnr_all = []
+    # denoiser created once per process and kept resident (see `denoisers`)
+    denoise = get_denoiser(denoiser, tv_weight=tv_weight, tv_iter_max=tv_iter_max,
+                           multichannel=multichannel, tvm=tvm, noise_estimate=noise_estimate,
+                           model=model, window_batch=window_batch)
+    # early termination of the sigma stages (disabled by default)
+    stopper = EarlyStopping(tol_res, tol_rel, patience, nbatch, stats)
+    # per-iteration profiling hooks (disabled without callback)
+    hooks = IterationHooks(callback, 'GAP-'+denoiser.upper(), nbatch)
+    # throttled IQA in a background thread (disabled without X_orig)
+    iqa = IQAMonitor(X_orig, iqa_every, hooks.solver, nbatch, show_iqa, stats=stats)
     k = 0
     time_start = time.time() # timing
     print('---> gap_denoise')
     for idx, nsig in enumerate(sigma): # iterate all noise levels
+        stopper.start()
         for it in range(iter_max[idx]):
+            hooks.start()
+            x = policy(x) # from storage
             yb = A(x)
             if accelerate: # accelerated version of GAP
                 y1 = y1 + (y-yb)
                 x = x + _lambda*(At((y1-yb)/Phi_sum)) # GAP_acc
             else:
                 x = x + _lambda*(At((y-yb)/Phi_sum)) # GAP
-            # switch denoiser 
-            if denoiser.lower() == 'tv': # total variation (TV) denoising
-                try:
-                    if tvm == 'tv_chambolle':
-                        x = denoise_tv_chambolle(x, tv_weight, n_iter_max=tv_iter_max, multichannel=multichannel)
-                    elif tvm == 'ITV3D_FGP':
-                        x = denoise_tv_FGP_ITV3D(x, tv_weight, n_iter_max=tv_iter_max)
-                    elif tvm == 'ITV2D_cham':
-                        x = denoise_tv_cham_ITV2D(x, tv_weight, n_iter_max=tv_iter_max)                        
-                    else:
-                        raise TypeError("no such tv denoiser")
-                except TypeError as e:
-                    print("Exception: ",repr(e))
-                    
-            elif denoiser.lower() == 'wavelet': # wavelet denoising
-                if noise_estimate or nsig is None: # noise estimation enabled
-                    x = denoise_wavelet(x, multichannel=multichannel)
-                else:
-                    x = denoise_wavelet(x, sigma=nsig, multichannel=multichannel)
-            # elif denoiser.lower() == 'vnlnet': # Video Non-local net denoising
-            #     x = vnlnet(np.expand_dims(x.transpose(2,0,1),3), nsig)
-            #     x = np.transpose(x.squeeze(3),(1,2,0))
-            elif denoiser.lower() == 'ffdnet': # FFDNet frame-wise video denoising
-                x = ffdnet_vdenoiser(x, nsig, model)
-            elif denoiser.lower() == 'fastdvdnet': # FastDVDnet video denoising
-                x = fastdvdnet_denoiser(x, nsig, model, gray=True)
-            else:
-                raise ValueError('Unsupported denoiser {}!'.format(denoiser))
-            # [optional] calculate image quality assessment, i.e., PSNR for 
-            # every five iterations
-            if show_iqa and X_orig is not None:
-                psnr_all.append(psnr(X_orig, x))
-                if (k+1)%5 == 0:
-                    if not noise_estimate and nsig is not None:
-                        if nsig < 1:
-                            print('  GAP-{0} iteration {1: 3d}, sigma {2: 3g}/255, ' 
-                            'PSNR {3:2.2f} dB.'.format(denoiser.upper(), 
-                            k+1, nsig*255, psnr_all[k]))
-                        else:
-                            print('  GAP-{0} iteration {1: 3d}, sigma {2: 3g}, ' 
-                                'PSNR {3:2.2f} dB.'.format(denoiser.upper(), 
-                                k+1, nsig, psnr_all[k]))
-                    else:
-                        print('  GAP-{0} iteration {1: 3d}, ' 
-                            'PSNR {2:2.2f} dB.'.format(denoiser.upper(), 
-                            k+1, psnr_all[k]))
+            x = policy(x, 'GAP projection')
+            hooks.lap('proj')
+            # denoising [all the frames of the batch at once]
+            x = policy(denoise(x, nsig, nbatch), 'Denoiser {}'.format(denoiser))
+            hooks.lap('denoise')
+            # [optional] image quality assessment, i.e., PSNR of every `iqa_every`
+            # iterations (in the background)
+            iqa(k, x, None if noise_estimate else nsig)
+            hooks.lap('iqa')
+            hooks(k, idx, nsig, y, yb)
             k = k+1
+            if stopper(x, y, yb) and it+1 < iter_max[idx]: # stage converged
+                print('  GAP-{0} sigma stage {1} of {2} converged after '
+                      '{3} of {4} iterations.'.format(denoiser.upper(), 
+                      idx+1, len(sigma), it+1, iter_max[idx]))
+                break
+            x = policy.store(x) # state kept in the storage data type
+        iqa.stage_end(x, None if noise_estimate else nsig)
+        stopper.finish()
         time_now = time.time()
         print('----> finish {}/{} time cost {:.2f} min'.format(idx+1, len(sigma),(time_now-time_start)/60))
+    x = policy(x)
             
     psnr_ = []
     ssim_ = []
-    nmask = x.shape[2]
     if X_orig is not None:
-        for imask in range(nmask):
-            psnr_.append(compare_psnr(X_orig[:,:,imask], x[:,:,imask], data_range=1.))
-            ssim_.append(compare_ssim(X_orig[:,:,imask], x[:,:,imask], data_range=1.))
-    return x, psnr_, ssim_, psnr_all
+        psnr_, ssim_ = _frame_iqa(X_orig, x, nbatch)
+    return x, psnr_, ssim_, iqa.results()
 
 
 
@@ -878,3 +1025,30 @@ def ADMM_TV_rec(y,Phi,A, At,Phi_sum, maxiter, step_size, weight, row, col, ColT,
               " time = %3.1fs."
               % (ni+1, psnr(v, X_ori), end_time-begin_time))
     return v
+
+record_import(__name__, _t0)
+
+if __name__ == '__main__':
+    # regression check of the stage cache, where two configurations differing
+    # only in the storage data type must not share the cached stages
+    import tempfile
+    from utils import A_, At_
+    rng = np.random.default_rng(0)
+    mask = np.float32(rng.random((64, 64, 8)) > 0.5)
+    orig = np.float32(rng.random((64, 64, 8)))
+    meas = A_(orig, mask)[..., np.newaxis]
+    A  = lambda x :  A_(x, mask) # forward model function handle
+    At = lambda y : At_(y, mask) # transpose of forward model
+    params = dict(projmeth='gap', denoiser='tv', iter_max1=5, iter_max2=[5],
+                  sigma1=[0], sigma2=[0], tv_weight=0.1, tvm='ATV_cham')
+    with tempfile.TemporaryDirectory() as cachedir:
+        cache = StageCache(cachedir)
+        policies = (DtypePolicy(np.float32), DtypePolicy(np.float32, storage=np.float16))
+        keys = [cache.key(meas, dtype=policy) for policy in policies]
+        assert keys[0] != keys[1], 'storage data type not in the cache key'
+        x_ = [joint_admmdenoise_cacti(meas, mask, A, At, cache=cache, dtype=policy,
+                                      **params)[0] for policy in policies]
+        x_ref = joint_admmdenoise_cacti(meas, mask, A, At, dtype=policies[1], **params)[0]
+        assert np.array_equal(x_[1], x_ref), 'float16 storage loaded the float32 stages'
+        assert not np.array_equal(x_[0], x_[1]), 'storage data type ignored'
+    print('Stage cache keys of the storage data types OK.')
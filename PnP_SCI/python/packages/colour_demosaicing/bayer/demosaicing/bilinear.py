@@ -14,11 +14,13 @@ References
 
 from __future__ import division, unicode_literals
 
-from scipy.ndimage.filters import convolve
+import numpy as np
 
-from colour.utilities import as_float_array, tstack
+from colour.utilities import as_float_array
 
 from colour_demosaicing.bayer import masks_CFA_Bayer
+from colour_demosaicing.bayer.demosaicing.convolution import (
+    as_frames, as_mask, convolve, from_frames, stack)
 
 __author__ = 'Colour Developers'
 __copyright__ = 'Copyright (C) 2015-2020 - Colour Developers'
@@ -38,7 +40,9 @@ def demosaicing_CFA_Bayer_bilinear(CFA, pattern='RGGB'):
     Parameters
     ----------
     CFA : array_like
-        *Bayer* CFA.
+        *Bayer* CFA, a single frame (H, W) or a stack of F frames (H, W, F)
+        demosaiced at once, as an *ndarray* or a :class:`torch.Tensor`
+        (demosaiced with the *PyTorch* convolutions on its device).
     pattern : unicode, optional
         **{'RGGB', 'BGGR', 'GRBG', 'GBRG'}**,
         Arrangement of the colour filters on the pixel array.
@@ -46,7 +50,8 @@ def demosaicing_CFA_Bayer_bilinear(CFA, pattern='RGGB'):
     Returns
     -------
     ndarray
-        *RGB* colourspace array.
+        *RGB* colourspace array (H, W, 3) or stack of arrays (H, W, F, 3), of
+        the type of ``CFA``.
 
     Notes
     -----
@@ -63,7 +68,6 @@ examples_merge_from_raw_files_with_post_demosaicing.ipynb>`__.
 
     Examples
     --------
-    >>> import numpy as np
     >>> CFA = np.array(
     ...     [[0.30980393, 0.36078432, 0.30588236, 0.3764706],
     ...      [0.35686275, 0.39607844, 0.36078432, 0.40000001]])
@@ -92,8 +96,10 @@ examples_merge_from_raw_files_with_post_demosaicing.ipynb>`__.
             [ 0.67058827,  0.18431373,  0.10196078]]])
     """
 
-    CFA = as_float_array(CFA)
-    R_m, G_m, B_m = masks_CFA_Bayer(CFA.shape, pattern)
+    ndim = np.ndim(CFA)
+    CFA = as_frames(CFA)
+    R_m, G_m, B_m = (as_mask(m, CFA)
+                     for m in masks_CFA_Bayer(CFA.shape[-2:], pattern))
 
     H_G = as_float_array(
         [[0, 1, 0],
@@ -111,4 +117,4 @@ examples_merge_from_raw_files_with_post_demosaicing.ipynb>`__.
 
     del R_m, G_m, B_m, H_RB, H_G
 
-    return tstack([R, G, B])
+    return from_frames(stack([R, G, B]), ndim)
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""
+Bayer CFA Stack Convolutions
+============================
+
+Convolutions of *Bayer* CFA (Colour Filter Array) frame stacks, i.e., arrays
+of shape (H, W) or (H, W, F) demosaiced all the F frames at once. The stacks
+are processed as contiguous (F, H, W) arrays (see :func:`as_frames`), i.e.,
+filtered along their last two axes. *ndarray* stacks are filtered with the
+*scipy* filters and :class:`torch.Tensor` stacks (*PyTorch* being an optional
+dependency) with elementwise operations on the device of the stack, so that
+the data stays in tensor space.
+"""
+
+from __future__ import division, unicode_literals
+
+import numpy as np
+from scipy.ndimage import convolve as _convolve, convolve1d as _convolve1d
+
+from colour.utilities import as_float_array
+
+try:
+    import torch
+except ImportError:  # pragma: no cover
+    torch = None
+
+__author__ = 'Colour Developers'
+__copyright__ = 'Copyright (C) 2015-2020 - Colour Developers'
+__license__ = 'New BSD License - https://opensource.org/licenses/BSD-3-Clause'
+__maintainer__ = 'Colour Developers'
+__email__ = 'colour-developers@colour-science.org'
+__status__ = 'Production'
+
+__all__ = [
+    'is_tensor', 'as_frames', 'from_frames', 'as_mask', 'convolve',
+    'convolve1d', 'shift', 'where', 'stack', 'unstack'
+]
+
+
+def is_tensor(a):
+    """
+    Returns whether given array is a :class:`torch.Tensor`.
+    """
+
+    return torch is not None and torch.is_tensor(a)
+
+
+def as_frames(CFA):
+    """
+    Converts given *Bayer* CFA (H, W) or stack (H, W, F) to a floating point
+    array (H, W) or contiguous stack of frames (F, H, W), keeping single
+    precision *ndarray* stacks (half the memory traffic of the convolutions)
+    and :class:`torch.Tensor` stacks on their device.
+
+    Examples
+    --------
+    >>> as_frames(np.zeros((4, 6, 3), dtype=np.float32)).shape
+    (3, 4, 6)
+    """
+
+    if not is_tensor(CFA):
+        if not (isinstance(CFA, np.ndarray) and CFA.dtype == np.float32):
+            CFA = as_float_array(CFA)
+        if CFA.ndim == 3:
+            CFA = np.ascontiguousarray(np.moveaxis(CFA, -1, 0))
+    elif CFA.ndim == 3:
+        CFA = CFA.movedim(-1, 0).contiguous()
+
+    return CFA
+
+
+def from_frames(RGB, ndim):
+    """
+    Converts given *RGB* colourspace array (H, W, 3) or stack of frames
+    (F, H, W, 3) back to the layout of a *Bayer* CFA of ``ndim`` dimensions,
+    i.e., (H, W, 3) or (H, W, F, 3).
+    """
+
+    if ndim == 3:
+        return RGB.movedim(0, 2) if is_tensor(RGB) else np.moveaxis(RGB, 0, 2)
+
+    return RGB
+
+
+def as_mask(m, a):
+    """
+    Returns given *ndarray* mask (broadcast over the frames of a stack) as a
+    :class:`torch.Tensor` on the device of given array for tensor arrays.
+    """
+
+    return torch.as_tensor(m, device=a.device) if is_tensor(a) else m
+
+
+def _pad_indices(n, before, after, mode):
+    """
+    Indices of the padding of an axis of size *n* with *scipy* ``mode``.
+    """
+
+    i = np.arange(-before, n + after)
+    if mode == 'reflect':
+        i = i % (2 * n)
+        return np.where(i >= n, 2 * n - 1 - i, i)
+    if mode == 'mirror':
+        if n == 1:
+            return np.zeros_like(i)
+        i = i % (2 * n - 2)
+        return np.where(i >= n, 2 * n - 2 - i, i)
+    if mode == 'nearest':
+        return np.clip(i, 0, n - 1)
+
+    raise ValueError('Unsupported padding mode {0}!'.format(mode))
+
+
+def _convolve_tensor(a, k, mode):
+    """
+    Convolves given :class:`torch.Tensor` with given two-dimensional kernel
+    (of odd sizes) along its last two axes, as :func:`convolve`.
+
+    The demosaicing kernels being small and sparse, the convolution is the
+    weighted sum of the shifted (padded) frames of the non-zero taps of the
+    kernel, elementwise operations over all the frames at once.
+    """
+
+    (H, W) = a.shape[-2:]
+    (kh, kw) = k.shape
+    (ph, pw) = (kh // 2, kw // 2)
+    if mode == 'constant':
+        x = a.new_zeros(a.shape[:-2] + (H + 2 * ph, W + 2 * pw))
+        x[..., ph:ph + H, pw:pw + W] = a
+    else:
+        rows = _pad_indices(H, ph, ph, mode)
+        cols = _pad_indices(W, pw, pw, mode)
+        x = a.index_select(-2, torch.as_tensor(rows, device=a.device))
+        x = x.index_select(-1, torch.as_tensor(cols, device=a.device))
+    # true convolution, i.e., correlation with the flipped kernel
+    k = k[::-1, ::-1]
+    out = torch.zeros_like(a)
+    for (i, j) in zip(*np.nonzero(k)):
+        out += x[..., i:i + H, j:j + W] * float(k[i, j])
+
+    return out
+
+
+def convolve(a, k, mode='reflect'):
+    """
+    Convolves given array (H, W) or stack of frames (F, H, W) with given
+    two-dimensional kernel along its last two axes, with the boundary
+    ``mode`` of :func:`scipy.ndimage.convolve`.
+
+    Examples
+    --------
+    >>> a = np.arange(16.).reshape(4, 4)
+    >>> k = np.ones((3, 3)) / 9
+    >>> b = convolve(np.stack([a, 2 * a]), k)
+    >>> np.allclose(b[1], 2 * convolve(a, k))
+    True
+    """
+
+    k = np.asarray(k, dtype=np.float64)
+    if is_tensor(a):
+        return _convolve_tensor(a, k, mode)
+
+    return _convolve(a, np.reshape(k, (1, ) * (a.ndim - 2) + k.shape),
+                     mode=mode)
+
+
+def convolve1d(a, k, axis=-1, mode='reflect'):
+    """
+    Convolves given array (H, W) or stack of frames (F, H, W) with given
+    one-dimensional kernel along its rows (``axis=-1``) or columns
+    (``axis=-2``), with the boundary ``mode`` of
+    :func:`scipy.ndimage.convolve1d`.
+    """
+
+    k = np.asarray(k, dtype=np.float64)
+    if is_tensor(a):
+        return _convolve_tensor(a, k.reshape((-1, 1) if axis == -2 else
+                                             (1, -1)), mode)
+
+    return _convolve1d(a, k, axis=axis, mode=mode)
+
+
+def shift(a, n, axis):
+    """
+    Shifts given array by *n* samples backward along given axis, reflecting
+    (without repeating the edge sample) at the end, i.e., as
+    ``np.pad(a, (0, n), mode='reflect')[n:]`` along the axis.
+    """
+
+    i = _pad_indices(a.shape[axis], 0, n, 'mirror')[n:]
+    if is_tensor(a):
+        return a.index_select(axis, torch.as_tensor(i, device=a.device))
+
+    return np.take(a, i, axis=axis)
+
+
+def where(condition, x, y):
+    """
+    :func:`numpy.where` definition for arrays and :class:`torch.Tensor`
+    stacks.
+    """
+
+    if any(is_tensor(a) for a in (condition, x, y)):
+        return torch.where(condition, x, y)
+
+    return np.where(condition, x, y)
+
+
+def stack(a):
+    """
+    Stacks given arrays along the last axis, as :func:`colour.utilities.tstack`
+    (keeping their precision) for arrays and :class:`torch.Tensor` stacks.
+    """
+
+    return torch.stack(a, -1) if is_tensor(a[0]) else np.stack(a, -1)
+
+
+def unstack(a):
+    """
+    Splits given array along the last axis, as :func:`colour.utilities.tsplit`
+    for arrays and :class:`torch.Tensor` stacks.
+    """
+
+    return a.unbind(-1) if is_tensor(a) else np.moveaxis(a, -1, 0)
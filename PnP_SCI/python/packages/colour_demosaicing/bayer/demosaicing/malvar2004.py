@@ -17,11 +17,12 @@ References
 from __future__ import division, unicode_literals
 
 import numpy as np
-from scipy.ndimage.filters import convolve
 
-from colour.utilities import as_float_array, tstack
+from colour.utilities import as_float_array
 
 from colour_demosaicing.bayer import masks_CFA_Bayer
+from colour_demosaicing.bayer.demosaicing.convolution import (
+    as_frames, as_mask, convolve, from_frames, stack, where)
 
 __author__ = 'Colour Developers'
 __copyright__ = 'Copyright (C) 2015-2020 - Colour Developers'
@@ -41,7 +42,9 @@ def demosaicing_CFA_Bayer_Malvar2004(CFA, pattern='RGGB'):
     Parameters
     ----------
     CFA : array_like
-        *Bayer* CFA.
+        *Bayer* CFA, a single frame (H, W) or a stack of F frames (H, W, F)
+        demosaiced at once, as an *ndarray* or a :class:`torch.Tensor`
+        (demosaiced with the *PyTorch* convolutions on its device).
     pattern : unicode, optional
         **{'RGGB', 'BGGR', 'GRBG', 'GBRG'}**,
         Arrangement of the colour filters on the pixel array.
@@ -49,7 +52,8 @@ def demosaicing_CFA_Bayer_Malvar2004(CFA, pattern='RGGB'):
     Returns
     -------
     ndarray
-        *RGB* colourspace array.
+        *RGB* colourspace array (H, W, 3) or stack of arrays (H, W, F, 3), of
+        the type of ``CFA``.
 
     Notes
     -----
@@ -94,8 +98,22 @@ examples_merge_from_raw_files_with_post_demosaicing.ipynb>`__.
             [ 0.29803923,  0.30441178,  0.31740197]]])
     """
 
-    CFA = as_float_array(CFA)
-    R_m, G_m, B_m = masks_CFA_Bayer(CFA.shape, pattern)
+    ndim = np.ndim(CFA)
+    CFA = as_frames(CFA)
+    R_m, G_m, B_m = masks_CFA_Bayer(CFA.shape[-2:], pattern)
+
+    # Red rows.
+    R_r = np.any(R_m == 1, axis=1)[:, np.newaxis]
+    # Red columns.
+    R_c = np.any(R_m == 1, axis=0)[np.newaxis]
+    # Blue rows.
+    B_r = np.any(B_m == 1, axis=1)[:, np.newaxis]
+    # Blue columns
+    B_c = np.any(B_m == 1, axis=0)[np.newaxis]
+
+    # Masks on the device of the (tensor) stack, broadcast over its frames.
+    R_m, G_m, B_m, R_r, R_c, B_r, B_c = (
+        as_mask(m, CFA) for m in (R_m, G_m, B_m, R_r, R_c, B_r, B_c))
 
     GR_GB = as_float_array(
         [[0, 0, -1, 0, 0],
@@ -126,7 +144,7 @@ examples_merge_from_raw_files_with_post_demosaicing.ipynb>`__.
 
     del G_m
 
-    G = np.where(np.logical_or(R_m == 1, B_m == 1), convolve(CFA, GR_GB), G)
+    G = where(R_m | B_m, convolve(CFA, GR_GB), G)
 
     RBg_RBBR = convolve(CFA, Rg_RB_Bg_BR)
     RBg_BRRB = convolve(CFA, Rg_BR_Bg_RB)
@@ -134,26 +152,17 @@ examples_merge_from_raw_files_with_post_demosaicing.ipynb>`__.
 
     del GR_GB, Rg_RB_Bg_BR, Rg_BR_Bg_RB, Rb_BB_Br_RR
 
-    # Red rows.
-    R_r = np.transpose(np.any(R_m == 1, axis=1)[np.newaxis]) * np.ones(R.shape)
-    # Red columns.
-    R_c = np.any(R_m == 1, axis=0)[np.newaxis] * np.ones(R.shape)
-    # Blue rows.
-    B_r = np.transpose(np.any(B_m == 1, axis=1)[np.newaxis]) * np.ones(B.shape)
-    # Blue columns
-    B_c = np.any(B_m == 1, axis=0)[np.newaxis] * np.ones(B.shape)
-
     del R_m, B_m
 
-    R = np.where(np.logical_and(R_r == 1, B_c == 1), RBg_RBBR, R)
-    R = np.where(np.logical_and(B_r == 1, R_c == 1), RBg_BRRB, R)
+    R = where(R_r & B_c, RBg_RBBR, R)
+    R = where(B_r & R_c, RBg_BRRB, R)
 
-    B = np.where(np.logical_and(B_r == 1, R_c == 1), RBg_RBBR, B)
-    B = np.where(np.logical_and(R_r == 1, B_c == 1), RBg_BRRB, B)
+    B = where(B_r & R_c, RBg_RBBR, B)
+    B = where(R_r & B_c, RBg_BRRB, B)
 
-    R = np.where(np.logical_and(B_r == 1, B_c == 1), RBgr_BBRR, R)
-    B = np.where(np.logical_and(R_r == 1, R_c == 1), RBgr_BBRR, B)
+    R = where(B_r & B_c, RBgr_BBRR, R)
+    B = where(R_r & R_c, RBgr_BBRR, B)
 
     del RBg_RBBR, RBg_BRRB, RBgr_BBRR, R_r, R_c, B_r, B_c
 
-    return tstack([R, G, B])
+    return from_frames(stack([R, G, B]), ndim)
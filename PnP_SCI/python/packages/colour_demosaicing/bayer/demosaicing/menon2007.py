@@ -16,11 +16,13 @@ References
 from __future__ import division, unicode_literals
 
 import numpy as np
-from scipy.ndimage.filters import convolve, convolve1d
 
-from colour.utilities import as_float_array, tsplit, tstack
+from colour.utilities import as_float_array
 
 from colour_demosaicing.bayer import masks_CFA_Bayer
+from colour_demosaicing.bayer.demosaicing.convolution import (
+    as_frames, as_mask, convolve, convolve1d, from_frames, is_tensor, shift,
+    stack, unstack, where)
 
 __author__ = 'Colour Developers'
 __copyright__ = 'Copyright (C) 2015-2020 - Colour Developers'
@@ -40,7 +42,7 @@ def _cnv_h(x, y):
     Helper function for horizontal convolution.
     """
 
-    return convolve1d(x, y, mode='mirror')
+    return convolve1d(x, y, mode='mirror', axis=-1)
 
 
 def _cnv_v(x, y):
@@ -48,7 +50,32 @@ def _cnv_v(x, y):
     Helper function for vertical convolution.
     """
 
-    return convolve1d(x, y, mode='mirror', axis=0)
+    return convolve1d(x, y, mode='mirror', axis=-2)
+
+
+def _rows_columns(R_m, B_m, a):
+    """
+    Helper function returning the red and blue rows and columns masks (on the
+    device of given array).
+    """
+
+    return tuple(
+        as_mask(m, a) for m in (
+            np.any(R_m == 1, axis=1)[:, np.newaxis],  # Red rows.
+            np.any(R_m == 1, axis=0)[np.newaxis],  # Red columns.
+            np.any(B_m == 1, axis=1)[:, np.newaxis],  # Blue rows.
+            np.any(B_m == 1, axis=0)[np.newaxis]))  # Blue columns.
+
+
+def _frame_mask(m):
+    """
+    Helper function returning the two-dimensional *ndarray* mask of the first
+    frame of given mask (stack).
+    """
+
+    m = m.cpu().numpy() if is_tensor(m) else np.asarray(m)
+
+    return m.reshape((-1, ) + m.shape[-2:])[0]
 
 
 def demosaicing_CFA_Bayer_Menon2007(CFA, pattern='RGGB', refining_step=True):
@@ -59,7 +86,9 @@ def demosaicing_CFA_Bayer_Menon2007(CFA, pattern='RGGB', refining_step=True):
     Parameters
     ----------
     CFA : array_like
-        *Bayer* CFA.
+        *Bayer* CFA, a single frame (H, W) or a stack of F frames (H, W, F)
+        demosaiced at once, as an *ndarray* or a :class:`torch.Tensor`
+        (demosaiced with the *PyTorch* convolutions on its device).
     pattern : unicode, optional
         **{'RGGB', 'BGGR', 'GRBG', 'GBRG'}**,
         Arrangement of the colour filters on the pixel array.
@@ -69,7 +98,8 @@ def demosaicing_CFA_Bayer_Menon2007(CFA, pattern='RGGB', refining_step=True):
     Returns
     -------
     ndarray
-        *RGB* colourspace array.
+        *RGB* colourspace array (H, W, 3) or stack of arrays (H, W, F, 3), of
+        the type of ``CFA``.
 
     Notes
     -----
@@ -114,8 +144,11 @@ examples_merge_from_raw_files_with_post_demosaicing.ipynb>`__.
             [ 0.29803923,  0.3764706 ,  0.42352942]]])
     """
 
-    CFA = as_float_array(CFA)
-    R_m, G_m, B_m = masks_CFA_Bayer(CFA.shape, pattern)
+    ndim = np.ndim(CFA)
+    CFA = as_frames(CFA)
+    R_m, G_m, B_m = masks_CFA_Bayer(CFA.shape[-2:], pattern)
+    R_r, _R_c, B_r, _B_c = _rows_columns(R_m, B_m, CFA)
+    R_m, G_m, B_m = (as_mask(m, CFA) for m in (R_m, G_m, B_m))
 
     h_0 = np.array([0, 0.5, 0, 0.5, 0])
     h_1 = np.array([-0.25, 0, 0.5, 0, -0.25])
@@ -124,19 +157,19 @@ examples_merge_from_raw_files_with_post_demosaicing.ipynb>`__.
     G = CFA * G_m
     B = CFA * B_m
 
-    G_H = np.where(G_m == 0, _cnv_h(CFA, h_0) + _cnv_h(CFA, h_1), G)
-    G_V = np.where(G_m == 0, _cnv_v(CFA, h_0) + _cnv_v(CFA, h_1), G)
+    # The filters being linear, the sums (differences) of the filtered
+    # components are filtered at once.
+    G_H = where(G_m == 0, _cnv_h(CFA, h_0 + h_1), G)
+    G_V = where(G_m == 0, _cnv_v(CFA, h_0 + h_1), G)
 
-    C_H = np.where(R_m == 1, R - G_H, 0)
-    C_H = np.where(B_m == 1, B - G_H, C_H)
+    C_H = where(R_m == 1, R - G_H, 0)
+    C_H = where(B_m == 1, B - G_H, C_H)
 
-    C_V = np.where(R_m == 1, R - G_V, 0)
-    C_V = np.where(B_m == 1, B - G_V, C_V)
+    C_V = where(R_m == 1, R - G_V, 0)
+    C_V = where(B_m == 1, B - G_V, C_V)
 
-    D_H = np.abs(C_H - np.pad(C_H, ((0, 0),
-                                    (0, 2)), mode=str('reflect'))[:, 2:])
-    D_V = np.abs(C_V - np.pad(C_V, ((0, 2),
-                                    (0, 0)), mode=str('reflect'))[2:, :])
+    D_H = abs(C_H - shift(C_H, 2, axis=-1))
+    D_V = abs(C_V - shift(C_V, 2, axis=-2))
 
     del h_0, h_1, CFA, C_V, C_H
 
@@ -153,72 +186,61 @@ examples_merge_from_raw_files_with_post_demosaicing.ipynb>`__.
     del D_H, D_V
 
     mask = d_V >= d_H
-    G = np.where(mask, G_H, G_V)
-    M = np.where(mask, 1, 0)
+    G = where(mask, G_H, G_V)
+    M = where(mask, 1, 0)
 
     del d_H, d_V, G_H, G_V
 
-    # Red rows.
-    R_r = np.transpose(np.any(R_m == 1, axis=1)[np.newaxis]) * np.ones(R.shape)
-    # Blue rows.
-    B_r = np.transpose(np.any(B_m == 1, axis=1)[np.newaxis]) * np.ones(B.shape)
-
     k_b = np.array([0.5, 0, 0.5])
 
-    R = np.where(
-        np.logical_and(G_m == 1, R_r == 1),
-        G + _cnv_h(R, k_b) - _cnv_h(G, k_b),
+    R = where(
+        (G_m == 1) & (R_r == 1),
+        G + _cnv_h(R - G, k_b),
         R,
     )
 
-    R = np.where(
-        np.logical_and(G_m == 1, B_r == 1) == 1,
-        G + _cnv_v(R, k_b) - _cnv_v(G, k_b),
+    R = where(
+        (G_m == 1) & (B_r == 1),
+        G + _cnv_v(R - G, k_b),
         R,
     )
 
-    B = np.where(
-        np.logical_and(G_m == 1, B_r == 1),
-        G + _cnv_h(B, k_b) - _cnv_h(G, k_b),
+    B = where(
+        (G_m == 1) & (B_r == 1),
+        G + _cnv_h(B - G, k_b),
         B,
     )
 
-    B = np.where(
-        np.logical_and(G_m == 1, R_r == 1) == 1,
-        G + _cnv_v(B, k_b) - _cnv_v(G, k_b),
+    B = where(
+        (G_m == 1) & (R_r == 1),
+        G + _cnv_v(B - G, k_b),
         B,
     )
 
-    R = np.where(
-        np.logical_and(B_r == 1, B_m == 1),
-        np.where(
-            M == 1,
-            B + _cnv_h(R, k_b) - _cnv_h(B, k_b),
-            B + _cnv_v(R, k_b) - _cnv_v(B, k_b),
-        ),
+    R_B = R - B
+
+    R = where(
+        (B_r == 1) & (B_m == 1),
+        B + where(M == 1, _cnv_h(R_B, k_b), _cnv_v(R_B, k_b)),
         R,
     )
 
-    B = np.where(
-        np.logical_and(R_r == 1, R_m == 1),
-        np.where(
-            M == 1,
-            R + _cnv_h(B, k_b) - _cnv_h(R, k_b),
-            R + _cnv_v(B, k_b) - _cnv_v(R, k_b),
-        ),
+    B = where(
+        (R_r == 1) & (R_m == 1),
+        R - where(M == 1, _cnv_h(R_B, k_b), _cnv_v(R_B, k_b)),
         B,
     )
 
-    RGB = tstack([R, G, B])
+    RGB = stack([R, G, B])
 
-    del R, G, B, k_b, R_r, B_r
+    del R, G, B, R_B, k_b, R_r, B_r
 
     if refining_step:
-        RGB = refining_step_Menon2007(RGB, tstack([R_m, G_m, B_m]), M)
+        RGB = refining_step_Menon2007(RGB, stack([R_m, G_m, B_m]), M)
 
     del M, R_m, G_m, B_m
 
-    return RGB
+    return from_frames(RGB, ndim)
 
 
 demosaicing_CFA_Bayer_DDFAPD = demosaicing_CFA_Bayer_Menon2007
@@ -231,7 +253,8 @@ def refining_step_Menon2007(RGB, RGB_m, M):
     Parameters
     ----------
     RGB : array_like
-        *RGB* colourspace array.
+        *RGB* colourspace array (H, W, 3) or stack of arrays (H, W, F, 3), as
+        an *ndarray* or a :class:`torch.Tensor`.
     RGB_m : array_like
         *Bayer* CFA red, green and blue masks.
     M : array_like
@@ -277,9 +300,14 @@ def refining_step_Menon2007(RGB, RGB_m, M):
             [ 0.29803923,  0.3764706 ,  0.42352942]]])
     """
 
-    R, G, B = tsplit(RGB)
-    R_m, G_m, B_m = tsplit(RGB_m)
-    M = as_float_array(M)
+    R, G, B = unstack(RGB)
+    R_m, G_m, B_m = unstack(RGB_m)
+    if not is_tensor(RGB):
+        M = as_float_array(M)
+
+    # Red rows, red columns, blue rows and blue columns.
+    R_r, R_c, B_r, B_c = _rows_columns(
+        _frame_mask(R_m), _frame_mask(B_m), R)
 
     del RGB, RGB_m
 
@@ -289,83 +317,74 @@ def refining_step_Menon2007(RGB, RGB_m, M):
 
     FIR = np.ones(3) / 3
 
-    B_G_m = np.where(
+    B_G_m = where(
         B_m == 1,
-        np.where(M == 1, _cnv_h(B_G, FIR), _cnv_v(B_G, FIR)),
+        where(M == 1, _cnv_h(B_G, FIR), _cnv_v(B_G, FIR)),
         0,
     )
-    R_G_m = np.where(
+    R_G_m = where(
         R_m == 1,
-        np.where(M == 1, _cnv_h(R_G, FIR), _cnv_v(R_G, FIR)),
+        where(M == 1, _cnv_h(R_G, FIR), _cnv_v(R_G, FIR)),
         0,
     )
 
     del B_G, R_G
 
-    G = np.where(R_m == 1, R - R_G_m, G)
-    G = np.where(B_m == 1, B - B_G_m, G)
+    G = where(R_m == 1, R - R_G_m, G)
+    G = where(B_m == 1, B - B_G_m, G)
 
     # Updating of the red and blue components in the green locations.
-    # Red rows.
-    R_r = np.transpose(np.any(R_m == 1, axis=1)[np.newaxis]) * np.ones(R.shape)
-    # Red columns.
-    R_c = np.any(R_m == 1, axis=0)[np.newaxis] * np.ones(R.shape)
-    # Blue rows.
-    B_r = np.transpose(np.any(B_m == 1, axis=1)[np.newaxis]) * np.ones(B.shape)
-    # Blue columns.
-    B_c = np.any(B_m == 1, axis=0)[np.newaxis] * np.ones(B.shape)
-
     R_G = R - G
     B_G = B - G
 
     k_b = np.array([0.5, 0, 0.5])
 
-    R_G_m = np.where(
-        np.logical_and(G_m == 1, B_r == 1),
+    R_G_m = where(
+        (G_m == 1) & (B_r == 1),
         _cnv_v(R_G, k_b),
         R_G_m,
     )
-    R = np.where(np.logical_and(G_m == 1, B_r == 1), G + R_G_m, R)
-    R_G_m = np.where(
-        np.logical_and(G_m == 1, B_c == 1),
+    R = where((G_m == 1) & (B_r == 1), G + R_G_m, R)
+    R_G_m = where(
+        (G_m == 1) & (B_c == 1),
         _cnv_h(R_G, k_b),
         R_G_m,
     )
-    R = np.where(np.logical_and(G_m == 1, B_c == 1), G + R_G_m, R)
+    R = where((G_m == 1) & (B_c == 1), G + R_G_m, R)
 
     del B_r, R_G_m, B_c, R_G
 
-    B_G_m = np.where(
-        np.logical_and(G_m == 1, R_r == 1),
+    B_G_m = where(
+        (G_m == 1) & (R_r == 1),
         _cnv_v(B_G, k_b),
         B_G_m,
     )
-    B = np.where(np.logical_and(G_m == 1, R_r == 1), G + B_G_m, B)
-    B_G_m = np.where(
-        np.logical_and(G_m == 1, R_c == 1),
+    B = where((G_m == 1) & (R_r == 1), G + B_G_m, B)
+    B_G_m = where(
+        (G_m == 1) & (R_c == 1),
         _cnv_h(B_G, k_b),
         B_G_m,
     )
-    B = np.where(np.logical_and(G_m == 1, R_c == 1), G + B_G_m, B)
+    B = where((G_m == 1) & (R_c == 1), G + B_G_m, B)
 
     del B_G_m, R_r, R_c, G_m, B_G
 
     # Updating of the red (blue) component in the blue (red) locations.
     R_B = R - B
-    R_B_m = np.where(
+    R_B_m = where(
         B_m == 1,
-        np.where(M == 1, _cnv_h(R_B, FIR), _cnv_v(R_B, FIR)),
+        where(M == 1, _cnv_h(R_B, FIR), _cnv_v(R_B, FIR)),
         0,
     )
-    R = np.where(B_m == 1, B + R_B_m, R)
+    R = where(B_m == 1, B + R_B_m, R)
 
-    R_B_m = np.where(
+    R_B_m = where(
         R_m == 1,
-        np.where(M == 1, _cnv_h(R_B, FIR), _cnv_v(R_B, FIR)),
+        where(M == 1, _cnv_h(R_B, FIR), _cnv_v(R_B, FIR)),
         0,
     )
-    B = np.where(R_m == 1, R - R_B_m, B)
+    B = where(R_m == 1, R - R_B_m, B)
 
     del R_B, R_B_m, R_m
 
-    return tstack([R, G, B])
+    return stack([R, G, B])
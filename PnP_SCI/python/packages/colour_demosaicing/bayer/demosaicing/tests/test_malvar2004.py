@@ -16,6 +16,11 @@ from colour import read_image
 from colour_demosaicing import TESTS_RESOURCES_DIRECTORY
 from colour_demosaicing.bayer import demosaicing_CFA_Bayer_Malvar2004
 
+try:
+    import torch
+except ImportError:  # pragma: no cover
+    torch = None
+
 __author__ = 'Colour Developers'
 __copyright__ = 'Copyright (C) 2015-2020 - Colour Developers'
 __license__ = 'New BSD License - https://opensource.org/licenses/BSD-3-Clause'
@@ -52,6 +57,36 @@ demosaicing_CFA_Bayer_Malvar2004` definition.
                 read_image(str(RGB.format(pattern))),
                 decimal=7)
 
+    def test_demosaicing_CFA_Bayer_Malvar2004_stack(self):
+        """
+        Tests :func:`colour_demosaicing.bayer.demosaicing.malvar2004.\
+demosaicing_CFA_Bayer_Malvar2004` definition with a stack of CFA frames.
+        """
+
+        CFA = np.random.RandomState(4).random_sample((16, 11, 3))
+        for pattern in ('RGGB', 'BGGR', 'GRBG', 'GBRG'):
+            RGB = demosaicing_CFA_Bayer_Malvar2004(CFA, pattern)
+            self.assertEqual(RGB.shape, (16, 11, 3, 3))
+            for i in range(CFA.shape[-1]):
+                np.testing.assert_almost_equal(
+                    RGB[:, :, i],
+                    demosaicing_CFA_Bayer_Malvar2004(CFA[..., i], pattern),
+                    decimal=10)
+
+    @unittest.skipIf(torch is None, 'PyTorch is not available!')
+    def test_demosaicing_CFA_Bayer_Malvar2004_tensor(self):
+        """
+        Tests :func:`colour_demosaicing.bayer.demosaicing.malvar2004.\
+demosaicing_CFA_Bayer_Malvar2004` definition with a :class:`torch.Tensor` stack of CFA frames.
+        """
+
+        CFA = np.random.RandomState(4).random_sample((16, 11, 3))
+        for pattern in ('RGGB', 'BGGR', 'GRBG', 'GBRG'):
+            RGB = demosaicing_CFA_Bayer_Malvar2004(torch.from_numpy(CFA), pattern)
+            self.assertTrue(torch.is_tensor(RGB))
+            np.testing.assert_almost_equal(
+                RGB.numpy(), demosaicing_CFA_Bayer_Malvar2004(CFA, pattern), decimal=10)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -4,6 +4,7 @@ FastDVDnet denoising algorithm
 @author: Matias Tassano <mtassano@parisdescartes.fr>
 """
 import torch
+import torch.nn as nn
 import torch.nn.functional as F
 
 def temp_denoise(model, noisyframe, sigma_noise):
@@ -33,53 +34,200 @@ def temp_denoise(model, noisyframe, sigma_noise):
 
 	return out
 
-def denoise_seq_fastdvdnet(seq, noise_std, windsize, model):
+def temporal_windows(numframes, windsize, mode='circular'):
+	r"""Frame indices of the temporal windows of all the frames of a sequence.
+
+	Parameters
+	----------
+	numframes : scalar
+		  Number of frames N of the sequence.
+	windsize : scalar
+		  Temporal window size (number of frames as input to the model).
+	mode : str
+		  Handling of the edge frames, 'circular' (wrapping around the 
+		  sequence) or 'reflect' (mirroring at the first and last frames).
+
+	Returns
+	-------
+	idx : array_like [torch.Tensor]
+		  Frame indices with size of [N, windsize], the temporal window 
+		  centered at each frame.
+	"""
+	hw = int((windsize-1)//2) # half window size
+	idx = torch.arange(numframes).view(-1, 1) + torch.arange(-hw, windsize-hw).view(1, -1)
+	if mode == 'circular':
+		return idx % numframes
+	if mode == 'reflect':
+		idx = idx.abs() # mirror at the first frame
+		return torch.min(idx, 2*(numframes-1) - idx) # mirror at the last frame
+	raise ValueError('Unsupported temporal padding mode {}!'.format(mode))
+
+def _is_oom(err):
+	return 'out of memory' in str(err)
+
+def _micro_batches(forward, out, batch_size=None, cuda=False):
+	r"""Runs `forward(start, stop)` on the micro-batches of `batch_size` items
+	(all the N items of `out` at once if None), writing the results into
+	`out[start:stop]`. The micro-batches are halved whenever the device runs
+	out of memory, down to a single item per forward pass.
+	"""
+	N = out.shape[0]
+	batch_size = N if batch_size is None else max(1, min(int(batch_size), N))
+	start = 0
+	while start < N:
+		stop = min(start+batch_size, N)
+		try:
+			out[start:stop] = forward(start, stop)
+			retry = False
+		except RuntimeError as err:
+			if not _is_oom(err) or batch_size == 1:
+				raise
+			retry = True
+		if retry:
+			# fall back to smaller micro-batches (the failed pass released)
+			if cuda:
+				torch.cuda.empty_cache()
+			batch_size = max(1, batch_size//2)
+			continue
+		start = stop
+	return out
+
+def denoise_windows(seq, noise_std, idx, model, batch_size=None):
+	r"""Batched denoising of all the temporal windows of a sequence.
+
+	The sequence is padded only once (reflect padding of the width W and the
+	height H to multiples of 4) and all the N windows `seq[idx]` are stacked
+	as a [N, windsize*C, H, W] tensor, which is fed to the model in 
+	micro-batches of `batch_size` windows (all of them at once if None). The
+	micro-batches are halved whenever the device runs out of memory, down to
+	a single window per forward pass.
+
+	With the eager FastDVDnet model (`temp1` and `temp2`), the two stages of the model are run 
+	separately instead (see `denoise_triplets`), the frame triplets shared 
+	by the overlapping windows going through the first stage only once.
+
+	Parameters
+	----------
+	seq : array_like [torch.Tensor]
+		  Input noisy video sequence data with size of [N, C, H, W].
+	noise_std : array_like [torch.Tensor]
+		  Noise standard deviation (a single value).
+	idx : array_like [torch.Tensor]
+		  Frame indices of the temporal windows with size of [N, windsize],
+		  see `temporal_windows`.
+	model : [torch.nn.Module]
+		  Pre-trained model for denoising.
+	batch_size : scalar, optional
+		  Number of windows per forward pass.
+
+	Returns
+	-------
+	seq_denoised : array_like [torch.Tensor]
+		  Output denoised video sequence with size of [N, C, H, W].
+	"""
+	N, C, H, W = seq.shape
+	# make sure the width W and height H multiples of 4 (two scales in the denoiser)
+	M = 4 # multipier
+	wpad, hpad = (-W)%M, (-H)%M
+	if wpad or hpad:
+		seq = F.pad(seq, (0, wpad, 0, hpad), mode='reflect')
+	Hp, Wp = H+hpad, W+wpad
+	# input noise map (constant, with the padded size)
+	noise_map = noise_std.to(seq.dtype).view(1, 1, 1, 1).expand((1, 1, Hp, Wp))
+	idx = idx.to(seq.device)
+	seq_denoised = torch.empty((N, C, H, W), dtype=seq.dtype, device=seq.device)
+
+	net = model.module if isinstance(model, nn.DataParallel) else model
+	if hasattr(net, 'temp1') and hasattr(net, 'temp2'): # two-stage FastDVDnet
+		return denoise_triplets(seq, noise_map, idx, net, seq_denoised, batch_size)
+
+	def forward(start, stop):
+		# [n, windsize, C, H, W] to [n, windsize*C, H, W]
+		noisy_seq = seq[idx[start:stop]].reshape((stop-start, -1, Hp, Wp))
+		frame_denoised = model(noisy_seq, noise_map.expand((stop-start, 1, Hp, Wp)))
+		# unpad the results
+		return frame_denoised[:, :, :H, :W]
+	return _micro_batches(forward, seq_denoised, batch_size, seq.is_cuda)
+
+def denoise_triplets(seq, noise_map, idx, model, seq_denoised, batch_size=None):
+	r"""Two-stage denoising of all the temporal windows of a sequence with 
+	FastDVDnet, sharing the first stage across the overlapping windows.
+
+	The first stage of FastDVDnet (`temp1`) denoises the three frame triplets
+	(i-2..i, i-1..i+1, i..i+2) of each window, which are shared by up to 
+	three adjacent windows. Each distinct triplet of the N windows goes 
+	through the first stage once (about N triplets instead of 3N), and the
+	inputs of the second stage (`temp2`) of each window are gathered from 
+	the cached outputs, with the same results as the whole model. Both 
+	stages run in micro-batches of `batch_size` triplets and windows (see 
+	`denoise_windows`).
+
+	Parameters
+	----------
+	seq : array_like [torch.Tensor]
+		  Padded noisy video sequence data with size of [N, C, Hp, Wp].
+	noise_map : array_like [torch.Tensor]
+		  Noise map with size of [1, 1, Hp, Wp].
+	idx : array_like [torch.Tensor]
+		  Frame indices of the temporal windows with size of [N, 5].
+	model : [FastDVDnet]
+		  Pre-trained FastDVDnet model (without the DataParallel wrapper).
+	seq_denoised : array_like [torch.Tensor]
+		  Output denoised video sequence with size of [N, C, H, W].
+	batch_size : scalar, optional
+		  Number of triplets or windows per forward pass.
+
+	Returns
+	-------
+	seq_denoised : array_like [torch.Tensor]
+		  Output denoised video sequence with size of [N, C, H, W].
+	"""
+	N, C, H, W = seq_denoised.shape
+	Hp, Wp = seq.shape[-2:]
+	# distinct frame triplets of the first stage and those of each window
+	triplets = torch.stack([idx[:, k:k+3] for k in range(3)], 1).reshape(-1, 3)
+	triplets, inverse = torch.unique(triplets, dim=0, return_inverse=True)
+	inverse = inverse.view(N, 3)
+
+	def temp1(start, stop):
+		t = triplets[start:stop]
+		return model.temp1(seq[t[:, 0]], seq[t[:, 1]], seq[t[:, 2]],
+						   noise_map.expand((stop-start, 1, Hp, Wp)))
+	stage1 = torch.empty((triplets.shape[0], C, Hp, Wp), dtype=seq.dtype, device=seq.device)
+	_micro_batches(temp1, stage1, batch_size, seq.is_cuda)
+
+	def temp2(start, stop):
+		i = inverse[start:stop]
+		frame_denoised = model.temp2(stage1[i[:, 0]], stage1[i[:, 1]], stage1[i[:, 2]],
+									 noise_map.expand((stop-start, 1, Hp, Wp)))
+		# unpad the results
+		return frame_denoised[:, :, :H, :W]
+	return _micro_batches(temp2, seq_denoised, batch_size, seq.is_cuda)
+
+def denoise_seq_fastdvdnet(seq, noise_std, windsize, model, batch_size=None):
 	r"""Denoises a sequence of frames with FastDVDnet.
 	Args:
 		seq: Tensor. [numframes, 1, C, H, W] array containing the noisy input frames
 		noise_std: Tensor. Standard deviation of the added noise
 		windsize: size of the temporal patch
 		model_temp: instance of the PyTorch model of the temporal denoiser
+		batch_size: number of temporal patches per forward pass (all at once
+			if None), see `denoise_windows`
 	Returns:
 		denframes: Tensor, [numframes, C, H, W]
 	"""
-	# init arrays to handle contiguous frames and related patches
-	# print(seq.shape)
-	numframes, C, H, W = seq.shape
-	ctrlfr_idx = int((windsize-1)//2)
-	inframes = list()
-	denframes = torch.empty((numframes, C, H, W)).to(seq.device)
-
-	# build noise map from noise std---assuming Gaussian noise
-	noise_map = noise_std.expand((1, 1, H, W))
-
-	for fridx in range(numframes):
-		# load input frames
-		if not inframes:
-		# if list not yet created, fill it with temp_patchsz frames
-			for idx in range(windsize):
-				relidx = abs(idx-ctrlfr_idx) # handle border conditions, mirror padding
-				inframes.append(seq[relidx])
-		else:
-			del inframes[0]
-			relidx = min(fridx + ctrlfr_idx, -fridx + 2*(numframes-1)-ctrlfr_idx) # handle border conditions
-			inframes.append(seq[relidx])
-
-		inframes_t = torch.stack(inframes, dim=0).contiguous().view((1, windsize*C, H, W)).to(seq.device)
-
-		# append result to output list
-		denframes[fridx] = temp_denoise(model, inframes_t, noise_map)
+	# mirror padding of the edge frames
+	idx = temporal_windows(seq.shape[0], windsize, mode='reflect')
+	denframes = denoise_windows(seq, noise_std, idx, model, batch_size)
 
 	# free memory up
-	del inframes
-	del inframes_t
-	torch.cuda.empty_cache()
+	if seq.is_cuda:
+		torch.cuda.empty_cache()
 
-	# convert to appropiate type and return
 	return denframes
 
 
-def fastdvdnet_seqdenoise(seq, noise_std, windsize, model):
+def fastdvdnet_seqdenoise(seq, noise_std, windsize, model, batch_size=None):
 	r"""Denoising a video sequence with FastDVDnet.
 	
 	Parameters 
@@ -95,6 +243,9 @@ def fastdvdnet_seqdenoise(seq, noise_std, windsize, model):
 		  Temporal window size (number of frames as input to the model).
 	model : [torch.nn.Module]
 		  Pre-trained model for denoising.
+	batch_size : scalar, optional
+		  Number of temporal windows per forward pass (all the N windows in a
+		  single pass if None), see `denoise_windows`.
 	
 	Returns
 	-------
@@ -102,43 +253,6 @@ def fastdvdnet_seqdenoise(seq, noise_std, windsize, model):
 		  Output denoised video sequence, with the same size as the input, 
 		  that is [N, C, H, W].
 	"""
-	# init arrays to handle contiguous frames and related patches
-	# print(seq.shape)
-	N, C, H, W = seq.shape
-	hw = int((windsize-1)//2) # half window size
-	seq_denoised = torch.empty((N, C, H, W)).to(seq.device)
-	# input noise map 
-	noise_map = noise_std.expand((1, 1, H, W))
-
-	for frameidx in range(N):
-		# cicular padding for edge frames in the video sequence
-		idx = (torch.tensor(range(frameidx, frameidx+windsize)) - hw) % N # circular padding
-		noisy_seq = seq[idx].reshape((1, -1, H, W)) # reshape from [W, C, H, W] to [1, W*C, H, W]
-		
-		# make sure the width W and height H multiples of 4
-		#   pad the width W and height H to multiples of 4
-		M = 4 # multipier
-		wpad, hpad = W%M, H%M
-		if wpad:
-			wpad = M-wpad
-		if hpad:
-			hpad = M-hpad
-		pad = (0, wpad, 0, hpad) 
-		noisy_seq = F.pad(noisy_seq, pad, mode='reflect')
-		noise_map = F.pad(noise_map, pad, mode='reflect')
-		
-		# apply the denoising model to the input datat
-		frame_denoised = model(noisy_seq, noise_map)
-
-		# unpad the results
-		if wpad:
-			frame_denoised = frame_denoised[:, :, :, :-wpad]
-		if hpad:
-			frame_denoised = frame_denoised[:, :, :-hpad, :]
-		
-		seq_denoised[frameidx] = frame_denoised
-
-		# # apply the denoising model to the input datat
-		# seq_denoised[frameidx] = model(noisy_seq, noise_map)
-
-	return seq_denoised
\ No newline at end of file
+	# cicular padding for edge frames in the video sequence
+	idx = temporal_windows(seq.shape[0], windsize, mode='circular')
+	return denoise_windows(seq, noise_std, idx, model, batch_size)
@@ -13,12 +13,46 @@ import torch.nn as nn
 from .models import FastDVDnet
 from .fastdvdnet import fastdvdnet_seqdenoise, denoise_seq_fastdvdnet
 from .utils import batch_psnr, init_logger_test, \
-				variable_to_cv2_image, remove_dataparallel_wrapper, open_sequence, close_logger
+				variable_to_cv2_image, remove_dataparallel_wrapper, open_sequence, close_logger, load_weights
 
 NUM_IN_FR_EXT = 5 # temporal size of patch
 MC_ALGO = 'DeepFlow' # motion estimation algorithm
 OUTIMGEXT = '.png' # output images format
 
+_models = {} # resident models loaded by load_fastdvdnet, keyed by (model_fn, gray, useGPU)
+
+def load_fastdvdnet(model_fn=None, gray=False, useGPU=None):
+	r"""Loads the FastDVDnet model with pretrained weights ('model_gray.pth'
+	for grayscale and 'model.pth' for color videos by default, next to this
+	file). The model is created only once per process and the same instance
+	is returned afterwards. The model runs on the GPU if `useGPU` (if available
+	when None).
+	"""
+	if useGPU is None:
+		useGPU = torch.cuda.is_available()
+	if model_fn is None:
+		model_fn = 'model_gray.pth' if gray else 'model.pth' # [pre-trained] model for grayscale/color videos
+	# Absolute path to model file
+	model_fn = os.path.join(os.path.abspath(os.path.dirname(__file__)), model_fn)
+	key = (model_fn, gray, useGPU)
+	if key not in _models:
+		nColor = 1 if gray else 3 # number of color channels (3 - RGB color, 1 - grayscale)
+		model = FastDVDnet(num_input_frames=NUM_IN_FR_EXT, num_color_channels=nColor)
+
+		# Load saved weights
+		device = torch.device('cuda' if useGPU else 'cpu')
+		state_temp_dict = load_weights(model_fn, map_location=device)
+		if next(iter(state_temp_dict)).startswith('module.'):
+			# remove the DataParallel wrapper
+			state_temp_dict = remove_dataparallel_wrapper(state_temp_dict)
+		model.load_state_dict(state_temp_dict)
+		model = model.to(device)
+
+		# Sets the model in evaluation mode (e.g. it removes BN)
+		model.eval()
+		_models[key] = model
+	return _models[key]
+
 def save_out_seq(seqnoisy, seqclean, save_dir, sigmaval, suffix, save_noisy):
 	"""Saves the denoised and noisy sequences under save_dir
 	"""
@@ -78,7 +112,7 @@ def test_fastdvdnet(**args):
 	model_temp = FastDVDnet(num_input_frames=NUM_IN_FR_EXT)
 
 	# Load saved weights
-	state_temp_dict = torch.load(args['model_file'])
+	state_temp_dict = load_weights(args['model_file'])
 	if args['cuda']:
 		device_ids = [0]
 		model_temp = nn.DataParallel(model_temp, device_ids=device_ids).cuda()
@@ -141,60 +175,56 @@ def test_fastdvdnet(**args):
 	# close logger
 	close_logger(logger)
 
-def fastdvdnet_denoiser(vnoisy, sigma, model=None, useGPU=True, gray=False):
-	r"""Denoise an input video (H x W x F x C for color video, and H x W x F for
-	     grayscale video) with FastDVDnet
+def fastdvdnet_tensor_denoiser(vnoisy, sigma, model, gray=False, batch_size=None):
+	r"""Denoise an input video tensor (H x W x F x C for color video, and 
+	     H x W x F for grayscale video, on the device of the model) with 
+	     FastDVDnet, keeping the result on the device, with the temporal 
+	     windows of all the F frames in micro-batches of `batch_size` windows
+	     (in a single forward pass if None, see `fastdvdnet.denoise_windows`)
 	"""
-	# start_time = time.time()
-	nColor = 1 if gray else 3 # number of color channels (3 - RGB color, 1 - grayscale)
-	# Sets data type according to CPU or GPU modes
-	if useGPU:
-		device = torch.device('cuda')
-	else:
-		device = torch.device('cpu')
-
-	if model is None:
-		model = FastDVDnet(num_input_frames=NUM_IN_FR_EXT, num_color_channels=nColor)
-
-		# Load saved weights
-		if gray:
-			state_temp_dict = torch.load('model_gray.pth') # [pre-trained] model for grayscale videos
-		else:
-			state_temp_dict = torch.load('model.pth') # [pre-trained] model for color videos
-		if useGPU:
-			device_ids = [0]
-			model = nn.DataParallel(model, device_ids=device_ids).cuda()
-		else:
-			# CPU mode: remove the DataParallel wrapper
-			state_temp_dict = remove_dataparallel_wrapper(state_temp_dict)
-		model.load_state_dict(state_temp_dict)
-
 	# Sets the model in evaluation mode (e.g. it removes BN)
 	model.eval()
 
 	with torch.no_grad():
-		# vnoisy = vnoisy.transpose((2,3,0,1)) # [do it in torch] from H x W x F x C to F x C x H x W
-		vnoisy = torch.from_numpy(vnoisy).type('torch.FloatTensor').to(device)
-		noisestd = torch.FloatTensor([sigma]).to(device)
+		noisestd = torch.tensor([sigma], dtype=vnoisy.dtype, device=vnoisy.device)
 
 		if gray:
 			vnoisy = vnoisy.unsqueeze(3) # unsqueeze the color dimension - [H,W,F] to [H,W,F,C=1]
 		vnoisy = vnoisy.permute(2, 3, 0, 1) # from H x W x F x C to F x C x H x W 
-		# print(vnoisy.finfo, noisestd.finfo)
 
-		# print(torch.max(vnoisy),torch.min(vnoisy))
 		# vnoisy = torch.clamp(vnoisy,0.,1.)
 		outv = fastdvdnet_seqdenoise( seq=vnoisy,\
 									  noise_std=noisestd,\
 									  windsize=NUM_IN_FR_EXT,\
-									  model=model )
-		# print(outv.shape)
-		# print(torch.max(outv),torch.min(outv))
+									  model=model,\
+									  batch_size=batch_size )
 		outv = outv.permute(2, 3, 0, 1) # back from F x C x H x W to H x W x F x C
 		if gray:
 			outv = outv.squeeze(3) # squeeze the color dimension - [H,W,F,C=1] to [H,W,F]
-		outv = outv.data.cpu().numpy()
-		# outv = outv.transpose((2,3,0,1)) # [do it in torch] back from F x C x H x W to H x W x F x C
+
+	return outv
+
+def fastdvdnet_denoiser(vnoisy, sigma, model=None, useGPU=None, gray=False, batch_size=None):
+	r"""Denoise an input video (H x W x F x C for color video, and H x W x F for
+	     grayscale video) with FastDVDnet, with the temporal windows of all the F
+	     frames in micro-batches of `batch_size` windows (in a single forward
+	     pass if None, see `fastdvdnet_tensor_denoiser`)
+	"""
+	# start_time = time.time()
+	# Sets data type according to CPU or GPU modes (GPU if available when None)
+	if useGPU is None:
+		useGPU = torch.cuda.is_available()
+	if useGPU:
+		device = torch.device('cuda')
+	else:
+		device = torch.device('cpu')
+
+	if model is None:
+		model = load_fastdvdnet(gray=gray, useGPU=useGPU) # loaded once per process
+
+	vnoisy = torch.from_numpy(vnoisy).type('torch.FloatTensor').to(device)
+	outv = fastdvdnet_tensor_denoiser(vnoisy, sigma, model, gray=gray, batch_size=batch_size)
+	outv = outv.data.cpu().numpy()
 
 	# stop_time = time.time()
 	# print('    FastDVDnet video denoising eclipsed in {:.3f}s.'.format(stop_time-start_time))
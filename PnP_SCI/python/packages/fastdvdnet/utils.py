@@ -365,3 +365,22 @@ def remove_dataparallel_wrapper(state_dict):
 		new_state_dict[name] = v
 
 	return new_state_dict
+
+def load_weights(model_fn, map_location=None, mmap=True):
+	r"""Loads the (pretrained) weights saved in model_fn with torch.load,
+	memory-mapped if mmap (PyTorch >= 2.1), so that the tensors are paged in
+	from the file on demand instead of being read at once, which shortens the
+	cold starts. Falls back to a plain torch.load for older PyTorch versions
+	and for the legacy (non-zipfile) checkpoints, which cannot be mapped.
+
+	Args:
+		model_fn: path to the saved weights
+		map_location: as in torch.load
+		mmap: memory-map the weights
+	"""
+	if mmap:
+		try:
+			return torch.load(model_fn, map_location=map_location, mmap=True)
+		except (TypeError, RuntimeError): # PyTorch < 2.1 or legacy checkpoint
+			pass
+	return torch.load(model_fn, map_location=map_location)
@@ -23,13 +23,45 @@ from torch.autograd import Variable
 # 				variable_to_cv2_image, remove_dataparallel_wrapper, is_rgb
 from .models import FFDNet
 from .utils import batch_psnr, normalize, init_logger_ipol, \
-				variable_to_cv2_image, remove_dataparallel_wrapper, is_rgb
+				variable_to_cv2_image, remove_dataparallel_wrapper, is_rgb, load_weights
 
 # os.environ["CUDA_DEVICE_ORDER"] = "PCI_BUS_ID"
 # os.environ["CUDA_VISIBLE_DEVICES"] = "0"
 
+_models = {} # resident models loaded by load_ffdnet, keyed by (model_fn, in_ch, useGPU)
 
-def ffdnet_imdenoiser(imnoisy, sigma, model=None, useGPU=True):
+def load_ffdnet(model_fn='models/net_gray.pth', in_ch=1, useGPU=None):
+	r"""Loads the FFDNet model with pretrained weights. The model is created
+	only once per process and the same instance is returned afterwards. The
+	model runs on the GPU if `useGPU` (if available when None).
+	"""
+	if useGPU is None:
+		useGPU = torch.cuda.is_available()
+	# Absolute path to model file
+	model_fn = os.path.join(os.path.abspath(os.path.dirname(__file__)), \
+				model_fn)
+	key = (model_fn, in_ch, useGPU)
+	if key not in _models:
+		# Create model
+		net = FFDNet(num_input_channels=in_ch)
+		# Load saved weights
+		if useGPU:
+			state_dict = load_weights(model_fn)
+			device_ids = [0]
+			model = nn.DataParallel(net, device_ids=device_ids).cuda()
+		else:
+			state_dict = load_weights(model_fn, map_location='cpu')
+			# CPU mode: remove the DataParallel wrapper
+			state_dict = remove_dataparallel_wrapper(state_dict)
+			model = net
+		model.load_state_dict(state_dict)
+		# Sets the model in evaluation mode (e.g. it removes BN)
+		model.eval()
+		_models[key] = model
+	return _models[key]
+
+
+def ffdnet_imdenoiser(imnoisy, sigma, model=None, useGPU=None):
 	r"""Denoises an input image (M x N) with FFDNet
 	"""
 	# from HxWxC to  CxHxW grayscale image (C=1)
@@ -53,26 +85,7 @@ def ffdnet_imdenoiser(imnoisy, sigma, model=None, useGPU=True):
 	imnoisy = torch.Tensor(imnoisy)
 
 	if model is None:
-		in_ch = 1
-		model_fn = 'models/net_gray.pth'
-		# Absolute path to model file
-		model_fn = os.path.join(os.path.abspath(os.path.dirname(__file__)), \
-					model_fn)
-
-		# Create model
-		print('Loading model ...\n')
-		net = FFDNet(num_input_channels=in_ch)
-		# Load saved weights
-		if useGPU:
-			state_dict = torch.load(model_fn)
-			device_ids = [0]
-			model = nn.DataParallel(net, device_ids=device_ids).cuda()
-		else:
-			state_dict = torch.load(model_fn, map_location='cpu')
-			# CPU mode: remove the DataParallel wrapper
-			state_dict = remove_dataparallel_wrapper(state_dict)
-			model = net
-		model.load_state_dict(state_dict)
+		model = load_ffdnet(useGPU=useGPU) # loaded once per process
 
 	# Sets the model in evaluation mode (e.g. it removes BN)
 	model.eval()
@@ -96,86 +109,58 @@ def ffdnet_imdenoiser(imnoisy, sigma, model=None, useGPU=True):
 
 	return outim
 
-def ffdnet_vdenoiser(vnoisy, sigma, model=None, useGPU=True):
-	r"""Denoises an input video (M x N x F) with FFDNet in a frame-wise manner
+def _frame_sigma(sigma, nframe, device):
+	r"""Noise levels of all the frames of a batch, either a single `sigma` for
+	all of them or one sigma per frame, as a tensor of length `nframe`.
+	"""
+	sigma = np.array(np.broadcast_to(np.asarray(sigma, dtype=np.float32).reshape(-1), (nframe,)))
+	return torch.from_numpy(sigma).to(device)
+
+def ffdnet_tensor_denoiser(vnoisy, sigma, model):
+	r"""Denoises an input video tensor (M x N x F, on the device of the model)
+	    with FFDNet in a frame-wise manner, with all the F frames as a batch
+	    in a single forward pass, keeping the result on the device. The noise
+	    level `sigma` is either a scalar or one value per frame (length F).
 	"""
-	if model is None:
-		in_ch = 1
-		model_fn = 'models/net_gray.pth'
-		# Absolute path to model file
-		model_fn = os.path.join(os.path.abspath(os.path.dirname(__file__)), \
-					model_fn)
-
-		# Create model
-		# print('Loading model ...\n')
-		net = FFDNet(num_input_channels=in_ch)
-		# Load saved weights
-		if useGPU:
-			state_dict = torch.load(model_fn)
-			device_ids = [0]
-			model = nn.DataParallel(net, device_ids=device_ids).cuda()
-		else:
-			state_dict = torch.load(model_fn, map_location='cpu')
-			# CPU mode: remove the DataParallel wrapper
-			state_dict = remove_dataparallel_wrapper(state_dict)
-			model = net
-		model.load_state_dict(state_dict)
-
 	# Sets the model in evaluation mode (e.g. it removes BN)
 	model.eval()
 
-
-	# apply FFDNet denoising for each frame
+	# all the frames as a batch, from M x N x F to F x C x M x N (C=1)
 	vshape = vnoisy.shape
-	vnoisy = vnoisy.reshape(*vshape[0:2],-1)
-	nmask = vnoisy.shape[-1]
-	outv = np.zeros(vnoisy.shape)
-	for imask in range(nmask):
-		# imnoisy = vnoisy[:,:,imask]*255 # to match the scale of the input [0,255]
-		imnoisy = vnoisy[:,:,imask] # to match the scale of the input [0,255]
-
-		# from HxWxC to  CxHxW grayscale image (C=1)
-		imnoisy = np.expand_dims(imnoisy, 0)
-		imnoisy = np.expand_dims(imnoisy, 0)
-
-		# # Handle odd sizes
-		# expanded_h = False
-		# expanded_w = False
-		# sh_im = imorig.shape
-		# if sh_im[2]%2 == 1:
-		# 	expanded_h = True
-		# 	imorig = np.concatenate((imorig, \
-		# 			imorig[:, :, -1, :][:, :, np.newaxis, :]), axis=2)
-
-		# if sh_im[3]%2 == 1:
-		# 	expanded_w = True
-		# 	imorig = np.concatenate((imorig, \
-		# 			imorig[:, :, :, -1][:, :, :, np.newaxis]), axis=3)
-
-		# imnoisy = normalize(imnoisy) # omit normalization
-		imnoisy = torch.Tensor(imnoisy)
-		# Sets data type according to CPU or GPU modes
-		if useGPU:
-			dtype = torch.cuda.FloatTensor
-		else:
-			dtype = torch.FloatTensor
-
-		# Test mode
-		with torch.no_grad(): # PyTorch v0.4.0
-		    imnoisy = Variable(imnoisy.type(dtype))
-		    sigma = Variable(torch.FloatTensor([sigma]).type(dtype))
+	imnoisy = vnoisy.reshape(*vshape[0:2],-1).permute(2, 0, 1).unsqueeze(1)
+	# imnoisy = normalize(imnoisy) # omit normalization
 
+	# Test mode
+	with torch.no_grad():
 		# Estimate noise and subtract it to the input image
-		im_noise_estim = model(imnoisy, sigma)
+		im_noise_estim = model(imnoisy, _frame_sigma(sigma, imnoisy.shape[0], imnoisy.device))
 
 		# # with clip/clamp
 		# outim = torch.clamp(imnoisy-im_noise_estim, 0., 1.)
 		# without clip/clamp
 		outim = imnoisy - im_noise_estim
-		outv[:,:,imask] = (outim.data.cpu().numpy()[0, 0, :])
-	
-	outv = outv.reshape(vshape)
-	return outv
+
+	# back from F x C x M x N to M x N x F
+	return outim[:, 0].permute(1, 2, 0).reshape(vshape)
+
+def ffdnet_vdenoiser(vnoisy, sigma, model=None, useGPU=None):
+	r"""Denoises an input video (M x N x F) with FFDNet in a frame-wise manner,
+	    with all the F frames as a batch in a single forward pass (see 
+	    `ffdnet_tensor_denoiser`). The noise level `sigma` is either a scalar
+	    or one value per frame (length F).
+	"""
+	if useGPU is None: # GPU if available
+		useGPU = torch.cuda.is_available()
+	if model is None:
+		model = load_ffdnet(useGPU=useGPU) # loaded once per process
+
+	# Sets data type according to CPU or GPU modes
+	device = torch.device('cuda' if useGPU else 'cpu')
+
+	# converted to a tensor (and back) once for all the frames
+	imnoisy = torch.from_numpy(np.ascontiguousarray(vnoisy, dtype=np.float32)).to(device)
+	outv = ffdnet_tensor_denoiser(imnoisy, sigma, model).cpu().numpy()
+	return outv.astype(np.result_type(vnoisy, np.float32), copy=False)
 
 
 # convert single (HxWxC) to 4-dimensional torch tensor
@@ -192,37 +177,24 @@ def tensor2single(img):
     return img
 
 def ffdnet_rgb_denoise(x, sigma,model):
-    
-    #model_path = os.path.join(model_pool, model_name+'.pth')
-
-    # ----------------------------------------
-  
-    #need_H = True if H_path is not None else False
-    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
- 
-
-    # ----------------------------------------
-    # load model
-    # ----------------------------------------
-
-    #from packages.ffdnet.models.network_ffdnet import FFDNet as net
-    
-    
-    (nrow, ncol, ncolor,nmask) = x.shape
-    outv = np.zeros(x.shape)
-    
-    for imask in range(nmask):
-    #img_L = util.uint2single(x)
-        x_L = x[:,:,:,imask]
-        img_L = single2tensor4(x_L)
-        img_L = img_L.to(device)
-    
-        sigma1 = torch.full((1,1,1,1), sigma).type_as(img_L)
-        img_E = model(img_L, sigma1)
-        x_d = tensor2single(img_E)
-#        x_d = x_d/255
-        outv[:,:,:,imask] = x_d #(x_d.data.cpu().numpy()[0, 0, 0,:])
-    return outv
+	r"""Denoises an input color video (H x W x C x F) with FFDNet in a 
+	    frame-wise manner, with all the F frames as a batch in a single 
+	    forward pass. The noise level `sigma` is either a scalar or one value
+	    per frame (length F).
+	"""
+	device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+
+	# all the frames as a batch, from H x W x C x F to F x C x H x W
+	img_L = np.ascontiguousarray(x.transpose(3, 2, 0, 1), dtype=np.float32)
+	img_L = torch.from_numpy(img_L).to(device)
+	sigma1 = _frame_sigma(sigma, img_L.shape[0], device).view(-1, 1, 1, 1)
+
+	with torch.no_grad():
+		img_E = model(img_L, sigma1)
+
+	# back from F x C x H x W to H x W x C x F
+	outv = img_E.permute(2, 3, 1, 0).float().cpu().numpy()
+	return outv.astype(np.result_type(x, np.float32), copy=False)
 
 def test_ffdnet(**args):
 	r"""Denoises an input image with FFDNet
@@ -278,11 +250,11 @@ def test_ffdnet(**args):
 
 	# Load saved weights
 	if args['cuda']:
-		state_dict = torch.load(model_fn)
+		state_dict = load_weights(model_fn)
 		device_ids = [0]
 		model = nn.DataParallel(net, device_ids=device_ids).cuda()
 	else:
-		state_dict = torch.load(model_fn, map_location='cpu')
+		state_dict = load_weights(model_fn, map_location='cpu')
 		# CPU mode: remove the DataParallel wrapper
 		state_dict = remove_dataparallel_wrapper(state_dict)
 		model = net
@@ -1,26 +1,33 @@
 import time
+_t0 = time.perf_counter()
 import math
-import skimage
 import numpy as np
-from skimage.restoration import (denoise_tv_chambolle, denoise_bilateral,
-                                 denoise_wavelet, estimate_sigma)
+import os
+import sys
+# shared image quality assessment of the SCI models (in `[utils]` of the repo)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '[utils]'))
+from sci_metrics import frame_iqa
+from denoisers import get_denoiser
+from utils import (A_, At_, psnr, SCIOperator, parallel_map, parallel_imap, EarlyStopping, DtypePolicy, 
+                   bayer_pack, bayer_unpack, tile_grid, tile_window, MatFile, 
+                   pyramid_down, pyramid_up, TorchSCIOperator, to_numpy, IterationHooks, IQAMonitor, Acceleration, AdaptivePenalty,
+                   lazy_function, record_import)
+# skimage, the deep denoisers (torch) and the demosaicing are imported on their first call
+denoise_tv_chambolle = lazy_function('skimage.restoration', 'denoise_tv_chambolle')
+denoise_wavelet = lazy_function('skimage.restoration', 'denoise_wavelet')
 # from packages.vnlnet.test import vnlnet
-from packages.ffdnet.test_ffdnet_ipol import (ffdnet_vdenoiser, ffdnet_rgb_denoise)
-from packages.fastdvdnet.test_fastdvdnet import fastdvdnet_denoiser
-# from packages.colour_demosaicing.bayer import demosaicing_CFA_Bayer_bilinear as demosaicing_bayer
-from packages.colour_demosaicing.bayer import demosaicing_CFA_Bayer_Menon2007 as demosaicing_bayer
-from utils import (A_, At_, psnr)
-if skimage.__version__ < '0.18':
-    from skimage.measure import (compare_psnr, compare_ssim)
-else: # skimage.measure deprecated in version 0.18 ( -> skimage.metrics )
-    import skimage.metrics.peak_signal_noise_ratio as compare_psnr
-    import skimage.metrics.structural_similarity   as compare_ssim
+ffdnet_vdenoiser = lazy_function('packages.ffdnet.test_ffdnet_ipol', 'ffdnet_vdenoiser')
+ffdnet_rgb_denoise = lazy_function('packages.ffdnet.test_ffdnet_ipol', 'ffdnet_rgb_denoise')
+fastdvdnet_denoiser = lazy_function('packages.fastdvdnet.test_fastdvdnet', 'fastdvdnet_denoiser')
+# demosaicing_bayer = lazy_function('packages.colour_demosaicing.bayer', 'demosaicing_CFA_Bayer_bilinear')
+demosaicing_bayer = lazy_function('packages.colour_demosaicing.bayer', 'demosaicing_CFA_Bayer_Menon2007')
 
 
 def gap_denoise_bayer(y_bayer, Phi_bayer, _lambda=1, accelerate=True, 
                 denoiser='tv', iter_max=50, noise_estimate=True, sigma=None, 
                 tv_weight=0.1, tv_iter_max=5, multichannel=True, x0_bayer=None, 
-                X_orig=None, model=None, show_iqa=True):
+                X_orig=None, model=None, show_iqa=True, callback=None,
+                iqa_every=1, window_batch=None):
     '''
     Generalized alternating projection (GAP)[1]-based denoising regularization 
     for snapshot compressive imaging (SCI).
@@ -67,6 +74,13 @@ def gap_denoise_bayer(y_bayer, Phi_bayer, _lambda=1, accelerate=True,
         Start point (initialized value) for the iteration process of the 
         reconstruction.
     model : pretrained model for image/video denoising.
+    window_batch : int, optional
+        Number of temporal windows per forward pass of FastDVDnet (all the
+        frames at once by default, see `fastdvdnet.denoise_windows`).
+    iqa_every : int, optional
+        Interval (in iterations) of the PSNR evaluation (see `utils.IQAMonitor`).
+    callback : callable or list of callables, optional
+        Per-iteration profiling hooks (see `utils.IterationHooks`).
 
     Returns
     -------
@@ -96,7 +110,7 @@ def gap_denoise_bayer(y_bayer, Phi_bayer, _lambda=1, accelerate=True,
     --------
     admm_denoise
     '''
-    bayer = [[0,0], [0,1], [1,0], [1,1]] # Bayer pattern 2-by-2
+    # Bayer pattern 2-by-2 [0,0], [0,1], [1,0], [1,1] (see `utils.bayer_pack`)
     # bmode = [3,2,1,0]; # Bayer pattern mode 'BGGR'
     bmode = [0,1,2,3]; # Bayer pattern mode 'RGGB'
 
@@ -107,34 +121,17 @@ def gap_denoise_bayer(y_bayer, Phi_bayer, _lambda=1, accelerate=True,
 
     # stack the bayer channels at the last dimension [consistent to image color channels]
     (nrow, ncol, nmask) = Phi_bayer.shape
-    yall = np.zeros([nrow//2, ncol//2, 4], dtype=np.float32)
-    Phiall = np.zeros([nrow//2, ncol//2, nmask, 4], dtype=np.float32)
-    Phi_sumall = np.zeros([nrow//2, ncol//2, 4], dtype=np.float32)
-    x0all = np.zeros([nrow//2, ncol//2, nmask, 4], dtype=np.float32)
-    
-    # iterative solve for each Bayer channel
-    for ib in range(len(bayer)): 
-        b = bayer[ib]
-        yall[...,ib] = y_bayer[b[0]::2, b[1]::2]
-        Phiall[...,ib] =  Phi_bayer[b[0]::2, b[1]::2]
-        # y = y_bayer[b[0]::2][b[1]::2]
-        # Phi = Phi_bayer[b[0]::2][b[1]::2]
-
-        # A  = lambda x :  A_(x, Phi) # forward model function handle
-        # At = lambda y : At_(y, Phi) # transpose of forward model
-
-        Phib = Phiall[...,ib]
-        Phib_sum = np.sum(Phib, axis=2)
-        Phib_sum[Phib_sum==0] = 1
-
-        Phi_sumall[...,ib] = Phib_sum
-
-        # [0] initialization
-        if x0_bayer is None:
-            # x0 = At(y, Phi) # default start point (initialized value)
-            x0all[...,ib] = At_(yall[...,ib], Phiall[...,ib]) # default start point (initialized value)
-        else:
-            x0all[...,ib] = x0_bayer[b[0]::2,b[1]::2]
+    yall = bayer_pack(y_bayer).astype(np.float32)           # H/2 x W/2 x 4
+    Phiall = bayer_pack(Phi_bayer).astype(np.float32)       # H/2 x W/2 x nmask x 4
+    Phi_sumall = np.sum(Phiall, axis=2)
+    Phi_sumall[Phi_sumall==0] = 1
+
+    # [0] initialization
+    if x0_bayer is None:
+        # x0 = At(y, Phi) # default start point (initialized value)
+        x0all = yall[:,:,np.newaxis]*Phiall # default start point (initialized value)
+    else:
+        x0all = bayer_pack(x0_bayer).astype(np.float32)
 
     # y1 = np.zeros(y.shape)
     y1all = np.zeros_like(yall) 
@@ -142,21 +139,23 @@ def gap_denoise_bayer(y_bayer, Phi_bayer, _lambda=1, accelerate=True,
     xall = x0all # initialization
     x_bayer = np.zeros_like(Phi_bayer)
 
-    psnr_all = []
+    # per-iteration profiling hooks (disabled without callback)
+    hooks = IterationHooks(callback, 'GAP-'+denoiser.upper())
+    # throttled IQA in a background thread (disabled without X_orig)
+    iqa = IQAMonitor(X_orig, iqa_every, hooks.solver, show=show_iqa, transform=bayer_unpack)
     k = 0
     for idx, nsig in enumerate(sigma): # iterate all noise levels
         for it in range(iter_max[idx]): 
-            start_time = time.time()
-            for ib in range(len(bayer)): # iterate all bayer channels
-                yb = A_(xall[...,ib], Phiall[...,ib])
-                if accelerate: # accelerated version of GAP
-                    y1all[...,ib] += (yall[...,ib]-yb)
-                    xall[...,ib] += _lambda*(At_((y1all[...,ib]-yb)/Phi_sumall[...,ib], Phiall[...,ib])) # GAP_acc
-                else:
-                    xall[...,ib] += _lambda*(At_((yall[...,ib]-yb)/Phi_sumall[...,ib], Phiall[...,ib])) # GAP
+            hooks.start()
+            # all bayer channels at once
+            yb = np.einsum('ijkb,ijkb->ijb', xall, Phiall)
+            if accelerate: # accelerated version of GAP
+                y1all += (yall-yb)
+                xall += _lambda*(((y1all-yb)/Phi_sumall)[:,:,np.newaxis]*Phiall) # GAP_acc
+            else:
+                xall += _lambda*(((yall-yb)/Phi_sumall)[:,:,np.newaxis]*Phiall) # GAP
             
-            end_time = time.time()
-            # print('    Euclidean projection eclipsed in {:.3f}s.'.format(end_time-start_time))
+            hooks.lap('proj')
             # joint Bayer multi-channel denoising
             # switch denoiser 
             if denoiser.lower() == 'tv': # total variation (TV) denoising
@@ -190,12 +189,9 @@ def gap_denoise_bayer(y_bayer, Phi_bayer, _lambda=1, accelerate=True,
                 xall[...,1] = xrgb4[...,1] # G2=G1 channel (average over two)
                 xall[...,3] = xrgb4[...,0] # B  channel (average over two)
             elif denoiser.lower() == 'ffdnet_color_demosaic':
-                x_rgb = np.zeros([nrow, ncol, 3,nmask], dtype=np.float32)
-                for ib in range(len(bayer)): 
-                    b = bayer[ib]
-                    x_bayer[b[0]::2, b[1]::2] = xall[...,ib]
-                for imask in range(nmask):
-                    x_rgb[:,:,:,imask] = demosaicing_bayer(x_bayer[:,:,imask]) #cv2.cvtColor(np.uint8(np.clip(x_bayer[:,:,imask],0,1)*255), cv2.COLOR_BAYER_RG2BGR)
+                bayer_unpack(xall, out=x_bayer)
+                # all the frames demosaiced at once (H x W x F x 3 to H x W x 3 x F)
+                x_rgb = np.float32(demosaicing_bayer(x_bayer).transpose(0,1,3,2)) #cv2.cvtColor(np.uint8(np.clip(x_bayer[:,:,imask],0,1)*255), cv2.COLOR_BAYER_RG2BGR)
                 xbgr3 = ffdnet_rgb_denoise(x_rgb, nsig,model)
                 #xbgr4 = np.transpose(xbgr3,(0,1,3,2))
                 xall[...,0] = xbgr3[0::2,0::2,0,:] # R  channel (average over two)
@@ -204,23 +200,20 @@ def gap_denoise_bayer(y_bayer, Phi_bayer, _lambda=1, accelerate=True,
                 xall[...,3] = xbgr3[1::2,1::2,2,:] # B  channel (average over two)    
             elif denoiser.lower() == 'fastdvdnet_gray': # FastDVDnet video denoising
                 xall_vch = xall.reshape([nrow//2, ncol//2, nmask*4])
-                xall_vch = fastdvdnet_denoiser(xall_vch, nsig, model, gray=True)
+                xall_vch = fastdvdnet_denoiser(xall_vch, nsig, model, gray=True, batch_size=window_batch)
                 xall = xall_vch.reshape([nrow//2, ncol//2, nmask, 4])
             elif denoiser.lower() == 'fastdvdnet_down': # FastDVDnet video denoising
                 xrgb1 = xall[..., [bmode[0],bmode[1],bmode[3]]] # R-G1-B (H x W x F x C)
-                xrgb1 = fastdvdnet_denoiser(xrgb1, nsig, model)
+                xrgb1 = fastdvdnet_denoiser(xrgb1, nsig, model, batch_size=window_batch)
                 xall[...,bmode[0]] = xrgb1[...,0] # R  channel 
                 xall[...,bmode[1]] = xrgb1[...,1] # G1=G2 channel 
                 xall[...,bmode[2]] = xrgb1[...,1] # G2=G1 channel 
                 xall[...,bmode[3]] = xrgb1[...,2] # B  channel
             elif denoiser.lower() == 'fastdvdnet_demosaic': # FastDVDnet video denoising
-                x_rgb = np.zeros([nrow, ncol, nmask, 3], dtype=np.float32)
-                for ib in range(len(bayer)): 
-                    b = bayer[ib]
-                    x_bayer[b[0]::2, b[1]::2] = xall[...,ib]
-                for imask in range(nmask):
-                    x_rgb[:,:,imask,:] = demosaicing_bayer(x_bayer[:,:,imask])
-                xrgb1 = fastdvdnet_denoiser(x_rgb, nsig, model)
+                bayer_unpack(xall, out=x_bayer)
+                # all the frames demosaiced at once (H x W x F x 3)
+                x_rgb = np.float32(demosaicing_bayer(x_bayer))
+                xrgb1 = fastdvdnet_denoiser(x_rgb, nsig, model, batch_size=window_batch)
                 #xrgb1 = np.single(xrgb1)//255;
                 xall[...,bmode[0]] = xrgb1[0::2,0::2,:,0] # R  channel (average over two)
                 xall[...,bmode[1]] = xrgb1[0::2,1::2,:,1] # G1=G2 channel (average over two)
@@ -228,47 +221,30 @@ def gap_denoise_bayer(y_bayer, Phi_bayer, _lambda=1, accelerate=True,
                 xall[...,bmode[3]] = xrgb1[1::2,1::2,:,2] # B  channel (average over two)
             else:
                 raise ValueError('Unsupported denoiser {}!'.format(denoiser))
+            hooks.lap('denoise')
 
-            # [optional] calculate image quality assessment, i.e., PSNR for 
-            # every five iterations
-            if show_iqa and X_orig is not None:
-                for ib in range(len(bayer)): 
-                    b = bayer[ib]
-                    x_bayer[b[0]::2, b[1]::2] = xall[...,ib]
-                psnr_all.append(compare_psnr(X_orig, x_bayer,data_range=1.))
-                if (k+1)%5 == 0:
-                    if not noise_estimate and nsig is not None:
-                        if nsig < 1:
-                            print('  GAP-{0} iteration {1: 3d}, sigma {2: 3g}/255, ' 
-                            'PSNR {3:2.2f} dB.'.format(denoiser.upper(), 
-                            k+1, nsig*255, psnr_all[k]))
-                        else:
-                            print('  GAP-{0} iteration {1: 3d}, sigma {2: 3g}, ' 
-                                'PSNR {3:2.2f} dB.'.format(denoiser.upper(), 
-                                k+1, nsig, psnr_all[k]))
-                    else:
-                        print('  GAP-{0} iteration {1: 3d}, ' 
-                            'PSNR {2:2.2f} dB.'.format(denoiser.upper(), 
-                            k+1, psnr_all[k]))
+            # [optional] image quality assessment, i.e., PSNR of every `iqa_every`
+            # iterations (in the background)
+            iqa(k, xall, None if noise_estimate else nsig)
+            hooks.lap('iqa')
+            hooks(k, idx, nsig, yall, yb)
             k = k+1
+        iqa.stage_end(xall, None if noise_estimate else nsig)
 
-    for ib in range(len(bayer)): 
-        b = bayer[ib]
-        x_bayer[b[0]::2, b[1]::2] = xall[...,ib]
+    bayer_unpack(xall, out=x_bayer)
 
     psnr_ = []
     ssim_ = []
     if X_orig is not None:
-        for imask in range(nmask):
-            psnr_.append(compare_psnr(X_orig[:,:,imask], x_bayer[:,:,imask], data_range=1.))
-            ssim_.append(compare_ssim(X_orig[:,:,imask], x_bayer[:,:,imask], data_range=1.))
-    return x_bayer, psnr_, ssim_, psnr_all
+        psnr_, ssim_ = _frame_iqa(X_orig, x_bayer)
+    return x_bayer, psnr_, ssim_, iqa.results()
 
 
 def admm_denoise_bayer(y_bayer, Phi_bayer, _lambda=1, gamma=0.01,
                 denoiser='tv', iter_max=50, noise_estimate=True, sigma=None, 
                 tv_weight=0.1, tv_iter_max=5, multichannel=True, x0_bayer=None, 
-                X_orig=None, model=None, show_iqa=True):
+                X_orig=None, model=None, show_iqa=True, callback=None,
+                iqa_every=1, window_batch=None):
     '''
     Generalized alternating projection (GAP)[1]-based denoising regularization 
     for snapshot compressive imaging (SCI).
@@ -315,6 +291,13 @@ def admm_denoise_bayer(y_bayer, Phi_bayer, _lambda=1, gamma=0.01,
         Start point (initialized value) for the iteration process of the 
         reconstruction.
     model : pretrained model for image/video denoising.
+    window_batch : int, optional
+        Number of temporal windows per forward pass of FastDVDnet (all the
+        frames at once by default, see `fastdvdnet.denoise_windows`).
+    iqa_every : int, optional
+        Interval (in iterations) of the PSNR evaluation (see `utils.IQAMonitor`).
+    callback : callable or list of callables, optional
+        Per-iteration profiling hooks (see `utils.IterationHooks`).
 
     Returns
     -------
@@ -344,7 +327,7 @@ def admm_denoise_bayer(y_bayer, Phi_bayer, _lambda=1, gamma=0.01,
     --------
     admm_denoise
     '''
-    bayer = [[0,0], [0,1], [1,0], [1,1]] # `BGGR` Bayer pattern
+    # `BGGR` Bayer pattern 2-by-2 [0,0], [0,1], [1,0], [1,1] (see `utils.bayer_pack`)
 
     if not isinstance(sigma, list):
         sigma = [sigma]
@@ -353,55 +336,38 @@ def admm_denoise_bayer(y_bayer, Phi_bayer, _lambda=1, gamma=0.01,
 
     # stack the bayer channels at the last dimension [consistent to image color channels]
     (nrow, ncol, nmask) = Phi_bayer.shape
-    yall = np.zeros([nrow//2, ncol//2, 4], dtype=np.float32)
-    Phiall = np.zeros([nrow//2, ncol//2, nmask, 4], dtype=np.float32)
-    Phi_sumall = np.zeros([nrow//2, ncol//2, 4], dtype=np.float32)
-    x0all = np.zeros([nrow//2, ncol//2, nmask, 4], dtype=np.float32)
-    
-    # iterative solve for each Bayer channel
-    for ib in range(len(bayer)): 
-        b = bayer[ib]
-        yall[...,ib] = y_bayer[b[0]::2, b[1]::2]
-        Phiall[...,ib] =  Phi_bayer[b[0]::2, b[1]::2]
-        # y = y_bayer[b[0]::2][b[1]::2]
-        # Phi = Phi_bayer[b[0]::2][b[1]::2]
-
-        # A  = lambda x :  A_(x, Phi) # forward model function handle
-        # At = lambda y : At_(y, Phi) # transpose of forward model
-
-        Phib = Phiall[...,ib]
-        Phib_sum = np.sum(Phib, axis=2)
-        Phib_sum[Phib_sum==0] = 1
-
-        Phi_sumall[...,ib] = Phib_sum
-
-        # [0] initialization
-        if x0_bayer is None:
-            # x0 = At(y, Phi) # default start point (initialized value)
-            x0all[...,ib] = At_(yall[...,ib], Phiall[...,ib]) # default start point (initialized value)
-        else:
-            x0all[...,ib] = x0_bayer[b[0]::2,b[1]::2]
+    yall = bayer_pack(y_bayer).astype(np.float32)           # H/2 x W/2 x 4
+    Phiall = bayer_pack(Phi_bayer).astype(np.float32)       # H/2 x W/2 x nmask x 4
+    Phi_sumall = np.sum(Phiall, axis=2)
+    Phi_sumall[Phi_sumall==0] = 1
+
+    # [0] initialization
+    if x0_bayer is None:
+        # x0 = At(y, Phi) # default start point (initialized value)
+        x0all = yall[:,:,np.newaxis]*Phiall # default start point (initialized value)
+    else:
+        x0all = bayer_pack(x0_bayer).astype(np.float32)
 
-    # y1 = np.zeros(y.shape)
-    y1all = np.zeros_like(yall) 
     # [1] start iteration for reconstruction
     xall = x0all # initialization
     thetaall = x0all
     x_bayer = np.zeros_like(Phi_bayer)
-    b = np.zeros_like(x0all)
+    ball = np.zeros_like(x0all)
 
-    psnr_all = []
+    # per-iteration profiling hooks (disabled without callback)
+    hooks = IterationHooks(callback, 'ADMM-'+denoiser.upper())
+    # throttled IQA in a background thread (disabled without X_orig)
+    iqa = IQAMonitor(X_orig, iqa_every, hooks.solver, show=show_iqa, transform=bayer_unpack)
     k = 0
     for idx, nsig in enumerate(sigma): # iterate all noise levels
         for it in range(iter_max[idx]): 
-            start_time = time.time()
-
-            for ib in range(len(bayer)): # iterate all bayer channels
-                yb = A_(thetaall[...,ib]+ball[...,ib], Phiall[...,ib])
-                xall[...,ib] = thetaall[...,ib]+ball[...,ib] + _lambda*(At_((yall[...,ib]-yb)/(Phi_sumall[...,ib]+gamma), Phiall[...,ib])) # GAP
+            hooks.start()
+            # all bayer channels at once
+            xall = thetaall+ball
+            yb = np.einsum('ijkb,ijkb->ijb', xall, Phiall)
+            xall += _lambda*(((yall-yb)/(Phi_sumall+gamma))[:,:,np.newaxis]*Phiall) # ADMM
 
-            end_time = time.time()
-            # print('    Euclidean projection eclipsed in {:.3f}s.'.format(end_time-start_time))
+            hooks.lap('proj')
             # joint Bayer multi-channel denoising
             # switch denoiser 
             if denoiser.lower() == 'tv': # total variation (TV) denoising
@@ -421,9 +387,9 @@ def admm_denoise_bayer(y_bayer, Phi_bayer, _lambda=1, gamma=0.01,
             #     x = vnlnet(np.expand_dims(x.transpose(2,0,1),3), nsig)
             #     x = np.transpose(x.squeeze(3),(1,2,0))
             elif denoiser.lower() == 'ffdnet': # FFDNet frame-wise video denoising
-                xall_vch = xall.reshape([nrow//2, ncol//2, nmask*4])
-                xall_vch = ffdnet_vdenoiser(xall_vch, nsig, model)
-                xall = xall_vch.reshape([nrow//2, ncol//2, nmask, 4])
+                thetaall_vch = (xall-ball).reshape([nrow//2, ncol//2, nmask*4])
+                thetaall_vch = ffdnet_vdenoiser(thetaall_vch, nsig, model)
+                thetaall = thetaall_vch.reshape([nrow//2, ncol//2, nmask, 4])
             elif denoiser.lower() == 'fastdvdnet': # FastDVDnet video denoising
                 # # option 1 - run denoising twice
                 # xrgb1 = xall[..., [0,1,3]] # R-G1-B (H x W x F x C)
@@ -436,90 +402,176 @@ def admm_denoise_bayer(y_bayer, Phi_bayer, _lambda=1, gamma=0.01,
                 # xall[...,3] = (xrgb1[...,2] + xrgb2[...,2])/2 # B  channel (average over two)
                 # option 2 - run deniosing once
                 thetargb1 = (xall-ball)[..., [3,1,0]] # R-G1-B (H x W x F x C)
-                thetargb1 = fastdvdnet_denoiser(thetargb1, nsig, model)
+                thetargb1 = fastdvdnet_denoiser(thetargb1, nsig, model, batch_size=window_batch)
+                thetaall = np.empty_like(xall)
                 thetaall[...,3] = thetargb1[...,0] # R  channel (average over two)
                 thetaall[...,2] = thetargb1[...,1] # G1=G2 channel (average over two)
                 thetaall[...,1] = thetargb1[...,1] # G2=G1 channel (average over two)
                 thetaall[...,0] = thetargb1[...,2] # B  channel (average over two)
             else:
                 raise ValueError('Unsupported denoiser {}!'.format(denoiser))
+            hooks.lap('denoise')
             ball = ball - (xall-thetaall) # update residual
+            hooks.lap('proj')
 
-            # [optional] calculate image quality assessment, i.e., PSNR for 
-            # every five iterations
-            if show_iqa and X_orig is not None:
-                for ib in range(len(bayer)): 
-                    b = bayer[ib]
-                    x_bayer[b[0]::2, b[1]::2] = xall[...,ib]
-                psnr_all.append(psnr(X_orig, x_bayer))
-                if (k+1)%5 == 0:
-                    if not noise_estimate and nsig is not None:
-                        if nsig < 1:
-                            print('  GAP-{0} iteration {1: 3d}, sigma {2: 3g}/255, ' 
-                            'PSNR {3:2.2f} dB.'.format(denoiser.upper(), 
-                            k+1, nsig*255, psnr_all[k]))
-                        else:
-                            print('  GAP-{0} iteration {1: 3d}, sigma {2: 3g}, ' 
-                                'PSNR {3:2.2f} dB.'.format(denoiser.upper(), 
-                                k+1, nsig, psnr_all[k]))
-                    else:
-                        print('  GAP-{0} iteration {1: 3d}, ' 
-                            'PSNR {2:2.2f} dB.'.format(denoiser.upper(), 
-                            k+1, psnr_all[k]))
+            # [optional] image quality assessment, i.e., PSNR of every `iqa_every`
+            # iterations (in the background)
+            iqa(k, xall, None if noise_estimate else nsig)
+            hooks.lap('iqa')
+            hooks(k, idx, nsig, yall, yb)
             k = k+1
+        iqa.stage_end(xall, None if noise_estimate else nsig)
+
+    bayer_unpack(xall, out=x_bayer)
+
+    return x_bayer, iqa.results()
 
-    for ib in range(len(bayer)): 
-        b = bayer[ib]
-        x_bayer[b[0]::2, b[1]::2] = xall[...,ib]
 
-    return x_bayer, psnr_all
+def _frame_iqa(X_orig, x, nbatch=0):
+    '''
+    Frame-wise PSNR and SSIM of the reconstruction `x` (H x W x nmask), or of
+    each coded frame block of a batch of `nbatch` reconstructions at once
+    (see `sci_metrics.frame_iqa`).
+    '''
+    return frame_iqa(X_orig, x, data_range=1., color=x.ndim-bool(nbatch) > 3)
 
+def _solve_stats(solver, mask=None, operator=None, **args):
+    '''
+    Run `solver` returning its results together with its statistics, i.e.,
+    the `stats` dict filled in the pool worker. The forward model `A` and 
+    its transpose `At` are rebuilt in the worker from the forward model 
+    `operator` (handed to the solver) or from the masks `mask` (see 
+    `utils.SCIOperator`), so that no function handles are pickled.
+    '''
+    if operator is not None:
+        args['operator'] = operator
+    elif mask is not None:
+        operator = SCIOperator(mask)
+    if operator is not None:
+        args.update(A=operator.forward, At=operator.adjoint)
+    stats = {}
+    return solver(stats=stats, **args), stats
 
 # admm(gap) denosie cacti (including gap)
 def admmdenoise_cacti(meas, mask, A, At, projmeth='admm', v0=None, orig=None, 
                       iframe=0, nframe=1, MAXB=1., maskdirection='plain',
-                      **args):
+                      batch=False, workers=1, backend='numpy', device=None, **args):
     '''
     Alternating direction method of multipliers (ADMM) or generalized 
     alternating projection (GAP) -based denoising (based on the 
     plug-and-play (PnP) framework) algorithms for video snapshot compressive
     imaging (SCI) or coded aperture compressive temporal imaging (CACTI, 
     Llull et al. Opt. Express 2013).
+
+    With `batch=True`, all the `nframe` coded frames are reconstructed at once
+    as a batch of measurements (nframe x H x W) sharing the same masks, where
+    the denoiser is called once per iteration on all the frames of the batch
+    instead of once per coded frame.
+
+    With `workers > 1`, the coded frames are sharded across a pool of 
+    `workers` processes (see `utils.parallel_map`), where the masks and the
+    preloaded denoiser `model` are handed to each worker only once. The 
+    workers rebuild the forward model from the masks (see `_solve_stats`), 
+    i.e., `A` and `At` are only called in this process. With CUDA models 
+    (or the torch backend on the GPU), the workers are spawned instead of 
+    forked (see `utils.parallel_map`), i.e., each worker loads the model 
+    onto the GPU again.
+
+    With the early termination tolerances (`tol_res`, `tol_rel`, see 
+    `gap_denoise`), the number of iterations actually used of each sigma 
+    stage is appended for each coded frame to `stats['iters']` if a `stats`
+    dict is given.
+
+    All the coded frames are reconstructed in the data type policy `dtype`
+    (float32 by default, see `gap_denoise` and `utils.DtypePolicy`).
+
+    The per-iteration profiling hooks `callback` (see `utils.IterationHooks`)
+    are called by the solver of each coded frame, i.e., in the worker 
+    processes with `workers > 1`.
+
+    With `backend='torch'`, the measurements, the masks and the iterations 
+    of the solvers are resident as torch tensors on `device` (CUDA if 
+    available by default), see `gap_denoise_torch` and `admm_denoise_torch`.
     '''
     nmask = mask.shape[-1]
+    stats = args.pop('stats', None)
+    policy = DtypePolicy.get(args.get('dtype', np.float32))
 
-    mask_sum = np.sum(mask, axis=tuple(range(2,mask.ndim)))
-    mask_sum[mask_sum==0] = 1
+    # forward model with preallocated workspace, shared by all coded frames
+    operator = args.pop('operator', None)
+    if backend.lower() == 'numpy':
+        if operator is None:
+            operator = SCIOperator(policy(mask))
+        solvers = {'admm': admm_denoise, 'gap': gap_denoise}
+    elif backend.lower() == 'torch': # masks resident on the device
+        if operator is None:
+            operator = TorchSCIOperator(policy(mask), device, policy.dtype)
+        solvers = {'admm': admm_denoise_torch, 'gap': gap_denoise_torch}
+    else:
+        raise ValueError('Unsupported backend %s' % backend)
+    mask_sum = operator.Phi_sum
 
-    x_ = np.zeros((*mask.shape[:-1],nmask*nframe), dtype=np.float32)
+    if projmeth.lower() == 'admm': # alternating direction method of multipliers (ADMM)-based projection
+        solver = solvers['admm']
+    elif projmeth.lower() == 'gap': # generalized alternating projection (GAP)-based projection
+        solver = solvers['gap']
+    else:
+        raise ValueError('Unsupported projection method %s' % projmeth.upper())
+
+    x_ = np.zeros((*mask.shape[:-1],nmask*nframe), dtype=policy.dtype)
     psnr_, ssim_, psnrall_ = ([], [], [])
-    begin_time = time.time()
-    # loop over all the coded frames [nframe]
+    meas_, orig_, v0_, flip_ = ([], [], [], [])
     for kf in range(nframe):
-        print('%s-%s Reconstruction coded frame block %2d of %2d ...'
-              %(projmeth.upper(), args['denoiser'].upper(), kf+1, nframe))
         if orig is not None:
-            orig_k = orig[...,(kf+iframe)*nmask:(kf+iframe+1)*nmask]/MAXB
-        meas_k = meas[...,kf+iframe]/MAXB
+            orig_.append(orig[...,(kf+iframe)*nmask:(kf+iframe+1)*nmask]/MAXB)
+        else:
+            orig_.append(None)
+        meas_.append(policy(meas[...,kf+iframe]/MAXB))
+        # direction of the masks [up as calibration]
+        flip_.append((maskdirection.lower() == 'updown' and (kf+iframe) % 2 == 1) or \
+                     (maskdirection.lower() == 'downup' and (kf+iframe) % 2 == 0))  # down (up as mask)
         if v0 is None:
-            v0_k = None
-        else: # initialization according to the direction of the masks [up as calibration]
-            v0_k = v0[:,:,kf*nmask:(kf+1)*nmask]
-            if (maskdirection.lower() == 'updown' and (kf+iframe) % 2 == 1) or \
-               (maskdirection.lower() == 'downup' and (kf+iframe) % 2 == 0):  # down (up as mask)
-               v0_k = v0_k[...,::-1]
-
-        if projmeth.lower() == 'admm': # alternating direction method of multipliers (ADMM)-based projection
-            x_k, psnr_k, ssim_k, psnrall_k = admm_denoise(meas_k, mask_sum, A, At, 
-                                                          x0=v0_k, X_orig=orig_k, **args)
-        elif projmeth.lower() == 'gap': # generalized alternating projection (GAP)-based projection
-            x_k, psnr_k, ssim_k, psnrall_k =  gap_denoise(meas_k, mask_sum, A, At, 
-                                                          x0=v0_k, X_orig=orig_k, **args)
+            v0_.append(None)
+        else: # initialization according to the direction of the masks
+            v0_k = v0[...,kf*nmask:(kf+1)*nmask]
+            v0_.append(v0_k[...,::-1] if flip_[kf] else v0_k)
+
+    stats_b = {}
+    begin_time = time.time()
+    if batch: # reconstruct all the coded frames at once [nframe x H x W x nmask]
+        print('%s-%s Reconstruction coded frame blocks 1-%d as a batch ...'
+              %(projmeth.upper(), args['denoiser'].upper(), nframe))
+        x_b, psnr_b, ssim_b, psnrall_b = solver(np.stack(meas_), mask_sum, A, At,
+            x0=None if v0 is None else np.stack(v0_),
+            X_orig=None if orig is None else np.stack(orig_),
+            operator=operator, stats=stats_b, **args)
+    elif workers > 1: # shard the coded frames across a process pool
+        print('%s-%s Reconstruction of %2d coded frame blocks with %d workers ...'
+              %(projmeth.upper(), args['denoiser'].upper(), nframe, workers))
+        res_ = parallel_map(_solve_stats, [dict(y=meas_[kf], x0=v0_[kf], X_orig=orig_[kf])
+                                           for kf in range(nframe)], workers=workers, 
+                            solver=solver, Phi_sum=mask_sum, operator=operator, **args)
+    # loop over all the coded frames [nframe]
+    for kf in range(nframe):
+        if batch:
+            x_k = x_b[kf]
+            psnr_k = psnr_b[kf] if psnr_b else []
+            ssim_k = ssim_b[kf] if ssim_b else []
+            psnrall_k = [psnr_it[kf] for psnr_it in psnrall_b]
+            stats_k = stats_b
+        elif workers > 1:
+            ((x_k, psnr_k, ssim_k, psnrall_k), stats_k), t_k = res_[kf]
+            print('%s-%s coded frame block %2d of %2d finished in %.1f seconds.'
+                  %(projmeth.upper(), args['denoiser'].upper(), kf+1, nframe, t_k))
         else:
-            print('Unsupported projection method %s' % projmeth.upper())
+            print('%s-%s Reconstruction coded frame block %2d of %2d ...'
+                  %(projmeth.upper(), args['denoiser'].upper(), kf+1, nframe))
+            stats_k = {}
+            x_k, psnr_k, ssim_k, psnrall_k = solver(meas_[kf], mask_sum, A, At, 
+                                                    x0=v0_[kf], X_orig=orig_[kf], 
+                                                    operator=operator, stats=stats_k, **args)
         
-        if (maskdirection.lower() == 'updown' and (kf+iframe) % 2 == 1) or \
-           (maskdirection.lower() == 'downup' and (kf+iframe) % 2 == 0):   # down (up as mask)
+        if flip_[kf]:   # down (up as mask)
             x_k = x_k[...,::-1]
             psnr_k = psnr_k[::-1]
             ssim_k = ssim_k[::-1]
@@ -530,13 +582,242 @@ def admmdenoise_cacti(meas, mask, A, At, projmeth='admm', v0=None, orig=None,
         psnr_.extend(psnr_k)
         ssim_.extend(ssim_k)
         psnrall_.append(psnrall_k)
+        if stats is not None:
+            stats.setdefault('iters', []).append(stats_k.get('iters', []))
+            stats.setdefault('iqa_iters', []).append(stats_k.get('iqa_iters', []))
         
     return x_, t_, psnr_, ssim_, psnrall_
 
+def _recon_tile(pad, meas, mask, **args):
+    '''
+    Reconstruct the tile `pad` (row and column slices) of the full-size 
+    measurement `meas` and masks `mask` with `admmdenoise_cacti`.
+    '''
+    mask_t = np.ascontiguousarray(mask[pad])
+    A  = lambda x :  A_(x, mask_t) # forward model function handle
+    At = lambda y : At_(y, mask_t) # transpose of forward model
+    return admmdenoise_cacti(meas[pad], mask_t, A, At, **args)[0]
+
+def _tile_memory(npix, nmask, nframe, itemsize, batch=False):
+    '''
+    Estimated working memory (in bytes) of the reconstruction of a tile of
+    `npix` pixels, i.e., the masks, the measurements, the result and about 
+    eight H x W x nmask volumes (state, workspace and denoiser temporaries) 
+    for each coded frame reconstructed at once.
+    '''
+    nvol = 8*(nframe if batch else 1) + 1 + nframe
+    return npix*nmask*itemsize*nvol
+
+# tiled admm(gap) denoise cacti for large-scale measurements
+def tiled_admmdenoise_cacti(meas, mask, tile=256, halo=32, workers=1, 
+                            max_memory=None, orig=None, **args):
+    '''
+    Overlapping-tile reconstruction of large-scale (e.g., 2048 x 2048 and 
+    larger) measurements with `admmdenoise_cacti`.
+
+    The full-size measurements `meas` (H x W x nframe) and masks `mask` 
+    (H x W x nmask) are split into tiles of `tile` x `tile` pixels, each 
+    extended by a halo of `halo` pixels on each side (see `utils.tile_grid`).
+    The tiles are reconstructed independently on a pool of `workers` 
+    processes and blended into the full-size result with the window weights
+    of `utils.tile_window`, tapering across the halos to hide the seams. The
+    tiles are streamed into the result as they finish, so that only the 
+    tiles in flight are held in memory besides the full-size result.
+    The workers are spawned instead of forked once CUDA is initialized in 
+    this process (see `utils.parallel_imap`).
+
+    With `max_memory` (in bytes), the tile size is halved until the estimated
+    working memory fits in it, i.e., the full-size result, window weights, 
+    measurements and masks, the `workers` tiles reconstructed at once and 
+    the up to 2*`workers` finished tiles in flight (see `utils.parallel_imap`).
+    A ValueError is raised if the full-size buffers alone exceed it.
+
+    All the other keyword arguments are passed to `admmdenoise_cacti` (e.g.,
+    `projmeth`, `denoiser`, `iframe`, `nframe`, `MAXB`, `batch`, ...). The 
+    frame-wise PSNR and SSIM are calculated on the blended result if the 
+    ground truth `orig` is given, while the PSNR of each iteration is not 
+    available (empty `psnrall_`).
+    '''
+    nmask = mask.shape[-1]
+    (iframe, nframe) = (args.get('iframe', 0), args.get('nframe', 1))
+    policy = DtypePolicy.get(args.get('dtype', np.float32))
+    if max_memory is not None:
+        # full-size result, window weights, measurements and masks
+        npix = meas.shape[0]*meas.shape[1]*int(np.prod(mask.shape[2:-1]))
+        fixed = (npix*nmask*nframe*policy.dtype.itemsize + 
+                 meas.shape[0]*meas.shape[1]*4 + meas.nbytes + mask.nbytes)
+        if fixed > max_memory:
+            raise ValueError('The full-size buffers of {:.1f} MB exceed the memory '
+                             'cap of {:.1f} MB.'.format(fixed/2**20, max_memory/2**20))
+        def tile_memory(tile):
+            npix = (tile+2*halo)**2*int(np.prod(mask.shape[2:-1]))
+            return fixed + max(workers, 1)*(_tile_memory(npix, nmask, nframe,
+                policy.dtype.itemsize, args.get('batch', False)) + # in progress
+                2*npix*nmask*nframe*policy.dtype.itemsize) # finished in flight
+        while tile > halo and tile_memory(tile) > max_memory:
+            tile //= 2
+        if tile_memory(tile) > max_memory:
+            print('WARNING: tiles of {0}x{0} pixels exceed the memory cap of '
+                  '{1:.1f} MB.'.format(tile, max_memory/2**20))
+    tiles = tile_grid(meas.shape[:2], tile, halo)
+    print('Tiled reconstruction of {} tiles of {}x{} pixels (halo {}) with {} '
+          'workers ...'.format(len(tiles), tile, tile, halo, workers))
+
+    x_ = np.zeros((*meas.shape[:2], *mask.shape[2:-1], nmask*nframe), 
+                  dtype=policy.dtype)
+    wsum = np.zeros(meas.shape[:2], dtype=np.float32)
+    begin_time = time.time()
+    res_ = parallel_imap(_recon_tile, (dict(pad=pad) for (core, pad) in tiles),
+                         workers=workers, meas=meas, mask=mask, **args)
+    for kt, ((core, pad), (x_t, t_t)) in enumerate(zip(tiles, res_)):
+        # blend the tile into the full-size result
+        w = tile_window(core, pad)
+        x_t *= w.reshape(*w.shape, *(1,)*(x_t.ndim-2))
+        x_[pad] += x_t
+        wsum[pad] += w
+        print('Tile {:3d} of {:3d} finished in {:.1f} seconds.'.format(kt+1, 
+              len(tiles), t_t))
+    x_ /= wsum.reshape(*wsum.shape, *(1,)*(x_.ndim-2))
+    t_ = time.time() - begin_time
+
+    psnr_, ssim_ = ([], [])
+    if orig is not None:
+        MAXB = args.get('MAXB', 1.)
+        psnr_, ssim_ = _frame_iqa(orig[...,iframe*nmask:(iframe+nframe)*nmask]/MAXB, x_)
+    return x_, t_, psnr_, ssim_, []
+
+# coarse-to-fine admm(gap) denoise cacti
+def pyramid_admmdenoise_cacti(meas, mask, A, At, levels=2, level_iters=None,
+                              v0=None, orig=None, **args):
+    '''
+    Coarse-to-fine (multi-resolution) reconstruction with 
+    `admmdenoise_cacti`, recovering the low frequencies with cheap solves at
+    coarse scales instead of the first full-resolution iterations.
+
+    The measurements `meas` and the masks `mask` are downsampled `levels` 
+    times by a factor of two (the block means of both, see 
+    `utils.pyramid_down`). The coarsest level is solved from `At(y)` (or the
+    downsampled `v0`), and the (bilinearly upsampled, see 
+    `utils.pyramid_up`) result of each level is the start point `v0` of the
+    next finer level, down to the full-resolution solve with the given
+    `iter_max`.
+
+    `level_iters` is the iteration budget `iter_max` (an int, or a list for
+    each sigma) of each coarse level from the coarsest one, `iter_max` for 
+    all the levels by default. All the other keyword arguments are passed 
+    to `admmdenoise_cacti` at every level (`A` and `At` at full resolution
+    only). The PSNR of the coarse levels is calculated with the ground truth
+    `orig` downsampled the same way.
+
+    Returns
+    -------
+    The results of `admmdenoise_cacti` at full resolution, with the running
+    time `t_` of all the levels.
+    '''
+    if level_iters is None:
+        level_iters = [args.get('iter_max', 50)]*levels
+    if len(level_iters) != levels:
+        raise ValueError('{} iteration budgets for {} coarse levels!'.format(
+                         len(level_iters), levels))
+    # pyramid of the measurements, masks (and ground truth), finest first
+    meas_, mask_, orig_ = ([meas], [mask], [orig])
+    for level in range(levels):
+        meas_.append(pyramid_down(meas_[-1]))
+        mask_.append(pyramid_down(mask_[-1]))
+        orig_.append(None if orig is None else pyramid_down(orig_[-1]))
+    if v0 is not None:
+        for level in range(levels):
+            v0 = pyramid_down(v0)
+
+    begin_time = time.time()
+    for level in range(levels, -1, -1): # from the coarsest level
+        (meas_l, mask_l) = (meas_[level], mask_[level])
+        print('Pyramid level {} of {} ({}x{}) ...'.format(levels-level+1, 
+              levels+1, *meas_l.shape[:2]))
+        if v0 is not None and v0.shape[:2] != meas_l.shape[:2]:
+            v0 = pyramid_up(v0, meas_l.shape)
+        if level == 0: # full resolution
+            res = admmdenoise_cacti(meas_l, mask_l, A, At, v0=v0, orig=orig, **args)
+        else:
+            A_l  = lambda x :  A_(x, mask_l) # forward model of the level
+            At_l = lambda y : At_(y, mask_l)
+            args_l = dict(args, iter_max=level_iters[levels-level])
+            args_l.pop('operator', None) # of the full resolution
+            res = admmdenoise_cacti(meas_l, mask_l, A_l, At_l, v0=v0, 
+                                    orig=orig_[level], **args_l)
+            if res[2]:
+                print('Pyramid level {} of {} PSNR {:2.2f} dB.'.format(
+                      levels-level+1, levels+1, np.mean(res[2])))
+            v0 = res[0] # normalized, as `v0`
+    (x_, _, psnr_, ssim_, psnrall_) = res
+    t_ = time.time() - begin_time
+    return x_, t_, psnr_, ssim_, psnrall_
+
+# streaming admm(gap) denoise cacti over MATLAB .mat measurement files
+def stream_admmdenoise_cacti(matfile, mask=None, projmeth='admm', iframe=0, 
+                             nframe=None, MAXB=1., maskdirection='plain', 
+                             meas_key='meas', mask_key='mask', orig_key=None,
+                             normalize=False, **args):
+    '''
+    Streaming reconstruction of the coded measurements of a MATLAB .mat file
+    `matfile` with `admmdenoise_cacti`, which opens the file once and reads
+    one coded measurement `meas[..., k]` at a time (a chunked read of the 
+    '-v7.3' .mat files, see `utils.MatFile`), so that long captures of 
+    thousands of snapshots are reconstructed in constant memory.
+
+    The masks are read from `mask_key` of the file if `mask` is None, and 
+    the ground truth (for PSNR and SSIM) of each coded frame from `orig_key`
+    if given. With `normalize=True`, the measurements and the masks are 
+    divided by the maximum of the masks as in the real-data test scripts.
+    The coded frames `iframe` to `iframe+nframe` (up to the last one if 
+    `nframe` is None) are reconstructed, while all the other keyword 
+    arguments are passed to `admmdenoise_cacti`.
+
+    Yields
+    ------
+    (k, x_k, stats) : tuple
+        Index `k` of the coded frame, its reconstruction `x_k` (H x W x 
+        nmask) and a dict `stats` of the running time 'time', the frame-wise
+        'psnr' and 'ssim', the 'psnrall' of the iterations and the 'iters' 
+        of each sigma stage, as soon as each coded frame is finished.
+    '''
+    with MatFile(matfile) as file:
+        if mask is None:
+            mask = file.load(mask_key)
+        mask_max = np.max(mask) if normalize else 1.
+        mask = mask/mask_max
+        nmask = mask.shape[-1]
+        stop = None if nframe is None else iframe+nframe
+
+        # forward model with preallocated workspace, shared by all coded frames
+        policy = DtypePolicy.get(args.get('dtype', np.float32))
+        operator = SCIOperator(policy(mask))
+        A  = lambda x :  A_(x, mask) # forward model function handle
+        At = lambda y : At_(y, mask) # transpose of forward model
+        # direction of the masks of the odd coded frames
+        flipdirection = {'updown': 'downup', 'downup': 'updown'}
+        for (k, meas_k) in file.slices(meas_key, start=iframe, stop=stop):
+            orig_k = None
+            if orig_key is not None:
+                orig_k = file.read(orig_key, k*nmask, (k+1)*nmask)
+            maskdir_k = maskdirection
+            if k % 2 == 1:
+                maskdir_k = flipdirection.get(maskdirection.lower(), maskdirection)
+            stats = {}
+            x_k, t_k, psnr_k, ssim_k, psnrall_k = admmdenoise_cacti(
+                meas_k[...,None]/mask_max, mask, A, At, projmeth=projmeth, 
+                orig=orig_k, iframe=0, nframe=1, MAXB=MAXB, 
+                maskdirection=maskdir_k, operator=operator, stats=stats, **args)
+            stats.update(time=t_k, psnr=psnr_k, ssim=ssim_k, psnrall=psnrall_k)
+            yield k, x_k, stats
+
 def gap_denoise(y, Phi_sum, A, At, _lambda=1, accelerate=True, 
                 denoiser='tv', iter_max=50, noise_estimate=False, sigma=None, 
                 tv_weight=0.1, tv_iter_max=5, multichannel=True, x0=None, 
-                X_orig=None, model=None, show_iqa=True, tvm='tv_chambolle'):
+                X_orig=None, model=None, show_iqa=True, tvm='tv_chambolle',
+                operator=None,
+                tol_res=None, tol_rel=None, patience=1, stats=None, callback=None,
+                iqa_every=1, acceleration=None, history=3, window_batch=None, dtype=np.float32):
     '''
     Alternating direction method of multipliers (ADMM)[1]-based denoising 
     regularization for snapshot compressive imaging (SCI).
@@ -544,7 +825,9 @@ def gap_denoise(y, Phi_sum, A, At, _lambda=1, accelerate=True,
     Parameters
     ----------
     y : two-dimensional (2D) ndarray of ints, uints or floats
-        Input single measurement of the snapshot compressive imager (SCI).
+        Input single measurement of the snapshot compressive imager (SCI), or
+        a batch of measurements (B x H x W) sharing the same masks, with `A`
+        and `At` (or `operator`) taking the leading batch dimension.
     Phi : three-dimensional (3D) ndarray of ints, uints or floats, omitted
         Input sensing matrix of SCI with the third dimension as the 
         time-variant, spectral-variant, volume-variant, or angular-variant 
@@ -575,6 +858,13 @@ def gap_denoise(y, Phi_sum, A, At, _lambda=1, accelerate=True,
         Maximum number of iterations.
     accelerate : boolean, optional
         Enable acceleration in GAP.
+    acceleration : {None, 'fista', 'anderson'}, optional
+        Acceleration of the PnP iterations (see `utils.Acceleration`), i.e.,
+        the FISTA/Nesterov momentum (with adaptive restart) or the Anderson 
+        acceleration over the last `history` iterations, restarted at each 
+        sigma stage and reported to the per-iteration hooks `callback`.
+    history : int, optional
+        Window (number of iterations) of the Anderson acceleration.
     noise_estimate : boolean, optional
         Enable noise estimation in the denoiser.
     sigma : one-dimensional (1D) ndarray of ints, uints or floats
@@ -588,9 +878,43 @@ def gap_denoise(y, Phi_sum, A, At, _lambda=1, accelerate=True,
         Start point (initialized value) for the iteration process of the 
         reconstruction.
     model : pretrained model for image/video denoising.
-    tvm : string, optional, {'tv_chambolle', 'ATV_ClipA', 'ATV_ClipB','ATV_cham','ATV_FGP',
+    window_batch : int, optional
+        Number of temporal windows per forward pass of FastDVDnet (all the
+        frames at once by default, see `fastdvdnet.denoise_windows`).
+    tvm : string, optional, {'tv_chambolle', 'ATV_cham','ATV_FGP',
         'ITV2D_cham','ITV2D_FGP','ITV3D_cham','ITV3D_FGP'}
         tv denoiser type, default value = 'tv_chambolle' (zzh)
+    tol_res : float, optional
+        Tolerance of the relative measurement residual ||y-A(x)||/||y|| for
+        the early termination of each sigma stage (see `utils.EarlyStopping`).
+    tol_rel : float, optional
+        Tolerance of the relative update ||x-x_prev||/||x_prev|| for the 
+        early termination of each sigma stage.
+    patience : int, optional
+        Number of consecutive iterations meeting the tolerances to stop a 
+        sigma stage and skip ahead to the next sigma level.
+    stats : dict, optional
+        Statistics of the reconstruction, where the number of iterations 
+        actually used of each sigma stage is appended to `stats['iters']`.
+    iqa_every : int, optional
+        Interval (in iterations) of the PSNR evaluation against `X_orig`
+        with `show_iqa`, done in a background thread on a snapshot of the
+        reconstruction, where the last iteration of each sigma stage is
+        always evaluated and `psnr_all` is the PSNR curve sampled at this
+        interval (see `utils.IQAMonitor`).
+    callback : callable or list of callables, optional
+        Per-iteration profiling hooks called with the timings of the 
+        projection, the denoising and the IQA, the residual norm, the sigma
+        stage and the memory high-water mark of each iteration (see 
+        `utils.IterationHooks`, and `utils.Profiler` for a built-in one).
+    dtype : data-type or DtypePolicy, optional
+        Data type policy of the reconstruction (see `utils.DtypePolicy`), 
+        float32 by default, e.g., `DtypePolicy(np.float32, storage=np.float16,
+        check=True)` for the float16 storage of the state arrays with the 
+        check of unintended upcasts.
+    operator : SCIOperator, optional
+        Forward model object with preallocated workspace. If provided, the 
+        fused in-place projection `operator.gap_step` replaces `A` and `At`.
 
     Returns
     -------
@@ -622,9 +946,15 @@ def gap_denoise(y, Phi_sum, A, At, _lambda=1, accelerate=True,
     admm_denoise
     '''
     # [0] initialization
+    nbatch = y.shape[0] if y.ndim > 2 else 0 # batch of measurements (B x H x W)
+    policy = DtypePolicy.get(dtype) # compute (and storage) data type
+    y = policy(y)
     if x0 is None:
         # x0 = At(y, Phi) # default start point (initialized value)
-        x0 = At(y) # default start point (initialized value)
+        x0 = At(y) if operator is None else operator.adjoint(y) # default start point (initialized value)
+        x0 = policy(x0, 'At')
+    else:
+        x0 = x0.astype(policy.dtype) # copy, as x is updated in place by the fused projection
     if not isinstance(sigma, list):
         sigma = [sigma]
     if not isinstance(iter_max, list):
@@ -633,82 +963,72 @@ def gap_denoise(y, Phi_sum, A, At, _lambda=1, accelerate=True,
     y1 = np.zeros_like(y) 
     # [1] start iteration for reconstruction
     x = x0 # initialization
-    psnr_all = []
+    # denoiser created once per process and kept resident (see `denoisers`)
+    denoise = get_denoiser(denoiser, tv_weight=tv_weight, tv_iter_max=tv_iter_max,
+                           multichannel=multichannel, tvm=tvm, noise_estimate=noise_estimate,
+                           model=model, window_batch=window_batch)
+    # early termination of the sigma stages (disabled by default)
+    stopper = EarlyStopping(tol_res, tol_rel, patience, nbatch, stats)
+    # per-iteration profiling hooks (disabled without callback)
+    hooks = IterationHooks(callback, 'GAP-'+denoiser.upper(), nbatch)
+    # acceleration of the iterations of each sigma stage (disabled by default)
+    accel = Acceleration(acceleration, history, nbatch)
+    # throttled IQA in a background thread (disabled without X_orig)
+    iqa = IQAMonitor(X_orig, iqa_every, hooks.solver, nbatch, show_iqa, stats=stats)
     k = 0
     for idx, nsig in enumerate(sigma): # iterate all noise levels
+        stopper.start()
+        accel.start()
         for it in range(iter_max[idx]):
-            yb = A(x)
-            if accelerate: # accelerated version of GAP
-                y1 = y1 + (y-yb)
-                x = x + _lambda*(At((y1-yb)/Phi_sum)) # GAP_acc
+            hooks.start()
+            x = policy(x) # from storage
+            accel.begin(x, y1)
+            if operator is not None: # fused in-place projection
+                x = operator.gap_step(x, y, y1 if accelerate else None, _lambda)
             else:
-                x = x + _lambda*(At((y-yb)/Phi_sum)) # GAP
-            # switch denoiser 
-            if denoiser.lower() == 'tv': # total variation (TV) denoising
-                try:
-                    if tvm == 'tv_chambolle':
-                        x = denoise_tv_chambolle(x, tv_weight, n_iter_max=tv_iter_max, multichannel=multichannel)
-                    elif tvm == 'ITV3D_FGP':
-                        x = denoise_tv_FGP_ITV3D(x, tv_weight, n_iter_max=tv_iter_max)
-                    elif tvm == 'ITV2D_cham':
-                        x = denoise_tv_cham_ITV2D(x, tv_weight, n_iter_max=tv_iter_max)                        
-                    else:
-                        raise TypeError("no such tv denoiser")
-                except TypeError as e:
-                    print("Exception: ",repr(e))
-                    
-            elif denoiser.lower() == 'wavelet': # wavelet denoising
-                if noise_estimate or nsig is None: # noise estimation enabled
-                    x = denoise_wavelet(x, multichannel=multichannel)
+                yb = A(x)
+                if accelerate: # accelerated version of GAP
+                    y1 = y1 + (y-yb)
+                    x = x + _lambda*(At((y1-yb)/Phi_sum)) # GAP_acc
                 else:
-                    x = denoise_wavelet(x, sigma=nsig, multichannel=multichannel)
-            # elif denoiser.lower() == 'vnlnet': # Video Non-local net denoising
-            #     x = vnlnet(np.expand_dims(x.transpose(2,0,1),3), nsig)
-            #     x = np.transpose(x.squeeze(3),(1,2,0))
-            elif denoiser.lower() == 'ffdnet': # FFDNet frame-wise video denoising
-                x = ffdnet_vdenoiser(x, nsig, model)
-            elif denoiser.lower() == 'fastdvdnet': # FastDVDnet video denoising
-                x = fastdvdnet_denoiser(x, nsig, model, gray=True) # grayscale video denoising
-                
-                # # joint demosaicking and decompressing for color SCI
-                # x = x.transpose(0,1,3,2) # H x W x C x M -> H x W x N x C
-                # x = fastdvdnet_denoiser(x, nsig, model) # color video denoising
-                # x = x.transpose(0,1,3,2) # H x W x N x C -> H x W x C x N
-            else:
-                raise ValueError('Unsupported denoiser {}!'.format(denoiser))
-            # [optional] calculate image quality assessment, i.e., PSNR for 
-            # every five iterations
-            if show_iqa and X_orig is not None:
-                psnr_all.append(psnr(X_orig, x))
-                if (k+1)%5 == 0:
-                    if not noise_estimate and nsig is not None:
-                        if nsig < 1:
-                            print('  GAP-{0} iteration {1: 3d}, sigma {2: 3g}/255, ' 
-                            'PSNR {3:2.2f} dB.'.format(denoiser.upper(), 
-                            k+1, nsig*255, psnr_all[k]))
-                        else:
-                            print('  GAP-{0} iteration {1: 3d}, sigma {2: 3g}, ' 
-                                'PSNR {3:2.2f} dB.'.format(denoiser.upper(), 
-                                k+1, nsig, psnr_all[k]))
-                    else:
-                        print('  GAP-{0} iteration {1: 3d}, ' 
-                            'PSNR {2:2.2f} dB.'.format(denoiser.upper(), 
-                            k+1, psnr_all[k]))
+                    x = x + _lambda*(At((y-yb)/Phi_sum)) # GAP
+            x = policy(x, 'GAP projection')
+            hooks.lap('proj')
+            # denoising [all the frames of the batch at once]
+            x = policy(denoise(x, nsig, nbatch), 'Denoiser {}'.format(denoiser))
+            hooks.lap('denoise')
+            # [optional] image quality assessment, i.e., PSNR of every `iqa_every`
+            # iterations (in the background)
+            iqa(k, x, None if noise_estimate else nsig)
+            hooks.lap('iqa')
+            hooks(k, idx, nsig, y, operator.yb if operator is not None else yb, 
+                  **accel.info)
             k = k+1
+            if (stopper(x, y, operator.yb if operator is not None else yb) 
+                    and it+1 < iter_max[idx]): # stage converged
+                print('  GAP-{0} sigma stage {1} of {2} converged after '
+                      '{3} of {4} iterations.'.format(denoiser.upper(), 
+                      idx+1, len(sigma), it+1, iter_max[idx]))
+                break
+            if accel.enabled and it+1 < iter_max[idx]: # state of the next iteration
+                (x, y1) = accel(x, y1)
+            x = policy.store(x) # state kept in the storage data type
+        iqa.stage_end(x, None if noise_estimate else nsig)
+        stopper.finish()
+    x = policy(x)
     
     psnr_ = []
     ssim_ = []
-    nmask = x.shape[-1]
     if X_orig is not None:
-        for imask in range(nmask):
-            psnr_.append(compare_psnr(X_orig[...,imask], x[...,imask], data_range=1.))
-            ssim_.append(compare_ssim(X_orig[...,imask], x[...,imask], data_range=1.,multichannel=x[...,imask].ndim>2))
-    return x, psnr_, ssim_, psnr_all
+        psnr_, ssim_ = _frame_iqa(X_orig, x, nbatch)
+    return x, psnr_, ssim_, iqa.results()
 
 def admm_denoise(y, Phi_sum, A, At, _lambda=1, gamma=0.01, 
                 denoiser='tv', iter_max=50, noise_estimate=False, sigma=None, 
                 tv_weight=0.1, tv_iter_max=5, multichannel=True, x0=None, model=None,
-                X_orig=None, show_iqa=True):
+                X_orig=None, show_iqa=True, operator=None,
+                tol_res=None, tol_rel=None, patience=1, stats=None, callback=None,
+                iqa_every=1, acceleration=None, history=3, window_batch=None, dtype=np.float32):
     '''
     Alternating direction method of multipliers (ADMM)[1]-based denoising 
     regularization for snapshot compressive imaging (SCI).
@@ -716,7 +1036,9 @@ def admm_denoise(y, Phi_sum, A, At, _lambda=1, gamma=0.01,
     Parameters
     ----------
     y : two-dimensional (2D) ndarray of ints, uints or floats
-        Input single measurement of the snapshot compressive imager (SCI).
+        Input single measurement of the snapshot compressive imager (SCI), or
+        a batch of measurements (B x H x W) sharing the same masks, with `A`
+        and `At` (or `operator`) taking the leading batch dimension.
     Phi : three-dimensional (3D) ndarray of ints, uints or floats, omitted
         Input sensing matrix of SCI with the third dimension as the 
         time-variant, spectral-variant, volume-variant, or angular-variant 
@@ -747,6 +1069,14 @@ def admm_denoise(y, Phi_sum, A, At, _lambda=1, gamma=0.01,
         Maximum number of iterations.
     accelerate : boolean, optional
         Enable acceleration in GAP.
+    acceleration : {None, 'fista', 'anderson', 'adaptive'}, optional
+        Acceleration of the PnP iterations, i.e., the FISTA/Nesterov momentum
+        or the Anderson acceleration over the last `history` iterations of
+        the state (theta, b) (see `utils.Acceleration`), or the residual 
+        balancing of the penalty `gamma` (see `utils.AdaptivePenalty`), 
+        reported to the per-iteration hooks `callback`.
+    history : int, optional
+        Window (number of iterations) of the Anderson acceleration.
     noise_estimate : boolean, optional
         Enable noise estimation in the denoiser.
     sigma : one-dimensional (1D) ndarray of ints, uints or floats
@@ -759,6 +1089,37 @@ def admm_denoise(y, Phi_sum, A, At, _lambda=1, gamma=0.01,
     x0 : 3D ndarray 
         Start point (initialized value) for the iteration process of the 
         reconstruction.
+    tol_res : float, optional
+        Tolerance of the relative measurement residual ||y-A(x)||/||y|| for
+        the early termination of each sigma stage (see `utils.EarlyStopping`).
+    tol_rel : float, optional
+        Tolerance of the relative update ||x-x_prev||/||x_prev|| for the 
+        early termination of each sigma stage.
+    patience : int, optional
+        Number of consecutive iterations meeting the tolerances to stop a 
+        sigma stage and skip ahead to the next sigma level.
+    stats : dict, optional
+        Statistics of the reconstruction, where the number of iterations 
+        actually used of each sigma stage is appended to `stats['iters']`.
+    iqa_every : int, optional
+        Interval (in iterations) of the PSNR evaluation against `X_orig`
+        with `show_iqa`, done in a background thread on a snapshot of the
+        reconstruction, where the last iteration of each sigma stage is
+        always evaluated and `psnr_all` is the PSNR curve sampled at this
+        interval (see `utils.IQAMonitor`).
+    callback : callable or list of callables, optional
+        Per-iteration profiling hooks called with the timings of the 
+        projection, the denoising and the IQA, the residual norm, the sigma
+        stage and the memory high-water mark of each iteration (see 
+        `utils.IterationHooks`, and `utils.Profiler` for a built-in one).
+    dtype : data-type or DtypePolicy, optional
+        Data type policy of the reconstruction (see `utils.DtypePolicy`), 
+        float32 by default, e.g., `DtypePolicy(np.float32, storage=np.float16,
+        check=True)` for the float16 storage of the state arrays with the 
+        check of unintended upcasts.
+    operator : SCIOperator, optional
+        Forward model object with preallocated workspace. If provided, the 
+        fused projection `operator.admm_step` replaces `A` and `At`.
 
     Returns
     -------
@@ -790,78 +1151,264 @@ def admm_denoise(y, Phi_sum, A, At, _lambda=1, gamma=0.01,
     gap_denoise
     '''
     # [0] initialization
+    nbatch = y.shape[0] if y.ndim > 2 else 0 # batch of measurements (B x H x W)
+    policy = DtypePolicy.get(dtype) # compute (and storage) data type
+    y = policy(y)
     if x0 is None:
-        x0 = At(y) # default start point (initialized value)
+        x0 = At(y) if operator is None else operator.adjoint(y) # default start point (initialized value)
+        x0 = policy(x0, 'At')
+    x0 = policy(x0) # start point in the compute data type
     if not isinstance(sigma, list):
         sigma = [sigma]
     if not isinstance(iter_max, list):
         iter_max = [iter_max] * len(sigma)
     # [1] start iteration for reconstruction
     x = x0 # initialization
-    theta = x0
-    b = np.zeros_like(x0)
-    psnr_all = []
+    theta = policy.store(x0)
+    b = policy.store(np.zeros_like(x0))
+    if operator is not None:
+        xbuf = np.empty_like(x0) # output buffer of the fused projection
+    # denoiser created once per process and kept resident (see `denoisers`)
+    denoise = get_denoiser(denoiser, tv_weight=tv_weight, tv_iter_max=tv_iter_max,
+                           multichannel=multichannel, noise_estimate=noise_estimate,
+                           model=model, window_batch=window_batch)
+    # early termination of the sigma stages (disabled by default)
+    stopper = EarlyStopping(tol_res, tol_rel, patience, nbatch, stats)
+    # per-iteration profiling hooks (disabled without callback)
+    hooks = IterationHooks(callback, 'ADMM-'+denoiser.upper(), nbatch)
+    # acceleration of the iterations of each sigma stage (disabled by default)
+    penalty = AdaptivePenalty(gamma) if acceleration == 'adaptive' else None
+    accel = Acceleration(None if penalty else acceleration, history, nbatch)
+    # throttled IQA in a background thread (disabled without X_orig)
+    iqa = IQAMonitor(X_orig, iqa_every, hooks.solver, nbatch, show_iqa, stats=stats)
     k = 0
     for idx, nsig in enumerate(sigma): # iterate all noise levels
+        stopper.start()
+        accel.start()
         for it in range(iter_max[idx]):
+            hooks.start()
+            (theta, b) = (policy(theta), policy(b)) # from storage
+            accel.begin(theta, b)
             # Euclidean projection
-            yb = A(theta+b)
-            x = (theta+b) + _lambda*(At((y-yb)/(Phi_sum+gamma))) # ADMM
-            # switch denoiser 
-            if denoiser.lower() == 'tv': # total variation (TV) denoising
-                theta = denoise_tv_chambolle(x-b, tv_weight, n_iter_max=tv_iter_max, 
-                                         multichannel=multichannel)
-            elif denoiser.lower() == 'wavelet': # wavelet denoising
-                if noise_estimate or nsig is None: # noise estimation enabled
-                    theta = denoise_wavelet(x-b, multichannel=multichannel)
-                else:
-                    theta = denoise_wavelet(x-b, sigma=nsig, multichannel=multichannel)
-            # elif denoiser.lower() == 'vnlnet': # Video Non-local net denoising
-            #     theta = vnlnet(np.expand_dims((x-b).transpose(2,0,1),3), nsig)
-            #     theta = np.transpose(theta.squeeze(3),(1,2,0))
-            elif denoiser.lower() == 'ffdnet': # FFDNet frame-wise video denoising
-                theta = ffdnet_vdenoiser(x-b, nsig, model) 
-            elif denoiser.lower() == 'fastdvdnet': # FastDVDnet video denoising
-                theta = fastdvdnet_denoiser(x-b, nsig, model, gray=True)
-                
-                # # joint demosaicking and decompressing for color SCI
-                # x = x.transpose(0,1,3,2) # H x W x C x M -> H x W x N x C
-                # x = fastdvdnet_denoiser(x, nsig, model) # color video denoising
-                # x = x.transpose(0,1,3,2) # H x W x N x C -> H x W x C x N
+            if operator is not None: # fused projection into x
+                x = operator.admm_step(theta, b, y, gamma, _lambda, out=xbuf)
             else:
-                raise ValueError('Unsupported denoiser {}!'.format(denoiser))
+                yb = A(theta+b)
+                x = (theta+b) + _lambda*(At((y-yb)/(Phi_sum+gamma))) # ADMM
+            x = policy(x, 'ADMM projection')
+            hooks.lap('proj')
+            # denoising [all the frames of the batch at once]
+            theta_prev = theta
+            theta = policy(denoise(x-b, nsig, nbatch), 
+                           'Denoiser {}'.format(denoiser))
+            hooks.lap('denoise')
             
             # theta = np.clip(theta,0,1) # [zzh] new code from xinyuan(3/3), this is optional, sometimes, when you are sure that theta \in [0 1], you can use this to compress the noise
             
             b = b - (x-theta) # update residual
-            # [optional] calculate image quality assessment, i.e., PSNR for 
-            # every five iterations
-            if show_iqa and X_orig is not None:
-                psnr_all.append(psnr(X_orig, x))
-                if (k+1)%5 == 0:
-                    if not noise_estimate and nsig is not None:
-                        if nsig < 1:
-                            print('  ADMM-{0} iteration {1: 3d}, sigma {2: 3g}/255, ' 
-                              'PSNR {3:2.2f} dB.'.format(denoiser.upper(), 
-                               k+1, nsig*255, psnr_all[k]))
-                        else:
-                            print('  ADMM-{0} iteration {1: 3d}, sigma {2: 3g}, ' 
-                                'PSNR {3:2.2f} dB.'.format(denoiser.upper(), 
-                                k+1, nsig, psnr_all[k]))
-                    else:
-                        print('  ADMM-{0} iteration {1: 3d}, ' 
-                              'PSNR {2: 2.2f} dB.'.format(denoiser.upper(), 
-                               k+1, psnr_all[k]))
+            if penalty is not None: # residual balancing of gamma
+                b = b / penalty(x, theta, theta_prev)
+                gamma = penalty.gamma
+            hooks.lap('proj')
+            # [optional] image quality assessment, i.e., PSNR of every `iqa_every`
+            # iterations (in the background)
+            iqa(k, x, None if noise_estimate else nsig)
+            hooks.lap('iqa')
+            hooks(k, idx, nsig, y, operator.yb if operator is not None else yb, 
+                  **(dict(gamma=gamma) if penalty else accel.info))
+            k = k+1
+            if (stopper(x, y, operator.yb if operator is not None else yb) 
+                    and it+1 < iter_max[idx]): # stage converged
+                print('  ADMM-{0} sigma stage {1} of {2} converged after '
+                      '{3} of {4} iterations.'.format(denoiser.upper(), 
+                      idx+1, len(sigma), it+1, iter_max[idx]))
+                break
+            if accel.enabled and it+1 < iter_max[idx]: # state of the next iteration
+                (theta, b) = accel(theta, b)
+            (theta, b) = map(policy.store, (theta, b)) # state kept in the storage data type
+        iqa.stage_end(x, None if noise_estimate else nsig)
+        stopper.finish()
+    x = policy(x)
+    
+    psnr_ = []
+    ssim_ = []
+    if X_orig is not None:
+        psnr_, ssim_ = _frame_iqa(X_orig, x, nbatch)
+    return x, psnr_, ssim_, iqa.results()
+
+def _torch_backend(operator, acceleration):
+    '''
+    Check the arguments of the solvers of the torch backend.
+    '''
+    if not isinstance(operator, TorchSCIOperator):
+        raise ValueError('The torch backend requires the forward model `operator` '
+                         '(see `utils.TorchSCIOperator`).')
+    if acceleration is not None:
+        raise ValueError('Unsupported acceleration {} of the torch backend!'.format(
+                         acceleration))
+
+def gap_denoise_torch(y, Phi_sum, A, At, _lambda=1, accelerate=True, 
+                denoiser='tv', iter_max=50, noise_estimate=False, sigma=None, 
+                tv_weight=0.1, tv_iter_max=5, multichannel=True, x0=None, 
+                X_orig=None, model=None, show_iqa=True, tvm='tv_chambolle',
+                operator=None,
+                tol_res=None, tol_rel=None, patience=1, stats=None, callback=None,
+                iqa_every=1, acceleration=None, window_batch=None, dtype=np.float32):
+    '''
+    Generalized alternating projection (GAP)-based denoising regularization 
+    for snapshot compressive imaging (SCI) with the torch backend, i.e., 
+    `gap_denoise` with the measurement, the masks, the reconstruction and 
+    the projection resident as torch tensors on the device of the forward 
+    model `operator` (a `utils.TorchSCIOperator`, replacing `A`, `At` and 
+    `Phi_sum`) for the whole solve.
+
+    The reconstruction crosses back to NumPy only for the IQA snapshots and
+    at the end, as the deep denoisers (FFDNet, FastDVDnet) run on the 
+    tensors, while the denoisers without a tensor path (e.g., TV and 
+    wavelet denoising) still take a host round trip per iteration (see 
+    `denoisers.Denoiser`). The `acceleration` of the iterations is not 
+    supported and the `dtype` policy sets the data type of the tensors 
+    only (the one of `operator`).
+
+    All the other parameters and the returns are the ones of `gap_denoise`.
+
+    See Also
+    --------
+    gap_denoise, admm_denoise_torch
+    '''
+    # [0] initialization
+    _torch_backend(operator, acceleration)
+    nbatch = y.shape[0] if y.ndim > 2 else 0 # batch of measurements (B x H x W)
+    y = operator.tensor(y)
+    if x0 is None:
+        x0 = operator.adjoint(y) # default start point (initialized value)
+    else:
+        x0 = operator.tensor(x0).clone() # copy, as x is updated in place by the projection
+    if not isinstance(sigma, list):
+        sigma = [sigma]
+    if not isinstance(iter_max, list):
+        iter_max = [iter_max] * len(sigma)
+    y1 = y.new_zeros(y.shape)
+    # [1] start iteration for reconstruction
+    x = x0 # initialization
+    # denoiser created once per process and kept resident (see `denoisers`)
+    denoise = get_denoiser(denoiser, tv_weight=tv_weight, tv_iter_max=tv_iter_max,
+                           multichannel=multichannel, tvm=tvm, noise_estimate=noise_estimate,
+                           model=model, window_batch=window_batch)
+    # early termination of the sigma stages (disabled by default)
+    stopper = EarlyStopping(tol_res, tol_rel, patience, nbatch, stats)
+    # per-iteration profiling hooks (disabled without callback)
+    hooks = IterationHooks(callback, 'GAP-'+denoiser.upper(), nbatch)
+    # throttled IQA in a background thread (disabled without X_orig)
+    iqa = IQAMonitor(X_orig, iqa_every, hooks.solver, nbatch, show_iqa, stats=stats)
+    k = 0
+    for idx, nsig in enumerate(sigma): # iterate all noise levels
+        stopper.start()
+        for it in range(iter_max[idx]):
+            hooks.start()
+            x = operator.gap_step(x, y, y1 if accelerate else None, _lambda)
+            hooks.lap('proj')
+            # denoising [all the frames of the batch at once]
+            x = denoise(x, nsig, nbatch)
+            hooks.lap('denoise')
+            # [optional] image quality assessment, i.e., PSNR of every `iqa_every`
+            # iterations (in the background)
+            iqa(k, x, None if noise_estimate else nsig)
+            hooks.lap('iqa')
+            hooks(k, idx, nsig, y, operator.yb)
+            k = k+1
+            if stopper(x, y, operator.yb) and it+1 < iter_max[idx]: # stage converged
+                print('  GAP-{0} sigma stage {1} of {2} converged after '
+                      '{3} of {4} iterations.'.format(denoiser.upper(), 
+                      idx+1, len(sigma), it+1, iter_max[idx]))
+                break
+        iqa.stage_end(x, None if noise_estimate else nsig)
+        stopper.finish()
+    x = to_numpy(x)
+    
+    psnr_ = []
+    ssim_ = []
+    if X_orig is not None:
+        psnr_, ssim_ = _frame_iqa(X_orig, x, nbatch)
+    return x, psnr_, ssim_, iqa.results()
+
+def admm_denoise_torch(y, Phi_sum, A, At, _lambda=1, gamma=0.01, 
+                denoiser='tv', iter_max=50, noise_estimate=False, sigma=None, 
+                tv_weight=0.1, tv_iter_max=5, multichannel=True, x0=None, model=None,
+                X_orig=None, show_iqa=True, operator=None,
+                tol_res=None, tol_rel=None, patience=1, stats=None, callback=None,
+                iqa_every=1, acceleration=None, window_batch=None, dtype=np.float32):
+    '''
+    Alternating direction method of multipliers (ADMM)-based denoising 
+    regularization for snapshot compressive imaging (SCI) with the torch 
+    backend, i.e., `admm_denoise` on torch tensors resident on the device of
+    the forward model `operator` (see `gap_denoise_torch`).
+
+    All the other parameters and the returns are the ones of `admm_denoise`.
+
+    See Also
+    --------
+    admm_denoise, gap_denoise_torch
+    '''
+    # [0] initialization
+    _torch_backend(operator, acceleration)
+    nbatch = y.shape[0] if y.ndim > 2 else 0 # batch of measurements (B x H x W)
+    y = operator.tensor(y)
+    if x0 is None:
+        x0 = operator.adjoint(y) # default start point (initialized value)
+    else:
+        x0 = operator.tensor(x0)
+    if not isinstance(sigma, list):
+        sigma = [sigma]
+    if not isinstance(iter_max, list):
+        iter_max = [iter_max] * len(sigma)
+    # [1] start iteration for reconstruction
+    x = x0 # initialization
+    theta = x0
+    b = x0.new_zeros(x0.shape)
+    # denoiser created once per process and kept resident (see `denoisers`)
+    denoise = get_denoiser(denoiser, tv_weight=tv_weight, tv_iter_max=tv_iter_max,
+                           multichannel=multichannel, noise_estimate=noise_estimate,
+                           model=model, window_batch=window_batch)
+    # early termination of the sigma stages (disabled by default)
+    stopper = EarlyStopping(tol_res, tol_rel, patience, nbatch, stats)
+    # per-iteration profiling hooks (disabled without callback)
+    hooks = IterationHooks(callback, 'ADMM-'+denoiser.upper(), nbatch)
+    # throttled IQA in a background thread (disabled without X_orig)
+    iqa = IQAMonitor(X_orig, iqa_every, hooks.solver, nbatch, show_iqa, stats=stats)
+    k = 0
+    for idx, nsig in enumerate(sigma): # iterate all noise levels
+        stopper.start()
+        for it in range(iter_max[idx]):
+            hooks.start()
+            # Euclidean projection
+            x = operator.admm_step(theta, b, y, gamma, _lambda)
+            hooks.lap('proj')
+            # denoising [all the frames of the batch at once]
+            theta = denoise(x-b, nsig, nbatch)
+            hooks.lap('denoise')
+            b = b - (x-theta) # update residual
+            hooks.lap('proj')
+            # [optional] image quality assessment, i.e., PSNR of every `iqa_every`
+            # iterations (in the background)
+            iqa(k, x, None if noise_estimate else nsig)
+            hooks.lap('iqa')
+            hooks(k, idx, nsig, y, operator.yb)
             k = k+1
+            if stopper(x, y, operator.yb) and it+1 < iter_max[idx]: # stage converged
+                print('  ADMM-{0} sigma stage {1} of {2} converged after '
+                      '{3} of {4} iterations.'.format(denoiser.upper(), 
+                      idx+1, len(sigma), it+1, iter_max[idx]))
+                break
+        iqa.stage_end(x, None if noise_estimate else nsig)
+        stopper.finish()
+    x = to_numpy(x)
     
     psnr_ = []
     ssim_ = []
-    nmask = x.shape[2]
     if X_orig is not None:
-        for imask in range(nmask):
-            psnr_.append(compare_psnr(X_orig[:,:,imask], x[:,:,imask], data_range=1.))
-            ssim_.append(compare_ssim(X_orig[:,:,imask], x[:,:,imask], data_range=1.))
-    return x, psnr_, ssim_, psnr_all
+        psnr_, ssim_ = _frame_iqa(X_orig, x, nbatch)
+    return x, psnr_, ssim_, iqa.results()
 
 def GAP_TV_rec(y,Phi,A, At,Phi_sum, maxiter, step_size, weight, row, col, ColT, X_ori):
     y1 = np.zeros((row,col))
@@ -905,3 +1452,5 @@ def ADMM_TV_rec(y,Phi,A, At,Phi_sum, maxiter, step_size, weight, row, col, ColT,
               " time = %3.1fs."
               % (ni+1, psnr(v, X_ori), end_time-begin_time))
     return v
+
+record_import(__name__, _t0)
@@ -12,22 +12,19 @@
 # %%
 import os
 import time
+_t0 = time.perf_counter()
 import math
-import h5py
 import numpy as np
 import scipy.io as sio
 from statistics import mean
 from pnp_sci_algo import admmdenoise_cacti
 from joint_pnp_sci_algo import joint_admmdenoise_cacti
-from utils import (A_, At_, show_n_save_res)
-import matplotlib.pyplot as plt
+from utils import (A_, At_, show_n_save_res, record_import, startup_report)
 from scipy.io.matlab.mio import _open_file
 from scipy.io.matlab.miobase import get_matfile_version
-# import deep models
-import torch
-from packages.ffdnet.models import FFDNet
-from packages.fastdvdnet.models import FastDVDnet
+# the deep models (torch) are imported by the runs requesting them, see [2.2]-[2.5]
 import argparse
+record_import(os.path.basename(__file__), _t0)
 
 
 #%%
@@ -58,6 +55,8 @@ parser.add_argument("--sigma2", nargs='+', type=float)  # list
 parser.add_argument("--gamma", type=float)
 parser.add_argument("--gaussian_noise_level", type=float)
 parser.add_argument("--poisson_noise", type=int)
+parser.add_argument("--cache_dir", type=str, default=None) # stage cache
+parser.add_argument("--startup_report_flag", type=int, default=0) # print the import times
 
 # parser.add_argument("--orig_name", type=str, default='football')
 # parser.add_argument("--scale", type=str, default='256')
@@ -105,6 +104,8 @@ sigma2 = args.sigma2
 gamma = args.gamma
 gaussian_noise_level = args.gaussian_noise_level
 poisson_noise = args.poisson_noise
+cache_dir = args.cache_dir
+startup_report_flag = args.startup_report_flag
 
 # %%
 # [0] environment configuration
@@ -132,6 +133,7 @@ if get_matfile_version(_open_file(maskpath, appendmat=True)[0])[0] < 2: # MATLAB
     mask = np.float32(mask)
     orig = np.float32(orig)
 else: # MATLAB .mat v7.3
+    import h5py
     with h5py.File(origpath, 'r') as origfile: # for '-v7.3' .mat file (MATLAB)
         orig = np.array(origfile['orig'])
         orig = np.float32(orig).transpose((2,1,0))
@@ -247,6 +249,9 @@ if test_algo_flag == 'gapffdnet':
     useGPU = True # use GPU
 
     # pre-load the model for FFDNet image denoising
+    import torch
+    from packages.ffdnet.models import FFDNet
+    from packages.ffdnet.utils import (remove_dataparallel_wrapper, load_weights)
     in_ch = 1
     model_fn = 'packages/ffdnet/models/net_gray.pth'
     # Absolute path to model file
@@ -256,11 +261,11 @@ if test_algo_flag == 'gapffdnet':
     net = FFDNet(num_input_channels=in_ch)
     # Load saved weights
     if useGPU:
-        state_dict = torch.load(model_fn)
+        state_dict = load_weights(model_fn)
         device_ids = [0]
         model = torch.nn.DataParallel(net, device_ids=device_ids).cuda()
     else:
-        state_dict = torch.load(model_fn, map_location='cpu')
+        state_dict = load_weights(model_fn, map_location='cpu')
         # CPU mode: remove the DataParallel wrapper
         state_dict = remove_dataparallel_wrapper(state_dict)
         model = net
@@ -299,6 +304,9 @@ if test_algo_flag == 'admmffdnet':
     useGPU = True # use GPU
 
     # pre-load the model for FFDNet image denoising
+    import torch
+    from packages.ffdnet.models import FFDNet
+    from packages.ffdnet.utils import (remove_dataparallel_wrapper, load_weights)
     in_ch = 1
     model_fn = 'packages/ffdnet/models/net_gray.pth'
     # Absolute path to model file
@@ -308,11 +316,11 @@ if test_algo_flag == 'admmffdnet':
     net = FFDNet(num_input_channels=in_ch)
     # Load saved weights
     if useGPU:
-        state_dict = torch.load(model_fn)
+        state_dict = load_weights(model_fn)
         device_ids = [0]
         model = torch.nn.DataParallel(net, device_ids=device_ids).cuda()
     else:
-        state_dict = torch.load(model_fn, map_location='cpu')
+        state_dict = load_weights(model_fn, map_location='cpu')
         # CPU mode: remove the DataParallel wrapper
         state_dict = remove_dataparallel_wrapper(state_dict)
         model = net
@@ -354,11 +362,14 @@ if test_algo_flag == 'gapfastdvdnet':
     useGPU = True # use GPU
 
     # pre-load the model for fastdvdnet image denoising
+    import torch
+    from packages.fastdvdnet.models import FastDVDnet
+    from packages.fastdvdnet.utils import load_weights
     NUM_IN_FR_EXT = 5 # temporal size of patch
     model = FastDVDnet(num_input_frames=NUM_IN_FR_EXT,num_color_channels=1)
 
     # Load saved weights
-    state_temp_dict = torch.load('./packages/fastdvdnet/model_gray.pth')
+    state_temp_dict = load_weights('./packages/fastdvdnet/model_gray.pth')
     if useGPU:
         device_ids = [0]
         # model = torch.nn.DataParallel(model, device_ids=device_ids).cuda()
@@ -404,11 +415,14 @@ if test_algo_flag == 'admmfastdvdnet':
     useGPU = True # use GPU
 
     # pre-load the model for fastdvdnet image denoising
+    import torch
+    from packages.fastdvdnet.models import FastDVDnet
+    from packages.fastdvdnet.utils import load_weights
     NUM_IN_FR_EXT = 5 # temporal size of patch
     model = FastDVDnet(num_input_frames=NUM_IN_FR_EXT,num_color_channels=1)
 
     # Load saved weights
-    state_temp_dict = torch.load('./packages/fastdvdnet/model_gray.pth')
+    state_temp_dict = load_weights('./packages/fastdvdnet/model_gray.pth')
     if useGPU:
         device_ids = [0]
         # model = torch.nn.DataParallel(model, device_ids=device_ids).cuda()
@@ -463,6 +477,9 @@ if test_algo_flag=='gaptv+ffdnet':
     useGPU = True # use GPU
     
     # pre-load the model for FFDNet image denoising
+    import torch
+    from packages.ffdnet.models import FFDNet
+    from packages.ffdnet.utils import (remove_dataparallel_wrapper, load_weights)
     in_ch = 1
     model_fn = 'packages/ffdnet/models/net_gray.pth'
     # Absolute path to model file
@@ -472,11 +489,11 @@ if test_algo_flag=='gaptv+ffdnet':
     net = FFDNet(num_input_channels=in_ch)
     # Load saved weights
     if useGPU:
-        state_dict = torch.load(model_fn)
+        state_dict = load_weights(model_fn)
         device_ids = [0]
         model = torch.nn.DataParallel(net, device_ids=device_ids).cuda()
     else:
-        state_dict = torch.load(model_fn, map_location='cpu')
+        state_dict = load_weights(model_fn, map_location='cpu')
         # CPU mode: remove the DataParallel wrapper
         state_dict = remove_dataparallel_wrapper(state_dict)
         model = net
@@ -490,7 +507,8 @@ if test_algo_flag=='gaptv+ffdnet':
                                             _lambda=_lambda, accelerate=accelerate,
                                             denoiser=denoiser, iter_max1=iter_max1, iter_max2=iter_max2,
                                             tv_weight=tv_weight, tv_iter_max=tv_iter_max, 
-                                            model=model, sigma1=sigma1, sigma2=sigma2, tvm='tv_chambolle')
+                                            model=model, sigma1=sigma1, sigma2=sigma2, tvm='tv_chambolle',
+                                            cache=cache_dir)
                                             
 
     print('-'*20+'\n{}-{} PSNR {:2.2f} dB, SSIM {:.4f}, running time {:.1f} seconds.\n'.format(
@@ -525,6 +543,9 @@ if test_algo_flag == 'admmtv+ffdnet':
     useGPU = True # use GPU
 
     # pre-load the model for FFDNet image denoising
+    import torch
+    from packages.ffdnet.models import FFDNet
+    from packages.ffdnet.utils import (remove_dataparallel_wrapper, load_weights)
     in_ch = 1
     model_fn = 'packages/ffdnet/models/net_gray.pth'
     # Absolute path to model file
@@ -534,11 +555,11 @@ if test_algo_flag == 'admmtv+ffdnet':
     net = FFDNet(num_input_channels=in_ch)
     # Load saved weights
     if useGPU:
-        state_dict = torch.load(model_fn)
+        state_dict = load_weights(model_fn)
         device_ids = [0]
         model = torch.nn.DataParallel(net, device_ids=device_ids).cuda()
     else:
-        state_dict = torch.load(model_fn, map_location='cpu')
+        state_dict = load_weights(model_fn, map_location='cpu')
         # CPU mode: remove the DataParallel wrapper
         state_dict = remove_dataparallel_wrapper(state_dict)
         model = net
@@ -552,7 +573,8 @@ if test_algo_flag == 'admmtv+ffdnet':
                                             _lambda=_lambda, gamma=gamma,
                                             denoiser=denoiser, iter_max1=iter_max1, iter_max2=iter_max2,
                                             tv_weight=tv_weight, tv_iter_max=tv_iter_max, 
-                                            model=model, sigma1=sigma1, sigma2=sigma2, tvm=tvm)
+                                            model=model, sigma1=sigma1, sigma2=sigma2, tvm=tvm,
+                                            cache=cache_dir)
 
     print('-'*20+'\n{}-{} PSNR {:2.2f} dB, SSIM {:.4f}, running time {:.1f} seconds.\n'.format(
         projmeth.upper(), denoiser.upper(), mean(psnr_admmtvffdnet), mean(ssim_admmtvffdnet), tadmmtvffdnet)+'-'*20)
@@ -569,8 +591,6 @@ if test_algo_flag == 'admmtv+ffdnet':
     
 # %%
 ## [2.5] GAP/ADMM-gaptv+fastdvdnet
-import torch
-from packages.fastdvdnet.models import FastDVDnet
 
 ### [2.5.1] GAP-TV+FASTDVDNET
 if test_algo_flag=='gaptv+fastdvdnet':
@@ -592,11 +612,14 @@ if test_algo_flag=='gaptv+fastdvdnet':
     useGPU = True # use GPU
 
     # pre-load the model for fastdvdnet image denoising
+    import torch
+    from packages.fastdvdnet.models import FastDVDnet
+    from packages.fastdvdnet.utils import load_weights
     NUM_IN_FR_EXT = 5 # temporal size of patch
     model = FastDVDnet(num_input_frames=NUM_IN_FR_EXT,num_color_channels=1)
 
     # Load saved weights
-    state_temp_dict = torch.load('./packages/fastdvdnet/model_gray.pth')
+    state_temp_dict = load_weights('./packages/fastdvdnet/model_gray.pth')
     if useGPU:
         device_ids = [0]
         # model = torch.nn.DataParallel(model, device_ids=device_ids).cuda()
@@ -617,7 +640,8 @@ if test_algo_flag=='gaptv+fastdvdnet':
                                             _lambda=_lambda, accelerate=accelerate,
                                             denoiser=denoiser, iter_max1=iter_max1, iter_max2=iter_max2,
                                             tv_weight=tv_weight, tv_iter_max=tv_iter_max, 
-                                            model=model, sigma1=sigma1, sigma2=sigma2, tvm='tv_chambolle')
+                                            model=model, sigma1=sigma1, sigma2=sigma2, tvm='tv_chambolle',
+                                            cache=cache_dir)
 
     print('-'*20+'\n{}-{} PSNR {:2.2f} dB, SSIM {:.4f}, running time {:.1f} seconds.\n'.format(
         projmeth.upper(), denoiser.upper(), mean(psnr_gaptvfastdvdnet), mean(ssim_gaptvfastdvdnet), tgaptvfastdvdnet)+'-'*20)
@@ -651,11 +675,14 @@ if test_algo_flag == 'admmtv+fastdvdnet':
     useGPU = True # use GPU
 
     # pre-load the model for fastdvdnet image denoising
+    import torch
+    from packages.fastdvdnet.models import FastDVDnet
+    from packages.fastdvdnet.utils import load_weights
     NUM_IN_FR_EXT = 5 # temporal size of patch
     model = FastDVDnet(num_input_frames=NUM_IN_FR_EXT,num_color_channels=1)
 
     # Load saved weights
-    state_temp_dict = torch.load('./packages/fastdvdnet/model_gray.pth')
+    state_temp_dict = load_weights('./packages/fastdvdnet/model_gray.pth')
     if useGPU:
         device_ids = [0]
         # model = torch.nn.DataParallel(model, device_ids=device_ids).cuda()
@@ -676,7 +703,8 @@ if test_algo_flag == 'admmtv+fastdvdnet':
                                             _lambda=_lambda, gamma=gamma,
                                             denoiser=denoiser, iter_max1=iter_max1, iter_max2=iter_max2,
                                             tv_weight=tv_weight, tv_iter_max=tv_iter_max, 
-                                            model=model, sigma1=sigma1, sigma2=sigma2, tvm='tv_chambolle')
+                                            model=model, sigma1=sigma1, sigma2=sigma2, tvm='tv_chambolle',
+                                            cache=cache_dir)
 
     print('-'*20+'\n{}-{} PSNR {:2.2f} dB, SSIM {:.4f}, running time {:.1f} seconds.\n'.format(
         projmeth.upper(), denoiser.upper(), mean(psnr_admmtvfastdvdnet), mean(ssim_admmtvfastdvdnet), tadmmtvfastdvdnet)+'-'*20)
@@ -705,6 +733,10 @@ if log_result_flag:
 # if show_res_flag:
 #     plt.show()
 
+# startup time (import times of the modules and of the deep models)
+if startup_report_flag:
+    startup_report()
+
 if save_param_flag:
     # params path
     param_dir = resultsdir+'/savedfig/'
@@ -1,10 +1,13 @@
 import os
 import numpy as np
 from utils import cli_run
+from sweep import (param_grid, run_sweep, print_table)
 #%%
 # [0] config & params
 ## engine choose
 engine_flag = 'cli_test'
+# engine_flag = 'sweep'
+# engine_flag = 'gaptv_finetune_sweep'
 # engine_flag = 'gaptv_finetune'
 # engine_flag = 'gaptv_cacti'
 # engine_flag = 'pnp-cacti'
@@ -29,6 +32,9 @@ sigma1 = 0     # scaler
 show_res_flag = 0
 save_res_flag = 0
 log_result_flag = 0
+cache_dir = None # stage cache shared by the runs (e.g., './results/cache')
+sweep_workers = 1 # number of worker processes of the in-process sweeps
+manifest = './results/sweep_manifest.jsonl' # finished configurations, for resuming (None to disable)
 
 iframe = 0                 # from which frame of meas to recon            
 nframe = 1       # how many frame of meas to recon [img_num//Cr ]
@@ -55,6 +61,30 @@ opti_sigma_iter_table_exp2 = {'256_Cr10': [20, [20, 30, 90], [100/255, 50/255, 2
 
 # [0] cli_test
 mask_name = 'binary_mask'
+# [0] in-process sweeps (each dataset loaded once, models kept resident)
+root_dir = '.' # as `cli_run`
+if engine_flag == 'sweep' and __name__ == '__main__':
+    configs = []
+    for config in param_grid(scale=scales, Cr=Crs, orig_name=orig_names):
+        scale_Cr = config['scale']+'_Cr'+str(config['Cr'])
+        configs.append(dict(config, root_dir=root_dir, mask_name=mask_name, 
+                            test_algo_flag='gaptv+fastdvdnet', iframe=iframe, 
+                            nframe=img_num//config['Cr'], MAXB=MAXB, 
+                            tv_weight=opti_tv_weight_table_exp2[scale_Cr],
+                            iter_max1=opti_sigma_iter_table_exp2[scale_Cr][0], sigma1=sigma1,
+                            iter_max2=opti_sigma_iter_table_exp2[scale_Cr][1], 
+                            sigma2=opti_sigma_iter_table_exp2[scale_Cr][2], cache=cache_dir))
+    table = run_sweep(configs, workers=sweep_workers, manifest=manifest)
+    print_table(table, ['orig_name', 'scale', 'Cr', 'test_algo_flag', 'psnr', 'ssim', 'time'])
+
+if engine_flag == 'gaptv_finetune_sweep' and __name__ == '__main__':
+    configs = param_grid(mask_name=mask_names, tv_weight=np.arange(0.05, 0.5, 0.05), 
+                         orig_name=orig_names, root_dir=[root_dir], scale=scales[:1], 
+                         Cr=Crs[:1], test_algo_flag=['gaptv'], iframe=[iframe], 
+                         nframe=[nframe], MAXB=[MAXB], iter_max1=[iter_max1])
+    table = run_sweep(configs, workers=sweep_workers, manifest=manifest)
+    print_table(table, ['mask_name', 'tv_weight', 'orig_name', 'psnr', 'ssim', 'time'])
+
 if engine_flag == 'cli_test':
     for scale in scales:
         for Cr in Crs:
@@ -67,7 +97,8 @@ if engine_flag == 'cli_test':
                 show_res_flag = show_res_flag, save_res_flag =  save_res_flag , log_result_flag=log_result_flag,
                 tv_weight = opti_tv_weight_table_exp2[scale+'_Cr'+str(Cr)], 
                 iter_max1 = opti_sigma_iter_table_exp2[scale+'_Cr'+str(Cr)][0], sigma1 = sigma1, 
-                iter_max2 = opti_sigma_iter_table_exp2[scale+'_Cr'+str(Cr)][1], sigma2 = opti_sigma_iter_table_exp2[scale+'_Cr'+str(Cr)][2])
+                iter_max2 = opti_sigma_iter_table_exp2[scale+'_Cr'+str(Cr)][1], sigma2 = opti_sigma_iter_table_exp2[scale+'_Cr'+str(Cr)][2],
+                cache_dir = cache_dir)
                      
 # [1] gaptv_finetune
 # exp0:
@@ -0,0 +1,203 @@
+''' In-process parameter sweeps of the PnP-SCI algorithms '''
+import os
+import json
+import time
+import itertools
+import numpy as np
+from statistics import mean
+from pnp_sci_algo import admmdenoise_cacti
+from joint_pnp_sci_algo import joint_admmdenoise_cacti
+from utils import (A_, At_, MatFile, parallel_imap)
+
+# parameters selecting the dataset, loaded once for all their configurations
+DATA_KEYS = ('root_dir', 'orig_name', 'scale', 'Cr', 'mask_name')
+
+def param_grid(**axes):
+    '''
+    Cartesian product of the parameter `axes` (lists of values) as a list of
+    configurations (dicts), where a list-valued parameter is given as a list
+    of lists, e.g., `param_grid(orig_name=['kobe', 'traffic'],
+    iter_max2=[[10, 85], [20, 80]])`.
+    '''
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*axes.values())]
+
+def _jsonable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return repr(value)
+
+def config_key(config):
+    '''
+    Canonical key (JSON string) of the configuration `config`.
+    '''
+    return json.dumps(config, sort_keys=True, default=_jsonable)
+
+def load_simu_data(root_dir, orig_name, scale, Cr, mask_name):
+    '''
+    Load the simulated data (ground truth `orig` and masks `mask`) of a sweep
+    configuration as `pnp_sci_test_orig_cli.py`, with the measurements
+    `meas` calculated and normalized by the maximum of the masks.
+    '''
+    orig_dir = root_dir + '/dataset/simu_data/gray/orig'
+    mask_dir = root_dir + '/dataset/simu_data/gray/mask' # mask dataset
+    origpath = orig_dir + '/' + orig_name + "_" + scale + '.mat' # path of the .mat orig file
+    maskpath = mask_dir + '/' + mask_name + "_" + scale +  "_" + str(Cr) + 'f.mat' # path of the .mat mask file
+    with MatFile(origpath) as origfile:
+        orig = origfile.load('orig')
+    with MatFile(maskpath) as maskfile:
+        mask = maskfile.load('mask')
+
+    # calc meas
+    nmask = mask.shape[2]
+    norig = orig.shape[2]
+    meas = np.zeros([orig.shape[0], orig.shape[1], norig//nmask], dtype=np.float32)
+    for i in range(norig//nmask):
+        meas[:,:,i] = np.sum(orig[:,:,i*nmask:(i+1)*nmask]*mask, 2)
+    # normalize data
+    mask_max = np.max(mask)
+    return meas/mask_max, mask/mask_max, orig
+
+def pnp_recon(data, test_algo_flag, iframe=0, nframe=1, MAXB=255., tv_weight=None,
+              tv_iter_max=5, gamma=0., iter_max1=0, sigma1=0, iter_max2=[0],
+              sigma2=[0], **args):
+    '''
+    Reconstruct the data (meas, mask, orig) of a sweep configuration with the
+    algorithm `test_algo_flag` ('gaptv', 'admmtv', 'gapffdnet', 'admmffdnet',
+    'gapfastdvdnet', 'admmfastdvdnet', 'gaptv+ffdnet', 'admmtv+ffdnet',
+    'gaptv+fastdvdnet' or 'admmtv+fastdvdnet') with the parameters of
+    `pnp_sci_test_orig_cli.py`, i.e., `iter_max1` for TV and the first
+    period, `iter_max2` and `sigma2` for the deep denoisers and the second
+    period. All the other keyword arguments are passed to the solver (the 
+    stage `cache` to the joint denoising only).
+
+    The pretrained models are loaded once per process by the denoiser
+    registry (see `denoisers.get_denoiser`).
+
+    Returns
+    -------
+    res : dict
+        Mean 'psnr' and 'ssim' and running 'time' of the reconstruction.
+    '''
+    (meas, mask, orig) = data
+    A  = lambda x :  A_(x, mask) # forward model function handle
+    At = lambda y : At_(y, mask) # transpose of forward model
+    projmeth = 'gap' if test_algo_flag.startswith('gap') else 'admm'
+    denoiser = test_algo_flag[len(projmeth):]
+    args = dict(projmeth=projmeth, v0=None, orig=orig, iframe=iframe,
+                nframe=nframe, MAXB=MAXB, maskdirection='plain', _lambda=1, **args)
+    if projmeth == 'gap':
+        args['accelerate'] = True # enable accelerated version of GAP
+    else:
+        args['gamma'] = gamma
+    if '+' in denoiser: # joint denoising of two periods
+        res = joint_admmdenoise_cacti(meas, mask, A, At, denoiser=denoiser,
+                                      iter_max1=iter_max1, iter_max2=iter_max2,
+                                      sigma1=sigma1, sigma2=sigma2,
+                                      tv_weight=tv_weight, tv_iter_max=tv_iter_max,
+                                      tvm='tv_chambolle', **args)
+    else:
+        args.pop('cache', None) # stage cache of the joint denoising only
+        if denoiser == 'tv':
+            res = admmdenoise_cacti(meas, mask, A, At, denoiser=denoiser,
+                                    iter_max=iter_max1, tv_weight=tv_weight,
+                                    tv_iter_max=tv_iter_max, **args)
+        else:
+            res = admmdenoise_cacti(meas, mask, A, At, denoiser=denoiser,
+                                    iter_max=iter_max2, sigma=sigma2, **args)
+    (_, t_, psnr_, ssim_, _) = res
+    return dict(psnr=mean(psnr_) if psnr_ else None,
+                ssim=mean(ssim_) if ssim_ else None, time=t_)
+
+_data_cache = {} # data of the last dataset of this process
+
+def _sweep_run(config, load, recon, data_keys):
+    '''
+    Run a sweep configuration `config`, with the data loaded once per
+    process for all the configurations of the same dataset.
+    '''
+    data_args = {key: config[key] for key in data_keys if key in config}
+    dkey = config_key(data_args)
+    if dkey not in _data_cache:
+        _data_cache.clear() # keep only one dataset in memory
+        _data_cache[dkey] = load(**data_args)
+    args = {key: val for key, val in config.items() if key not in data_keys}
+    return dict(config, **recon(_data_cache[dkey], **args))
+
+def read_manifest(manifest):
+    '''
+    Records of the finished configurations of the manifest file `manifest`
+    (JSON lines), keyed by `config_key`.
+    '''
+    done = {}
+    if manifest is not None and os.path.exists(manifest):
+        with open(manifest, 'r') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    done[record['key']] = record['result']
+    return done
+
+def run_sweep(configs, load=load_simu_data, recon=pnp_recon, data_keys=DATA_KEYS,
+              workers=1, manifest=None):
+    '''
+    In-process parameter sweep over the configurations `configs` (dicts, see
+    `param_grid`), replacing the spawning of a script per configuration of
+    `utils.cli_run`.
+
+    The configurations are sorted by their dataset (the parameters
+    `data_keys`), so that each dataset is loaded by `load(**data_args)` only
+    once (per worker), and fanned out over a pool of `workers` processes
+    (see `utils.parallel_imap`), each calling `recon(data, **args)` with the
+    other parameters of the configuration. The workers are spawned instead
+    of forked once CUDA is initialized in this process.
+
+    With a `manifest` file, each finished configuration is appended to it
+    as soon as it is finished and the configurations already in it are
+    skipped, so that an interrupted sweep is resumed where it stopped.
+
+    Returns
+    -------
+    table : list of dicts
+        Result of each configuration (in the order of `configs`), i.e., the
+        configuration together with the results returned by `recon`.
+    '''
+    done = read_manifest(manifest)
+    todo = [config for config in configs if config_key(config) not in done]
+    todo.sort(key=lambda config: config_key({key: config[key] for key in data_keys
+                                             if key in config}))
+    print('Sweep of {} configurations ({} finished before) with {} workers ...'
+          .format(len(configs), len(configs)-len(todo), workers))
+    begin_time = time.time()
+    res_ = parallel_imap(_sweep_run, (dict(config=config) for config in todo),
+                         workers=workers, load=load, recon=recon, data_keys=data_keys)
+    for (k, (result, t)) in enumerate(res_):
+        key = config_key(todo[k])
+        done[key] = json.loads(json.dumps(result, default=_jsonable))
+        if manifest is not None:
+            with open(manifest, 'a') as f:
+                f.write(json.dumps({'key': key, 'result': done[key]}) + '\n')
+        print('[{:3d}/{:3d}] {} finished in {:.1f} seconds ({:.1f} seconds elapsed).'
+              .format(k+1, len(todo), key, t, time.time()-begin_time))
+    return [done[config_key(config)] for config in configs]
+
+def print_table(table, columns=None):
+    '''
+    Print the results `table` of `run_sweep`, with the `columns` (all the
+    parameters and the results by default).
+    '''
+    if not table:
+        return
+    if columns is None:
+        columns = list(table[0])
+    def fmt(val):
+        if isinstance(val, float):
+            return '{:.4f}'.format(val)
+        return str(val)
+    rows = [[fmt(record.get(col)) for col in columns] for record in table]
+    widths = [max(len(col), *(len(row[i]) for row in rows)) for (i, col) in enumerate(columns)]
+    print('  '.join(col.ljust(w) for (col, w) in zip(columns, widths)))
+    for row in rows:
+        print('  '.join(val.ljust(w) for (val, w) in zip(row, widths)))
@@ -1,11 +1,82 @@
 ''' Utilities '''
+import time
+_t0 = time.perf_counter()
 import math
+import importlib
 import numpy as np
-import matplotlib.pyplot as plt
 from statistics import mean
 import scipy.io as sio
 import os
-import cv2
+import sys
+import warnings
+import hashlib
+import json
+import pickle
+import multiprocessing
+from collections import deque
+from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor)
+
+_import_times = {} # seconds spent importing the modules, for `startup_report`
+
+def record_import(name, t0):
+    '''
+    Record the import time of the module `name` (whose import started at
+    `time.perf_counter()` `t0`) for `startup_report`.
+    '''
+    _import_times[name] = time.perf_counter() - t0
+
+def lazy_import(name):
+    '''
+    Import the module `name` on its first use only (timed for 
+    `startup_report`), so that the heavy backends, e.g., torch and the deep
+    denoisers, are only paid for by the runs requesting them.
+    '''
+    module = sys.modules.get(name)
+    if module is None:
+        t0 = time.perf_counter()
+        module = importlib.import_module(name)
+        record_import(name, t0)
+    return module
+
+def lazy_function(module, name):
+    '''
+    Function `name` of the module `module`, imported by `lazy_import` on its
+    first call.
+    '''
+    def function(*args, **kwargs):
+        return getattr(lazy_import(module), name)(*args, **kwargs)
+    function.__name__ = function.__qualname__ = name
+    function.__doc__ = 'Function `{}` of `{}` (imported on its first call).'.format(name, module)
+    return function
+
+def startup_report(verbose=True):
+    '''
+    Import times (in seconds) of the modules recorded so far, i.e., the 
+    startup of the process (the import of a module includes the modules it
+    imports) and the backends imported on demand by `lazy_import`, printed
+    with `verbose`.
+    '''
+    if verbose:
+        print('startup time (torch {}loaded):'.format('' if 'torch' in sys.modules else 'not '))
+        for name, t in _import_times.items():
+            print('  {:<40s} {:8.1f} ms'.format(name, t*1e3))
+    return dict(_import_times)
+
+def is_tensor(x):
+    '''
+    Whether `x` is a torch tensor (without importing torch).
+    '''
+    return type(x).__module__.split('.')[0] == 'torch'
+
+def to_numpy(x, copy=False):
+    '''
+    NumPy array of the array or torch tensor `x` (moved to the host), a copy
+    (not sharing the memory of `x`) with `copy`.
+    '''
+    if is_tensor(x):
+        x = x.detach()
+        return x.cpu().numpy().copy() if copy and not x.is_cuda else x.cpu().numpy()
+    return np.array(x) if copy else np.asarray(x)
 
 def A_(x, Phi):
     '''
@@ -25,6 +96,1305 @@ def At_(y, Phi):
     # return x
     return np.multiply(np.repeat(y[:,:,np.newaxis],Phi.shape[2],axis=2), Phi)
 
+
+class SCIOperator:
+    '''
+    Forward model of snapshot compressive imaging (SCI) with preallocated
+    workspace, i.e., the object version of `A_` and `At_`.
+
+    The operator owns the sensing matrix `Phi`, its sum `Phi_sum` along the
+    mask dimension (zeros replaced by ones as in `admmdenoise_cacti`) and the
+    reciprocal of `Phi_sum`. The workspace buffers are allocated on first use
+    and reused in all the following calls, so that no H x W x nmask
+    temporaries are created inside the GAP/ADMM iterations.
+
+    All the methods accept an optional leading batch dimension, i.e., a batch
+    of B coded measurements (B x H x W) sharing the same masks and the
+    corresponding B x H x W x nmask volumes.
+
+    Parameters
+    ----------
+    Phi : ndarray
+        Sensing matrix (masks) of size H x W x nmask (or H x W x ... x nmask
+        for color/multi-channel masks).
+    '''
+    def __init__(self, Phi):
+        self.Phi = Phi
+        self.nrow, self.ncol = Phi.shape[:2]
+        self.Phi_sum = np.sum(Phi, axis=tuple(range(2,Phi.ndim)))
+        self.Phi_sum[self.Phi_sum==0] = 1
+        self.Phi_sum_inv = 1./self.Phi_sum
+        self._Phi3 = Phi.reshape(self.nrow, self.ncol, -1) # H x W x (...) view
+        self._gamma = None      # cached ADMM gamma
+        self._Phi_sum_gamma_inv = None
+        self._ws = {}           # workspace buffers
+
+    @property
+    def shape(self):
+        return self.Phi.shape
+
+    @property
+    def yb(self):
+        '''
+        Forward projection A(.) of the last `gap_step` or `admm_step`.
+        '''
+        return self._ws.get('yb')
+
+    def _workspace(self, name, shape, dtype):
+        '''
+        Get the reusable workspace buffer `name`, (re-)allocated only when the
+        requested shape or data type changes.
+        '''
+        buf = self._ws.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            self._ws[name] = buf
+        return buf
+
+    def forward(self, x, out=None):
+        '''
+        Forward model, y = A(x), the same as `A_(x, Phi)`.
+        '''
+        batch = x.shape[:x.ndim-self.Phi.ndim] # leading batch dimension(s)
+        if out is None:
+            out = np.empty((*batch, self.nrow, self.ncol),
+                           dtype=np.result_type(x, self.Phi))
+        np.einsum('...ijk,ijk->...ij', x.reshape(*batch, *self._Phi3.shape),
+                  self._Phi3, out=out)
+        return out
+
+    def adjoint(self, y, out=None):
+        '''
+        Transpose of the forward model, x = At(y), the same as `At_(y, Phi)`
+        but broadcasting `y` instead of repeating it along the mask dimension.
+        '''
+        if out is None:
+            out = np.empty((*y.shape[:-2], *self.Phi.shape),
+                           dtype=np.result_type(y, self.Phi))
+        np.multiply(y.reshape(*y.shape, *(1,)*(self.Phi.ndim-2)), self.Phi,
+                    out=out)
+        return out
+
+    def A(self, x):
+        return self.forward(x)
+
+    def At(self, y):
+        return self.adjoint(y)
+
+    def gap_step(self, x, y, y1=None, _lambda=1):
+        '''
+        Fused Euclidean projection of generalized alternating projection (GAP),
+        updating `x` in place
+            x <- x + _lambda*At((y-A(x))/Phi_sum)    [GAP]
+        or, with the accumulated measurement residual `y1` (updated in place),
+            y1 <- y1 + (y-A(x))
+            x  <- x + _lambda*At((y1-A(x))/Phi_sum)  [GAP_acc]
+
+        Returns
+        -------
+        x : ndarray
+            The updated `x` (the same object as the input).
+        '''
+        dtype = np.result_type(x, self.Phi)
+        yb = self.forward(x, out=self._workspace('yb', y.shape, dtype))
+        r = self._workspace('r', y.shape, dtype)
+        if y1 is not None: # accelerated version of GAP
+            y1 += y
+            y1 -= yb
+            np.subtract(y1, yb, out=r)
+        else:
+            np.subtract(y, yb, out=r)
+        r *= self.Phi_sum_inv
+        if _lambda != 1:
+            r *= _lambda
+        x += self.adjoint(r, out=self._workspace('xb', x.shape, dtype))
+        return x
+
+    def admm_step(self, theta, b, y, gamma=0.01, _lambda=1, out=None):
+        '''
+        Fused Euclidean projection of the alternating direction method of
+        multipliers (ADMM), writing into `out` (allocated if None)
+            x <- (theta+b) + _lambda*At((y-A(theta+b))/(Phi_sum+gamma))
+
+        Returns
+        -------
+        x : ndarray
+            The projected `x` (the same object as `out` if provided).
+        '''
+        if out is None:
+            out = np.empty(np.broadcast_shapes(theta.shape, b.shape),
+                           dtype=np.result_type(theta, b, self.Phi))
+        if gamma != self._gamma:
+            self._gamma = gamma
+            self._Phi_sum_gamma_inv = 1./(self.Phi_sum+gamma)
+        np.add(theta, b, out=out)
+        dtype = out.dtype
+        yb = self.forward(out, out=self._workspace('yb', y.shape, dtype))
+        r = self._workspace('r', y.shape, dtype)
+        np.subtract(y, yb, out=r)
+        r *= self._Phi_sum_gamma_inv
+        if _lambda != 1:
+            r *= _lambda
+        out += self.adjoint(r, out=self._workspace('xb', out.shape, dtype))
+        return out
+
+class TorchSCIOperator:
+    '''
+    Forward model of snapshot compressive imaging (SCI) on torch tensors, 
+    i.e., the torch version of `SCIOperator` (with the same methods) for the
+    torch backend of the PnP solvers, where the sensing matrix and all the
+    arrays of the iterations are resident on the `device` of the denoiser.
+
+    Parameters
+    ----------
+    Phi : ndarray or torch.Tensor
+        Sensing matrix (masks) of size H x W x nmask (or H x W x ... x nmask
+        for color/multi-channel masks).
+    device : str or torch.device, optional
+        Device of the tensors, CUDA if available by default.
+    dtype : data-type, optional
+        Floating-point data type of the tensors.
+    '''
+    def __init__(self, Phi, device=None, dtype=np.float32):
+        import torch
+        if device is None:
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+        self.device = torch.device(device)
+        self.dtype = torch.from_numpy(np.empty(0, dtype=dtype)).dtype
+        self.Phi = self.tensor(Phi)
+        self.nrow, self.ncol = self.Phi.shape[:2]
+        self.Phi_sum = self.Phi.sum(dim=tuple(range(2,self.Phi.ndim)))
+        self.Phi_sum[self.Phi_sum==0] = 1
+        self.Phi_sum_inv = 1./self.Phi_sum
+        self._Phi3 = self.Phi.reshape(self.nrow, self.ncol, -1) # H x W x (...) view
+        self._gamma = None      # cached ADMM gamma
+        self._Phi_sum_gamma_inv = None
+        self.yb = None          # forward projection of the last step
+
+    @property
+    def shape(self):
+        return tuple(self.Phi.shape)
+
+    def tensor(self, x):
+        '''
+        Tensor of `x` (an array or a tensor) on the device of the operator.
+        '''
+        import torch
+        if not is_tensor(x):
+            x = torch.from_numpy(np.ascontiguousarray(x))
+        return x.to(self.device, self.dtype)
+
+    def forward(self, x):
+        '''
+        Forward model, y = A(x), the same as `A_(x, Phi)`.
+        '''
+        batch = x.shape[:x.ndim-self.Phi.ndim] # leading batch dimension(s)
+        return (x.reshape(*batch, *self._Phi3.shape)*self._Phi3).sum(dim=-1)
+
+    def adjoint(self, y):
+        '''
+        Transpose of the forward model, x = At(y), the same as `At_(y, Phi)`.
+        '''
+        return y.reshape(*y.shape, *(1,)*(self.Phi.ndim-2))*self.Phi
+
+    def A(self, x):
+        return self.forward(x)
+
+    def At(self, y):
+        return self.adjoint(y)
+
+    def gap_step(self, x, y, y1=None, _lambda=1):
+        '''
+        Euclidean projection of generalized alternating projection (GAP), 
+        updating `x` (and `y1`) in place, see `SCIOperator.gap_step`.
+        '''
+        self.yb = self.forward(x)
+        if y1 is not None: # accelerated version of GAP
+            y1 += y - self.yb
+            r = y1 - self.yb
+        else:
+            r = y - self.yb
+        r *= self.Phi_sum_inv
+        if _lambda != 1:
+            r *= _lambda
+        x += self.adjoint(r)
+        return x
+
+    def admm_step(self, theta, b, y, gamma=0.01, _lambda=1, out=None):
+        '''
+        Euclidean projection of the alternating direction method of 
+        multipliers (ADMM), see `SCIOperator.admm_step`.
+        '''
+        if gamma != self._gamma:
+            self._gamma = gamma
+            self._Phi_sum_gamma_inv = 1./(self.Phi_sum+gamma)
+        x = theta + b if out is None else out.copy_(theta).add_(b)
+        self.yb = self.forward(x)
+        r = (y - self.yb)*self._Phi_sum_gamma_inv
+        if _lambda != 1:
+            r *= _lambda
+        x += self.adjoint(r)
+        return x
+
+def batch2frames(x):
+    '''
+    Stack a batch of reconstructions (B x H x W x nmask) frame-wise along the 
+    last dimension (H x W x B*nmask), so that frame-wise denoisers process the
+    whole batch in a single call.
+    '''
+    if is_tensor(x):
+        return x.movedim(0, 2).reshape(*x.shape[1:3], -1)
+    return np.moveaxis(x, 0, 2).reshape(*x.shape[1:3], -1)
+
+def frames2batch(x, nbatch):
+    '''
+    Inverse of `batch2frames`, H x W x B*nmask -> B x H x W x nmask (view).
+    '''
+    if is_tensor(x):
+        return x.reshape(*x.shape[:2], nbatch, -1).movedim(2, 0)
+    return np.moveaxis(x.reshape(*x.shape[:2], nbatch, -1), 2, 0)
+
+def seq_denoise(denoise, x, nbatch, *args, **kwargs):
+    '''
+    Apply a sequence (video) denoiser to the frame-stacked layout of a batch
+    (H x W x B*nmask, see `batch2frames`) one coded frame block at a time, 
+    so that no temporal window crosses the boundary of two blocks.
+    '''
+    if not nbatch:
+        return denoise(x, *args, **kwargs)
+    if is_tensor(x):
+        import torch
+        return torch.cat([denoise(xk, *args, **kwargs)
+                          for xk in x.chunk(nbatch, dim=-1)], dim=-1)
+    return np.concatenate([denoise(xk, *args, **kwargs)
+                           for xk in np.split(x, nbatch, axis=-1)], axis=-1)
+
+def relative_norm(d, ref, nbatch=0):
+    '''
+    Relative norm ||d||/||ref|| (arrays or torch tensors), taken per coded 
+    frame block for a batch of `nbatch` (the worst block).
+    '''
+    axis = tuple(range(1, d.ndim)) if nbatch else tuple(range(d.ndim))
+    if is_tensor(d):
+        return float(((d*d).sum(dim=axis) / (ref*ref).sum(dim=axis).clamp(min=1e-24)
+                      ).sqrt().max())
+    return float(np.max(np.sqrt(np.sum(d*d, axis=axis) / 
+                                np.maximum(np.sum(ref*ref, axis=axis), 1e-24))))
+
+class EarlyStopping:
+    '''
+    Convergence-based early termination of the iterations of a sigma stage
+    of the plug-and-play (PnP) GAP/ADMM solvers.
+
+    A stage is stopped (skipping ahead to the next sigma level) once the
+    stopping criteria hold for `patience` consecutive iterations, where an
+    iteration meets the criteria if either
+        ||y-A(x)|| / ||y|| < tol_res    [relative measurement residual]
+        ||x-x_prev|| / ||x_prev|| < tol_rel    [relative update]
+    with the norms taken per coded frame block for a batch (the worst block 
+    decides). Both tolerances are disabled (None) by default, i.e., the full
+    `iter_max` schedule is run.
+
+    Parameters
+    ----------
+    tol_res : float, optional
+        Tolerance of the relative measurement residual.
+    tol_rel : float, optional
+        Tolerance of the relative update of the reconstruction.
+    patience : int, optional
+        Number of consecutive iterations meeting the criteria to stop.
+    nbatch : int, optional
+        Batch size of the measurements (0 for a single measurement).
+    stats : dict, optional
+        Statistics of the solver to report to, where the number of iterations
+        actually used of each stage is appended to `stats['iters']` and the 
+        last residual and relative update to `stats['res']` and 
+        `stats['rel']`.
+    '''
+    def __init__(self, tol_res=None, tol_rel=None, patience=1, nbatch=0, 
+                 stats=None):
+        self.tol_res = tol_res
+        self.tol_rel = tol_rel
+        self.patience = max(1, patience)
+        self.nbatch = nbatch
+        self.stats = stats
+        self.enabled = tol_res is not None or tol_rel is not None
+        self._x = None # previous x (buffer reused for all stages)
+        self.start()
+
+    def _relnorm(self, d, ref):
+        return relative_norm(d, ref, self.nbatch)
+
+    def start(self):
+        '''
+        Start a new sigma stage.
+        '''
+        self.it = 0
+        self.res = None
+        self.rel = None
+        self._nstall = 0
+        self._valid = False # x_prev of this stage not available yet
+
+    def __call__(self, x, y=None, yb=None):
+        '''
+        Check the criteria after an iteration with the reconstruction `x` and
+        the measurement `y` and its projection `yb = A(x)` (of the current
+        projection step) if available. Returns True to stop the stage.
+        '''
+        self.it += 1
+        if not self.enabled:
+            return False
+        converged = False
+        if self.tol_res is not None and yb is not None:
+            self.res = self._relnorm(y-yb, y)
+            converged = converged or self.res < self.tol_res
+        if self.tol_rel is not None:
+            if self._valid:
+                self.rel = self._relnorm(x-self._x, self._x)
+                converged = converged or self.rel < self.tol_rel
+            if is_tensor(x): # x may be updated in place by the solver
+                self._x = x.clone()
+            else:
+                if self._x is None or self._x.shape != x.shape:
+                    self._x = np.empty_like(x)
+                np.copyto(self._x, x)
+            self._valid = True
+        self._nstall = self._nstall+1 if converged else 0
+        return self._nstall >= self.patience
+
+    def finish(self):
+        '''
+        Finish the current sigma stage, reporting the number of iterations
+        actually used to `stats`.
+        '''
+        if self.stats is not None:
+            self.stats.setdefault('iters', []).append(self.it)
+            self.stats['res'] = self.res
+            self.stats['rel'] = self.rel
+        return self.it
+
+class Acceleration:
+    '''
+    Acceleration of the fixed-point iteration u <- T(u) of the plug-and-play
+    (PnP) solvers, where T is one projection and denoising step of a sigma
+    stage and u its whole state, e.g., (x, y1) of the accelerated GAP or 
+    (theta, b) of the ADMM, to cut the number of iterations needed for a 
+    target PSNR.
+
+    The solver hands the state `u` at the beginning of each iteration to 
+    `begin` and the state `g = T(u)` at its end to `__call__`, which returns
+    the state of the next iteration, i.e., with the acceleration `method`
+        None : g, the plain iteration,
+        'fista' : g + (t_k-1)/t_{k+1} (g-g_prev), the FISTA/Nesterov momentum,
+        'anderson' : g - dG gamma, the Anderson acceleration (type II) over 
+            the last `history` iterations, where gamma is the least-squares
+            combination of the residual differences dF best cancelling the 
+            residual f = g - u (and dG the state differences).
+    Both are restarted once the residual ||g - u|| grows (by more than 
+    `safeguard` for the Anderson acceleration) and at each sigma stage 
+    (`start`) as the map T changes with the noise level, and calculated per 
+    coded frame block for a batch. The quantities of the last iteration 
+    (`info`) are reported to the per-iteration hooks (see `IterationHooks`).
+
+    Parameters
+    ----------
+    method : {None, 'fista', 'anderson'}, optional
+        Acceleration method.
+    history : int, optional
+        Window (number of the past iterations) of the Anderson acceleration.
+    nbatch : int, optional
+        Batch size of the reconstruction (0 for a single reconstruction).
+    safeguard : float, optional
+        Growth factor of the residual norm restarting the Anderson 
+        acceleration.
+    reg : float, optional
+        Relative Tikhonov regularization of the least squares of the 
+        Anderson acceleration.
+    '''
+    methods = (None, 'fista', 'anderson')
+
+    def __init__(self, method=None, history=3, nbatch=0, safeguard=2., 
+                 reg=1e-8):
+        if method not in self.methods:
+            raise ValueError('Unsupported acceleration {}!'.format(method))
+        self.method = method
+        self.history = max(1, history)
+        self.nbatch = nbatch
+        self.safeguard = safeguard
+        self.reg = reg
+        self.enabled = method is not None
+        self.info = {}
+        self.start()
+
+    def _pack(self, arrays):
+        '''
+        State `arrays` as one vector (per coded frame block for a batch).
+        '''
+        if self.nbatch:
+            return np.concatenate([a.reshape(self.nbatch, -1) for a in arrays], 1)
+        return np.concatenate([a.ravel() for a in arrays])
+
+    def _unpack(self, v):
+        arrays = []
+        i = 0
+        for (shape, dtype) in self._layout:
+            n = int(np.prod(shape[1:] if self.nbatch else shape))
+            arrays.append(v[..., i:i+n].reshape(shape).astype(dtype, copy=False))
+            i += n
+        return tuple(arrays)
+
+    def _norm(self, v):
+        return np.sqrt(np.sum(v*v, axis=-1, dtype=np.float64))
+
+    def start(self):
+        '''
+        Start a new sigma stage, restarting the acceleration.
+        '''
+        self._t = 1.     # FISTA step
+        self._g = None   # last state
+        self._f = None   # last residual
+        self._fnorm = None
+        self._dF = deque(maxlen=self.history) # residual differences (Anderson)
+        self._dG = deque(maxlen=self.history) # state differences (Anderson)
+
+    def begin(self, *arrays):
+        '''
+        Begin an iteration with the state `arrays` (copied, as the solvers 
+        update their state in place).
+        '''
+        if self.enabled:
+            self._layout = [(a.shape, a.dtype) for a in arrays]
+            self._u = self._pack(arrays)
+
+    def __call__(self, *arrays):
+        '''
+        End an iteration with the state `arrays`, returning the state of the
+        next iteration.
+        '''
+        if not self.enabled:
+            return arrays if len(arrays) > 1 else arrays[0]
+        g = self._pack(arrays)
+        f = g - self._u # fixed-point residual
+        fnorm = self._norm(f)
+        growth = self.safeguard if self.method == 'anderson' else 1.
+        restart = (self._fnorm is not None and 
+                   bool(np.any(fnorm > growth*self._fnorm)))
+        if restart:
+            self.start()
+        if self.method == 'fista':
+            u = self._fista(g)
+        else:
+            u = self._anderson(g, f)
+        self._g = g
+        self._f = f
+        self._fnorm = fnorm
+        self.info['restart'] = restart
+        arrays = self._unpack(u)
+        return arrays if len(arrays) > 1 else arrays[0]
+
+    def _fista(self, g):
+        beta = 0.
+        if self._g is not None:
+            t = (1 + math.sqrt(1 + 4*self._t**2))/2
+            beta = (self._t - 1)/t
+            self._t = t
+        self.info = {'beta': beta}
+        return g if beta == 0 else g + beta*(g - self._g)
+
+    def _anderson(self, g, f):
+        if self._f is not None:
+            self._dF.append(f - self._f)
+            self._dG.append(g - self._g)
+        m = len(self._dF)
+        self.info = {'history': m}
+        if m == 0:
+            return g
+        # least squares min ||f - dF gamma|| (regularized normal equations),
+        # per coded frame block for a batch
+        dF = np.stack(self._dF, -1)                                # [B x] N x m
+        gram = np.einsum('...ni,...nj->...ij', dF, dF, dtype=np.float64)
+        rhs = np.einsum('...ni,...n->...i', dF, f, dtype=np.float64)
+        scale = np.trace(gram, axis1=-2, axis2=-1)[..., None, None]/m
+        gram = gram + self.reg*np.maximum(scale, 1e-30)*np.eye(m)
+        gamma = np.linalg.solve(gram, rhs[..., None])              # [B x] m x 1
+        dG = np.stack(self._dG, -1)
+        return g - (dG @ gamma.astype(dG.dtype))[..., 0]
+
+class AdaptivePenalty:
+    '''
+    Residual balancing [1] of the penalty `gamma` of the plug-and-play (PnP)
+    ADMM, i.e., `gamma` is multiplied (divided) by `tau` once the primal 
+    residual ||x-theta|| exceeds `mu` times the dual residual 
+    gamma*||theta-theta_prev|| (and vice versa), within [gamma_min, 
+    gamma_max]. The scaled dual variable `b` of the solver is divided by the
+    returned factor.
+
+    References
+    ----------
+    .. [1] S. Boyd, N. Parikh, E. Chu, B. Peleato, and J. Eckstein, 
+           "Distributed Optimization and Statistical Learning via the 
+           Alternating Direction Method of Multipliers," Foundations and 
+           Trends® in Machine Learning, vol. 3, no. 1, pp. 1-122, 2011.
+    '''
+    def __init__(self, gamma, mu=10., tau=2., gamma_min=1e-6, gamma_max=1e6):
+        if not gamma > 0:
+            raise ValueError('The adaptive penalty requires gamma > 0!')
+        self.gamma = gamma
+        self.mu = mu
+        self.tau = tau
+        self.gamma_min = gamma_min
+        self.gamma_max = gamma_max
+
+    def __call__(self, x, theta, theta_prev):
+        '''
+        Update `gamma` after an iteration with the projection `x` and the 
+        denoised `theta` (`theta_prev` of the previous iteration), returning
+        the factor of the update.
+        '''
+        r = np.linalg.norm((x - theta).ravel())
+        s = self.gamma*np.linalg.norm((theta - theta_prev).ravel())
+        scale = 1.
+        if r > self.mu*s and self.gamma*self.tau <= self.gamma_max:
+            scale = self.tau
+        elif s > self.mu*r and self.gamma/self.tau >= self.gamma_min:
+            scale = 1./self.tau
+        self.gamma *= scale
+        return scale
+
+class DtypePolicy:
+    '''
+    Data type (dtype) policy of the plug-and-play (PnP) reconstruction.
+
+    All the stages of the GAP/ADMM iterations (projection, denoising, ...)
+    compute in `dtype` (float32 by default), where the result of a stage 
+    returned in another data type (e.g., float64 of a denoiser) is cast back
+    to `dtype`. The H x W x nmask state arrays kept between the iterations
+    are stored in `storage` (e.g., float16 to halve the memory and the 
+    bandwidth of large volumes) if given.
+
+    Parameters
+    ----------
+    dtype : data-type, optional
+        Compute data type.
+    storage : data-type, optional
+        Storage data type of the state arrays, the same as `dtype` if None.
+    check : boolean, optional
+        Check mode, flagging (RuntimeWarning) each stage returning a data 
+        type other than `dtype`, i.e., an unintended upcast (or downcast).
+    '''
+    def __init__(self, dtype=np.float32, storage=None, check=False):
+        self.dtype = np.dtype(dtype)
+        self.storage = self.dtype if storage is None else np.dtype(storage)
+        self.check = check
+
+    def __repr__(self):
+        return 'DtypePolicy({!r}, storage={!r}, check={!r})'.format(self.dtype.str, 
+               self.storage.str, self.check)
+
+    @classmethod
+    def get(cls, dtype):
+        '''
+        Policy of `dtype`, either a `DtypePolicy` or a data type.
+        '''
+        return dtype if isinstance(dtype, cls) else cls(dtype)
+
+    def __call__(self, x, stage=None):
+        '''
+        Cast `x`, the result of the stage `stage` (checked in check mode), to
+        the compute data type.
+        '''
+        x = np.asarray(x)
+        if self.check and stage is not None and x.dtype != self.dtype:
+            warnings.warn('{} returned {} instead of {}.'.format(stage, x.dtype, 
+                          self.dtype), RuntimeWarning, stacklevel=2)
+        return x.astype(self.dtype, copy=False)
+
+    def store(self, x):
+        '''
+        Cast the state array `x` to the storage data type.
+        '''
+        return x.astype(self.storage, copy=False)
+
+def memory_peak():
+    '''
+    High-water marks of the memory of this process (in bytes), i.e., the peak
+    resident set size (None if not available) and the peak GPU memory 
+    allocated by torch (None if torch is not imported or without CUDA).
+    '''
+    (mem, gpu_mem) = (None, None)
+    try:
+        import resource
+        mem = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        mem *= 1 if sys.platform == 'darwin' else 1024 # bytes on macOS, KB on Linux
+    except ImportError: # Windows
+        pass
+    torch = sys.modules.get('torch') # without importing torch
+    if torch is not None and torch.cuda.is_available() and torch.cuda.is_initialized():
+        gpu_mem = torch.cuda.max_memory_allocated()
+    return mem, gpu_mem
+
+class IterationHooks:
+    '''
+    Per-iteration profiling hooks of the plug-and-play (PnP) solvers.
+
+    The solvers time the phases of each iteration with `lap` and call the 
+    hooks at the end of each iteration, which calls each of the `callback` 
+    (a callable or a list of callables) with a dict `info` of
+        'solver' : name of the solver, e.g., 'GAP-TV',
+        'iter' : index of the iteration (over all the sigma stages),
+        'stage', 'sigma' : index and noise level of the sigma stage,
+        't_proj', 't_denoise', 't_iqa' : time (in seconds) of the Euclidean
+            projection, the denoising and the image quality assessment,
+        'res' : relative measurement residual ||y-A(x)||/||y|| of the 
+            projection step (the worst coded frame block of a batch),
+        'mem', 'gpu_mem' : memory high-water marks (see `memory_peak`),
+    and the quantities of the acceleration of the iteration if enabled, e.g.,
+    the momentum 'beta' (see `Acceleration`) or the ADMM penalty 'gamma'
+    (see `AdaptivePenalty`). The hooks are disabled (no overhead but a check) without a callback.
+    '''
+    phases = ('proj', 'denoise', 'iqa')
+
+    def __init__(self, callback=None, solver='', nbatch=0):
+        if callback is None:
+            callback = []
+        self.callbacks = list(callback) if isinstance(callback, (list, tuple)) else [callback]
+        self.solver = solver
+        self.nbatch = nbatch
+        self.enabled = bool(self.callbacks)
+
+    def start(self):
+        '''
+        Start an iteration.
+        '''
+        if self.enabled:
+            self._t = dict.fromkeys(self.phases, 0.)
+            self._last = time.perf_counter()
+
+    def lap(self, phase):
+        '''
+        End the phase `phase` of the iteration (accumulated if repeated).
+        '''
+        if self.enabled:
+            now = time.perf_counter()
+            self._t[phase] += now - self._last
+            self._last = now
+
+    def __call__(self, it, stage, sigma, y=None, yb=None, **extra):
+        '''
+        End the iteration `it` of the sigma stage `stage` with the noise level
+        `sigma`, with the measurement `y` and its projection `yb = A(x)`, and
+        the `extra` quantities of the iteration.
+        '''
+        if not self.enabled:
+            return
+        res = None
+        if y is not None and yb is not None:
+            res = relative_norm(y-yb, y, self.nbatch)
+        (mem, gpu_mem) = memory_peak()
+        info = {'solver': self.solver, 'iter': it, 'stage': stage, 
+                'sigma': sigma, 'res': res, 'mem': mem, 'gpu_mem': gpu_mem}
+        info.update(('t_'+phase, t) for (phase, t) in self._t.items())
+        info.update(extra)
+        for callback in self.callbacks:
+            callback(info)
+
+class Profiler:
+    '''
+    Built-in callback of the `IterationHooks` collecting the per-iteration 
+    profile of the PnP solvers, summarizing the time of each phase to tell 
+    whether a run is projection-bound or denoiser-bound, and saving a 
+    compact (column-wise) JSON profile of the run to `path` (if given) on 
+    `save`.
+    '''
+    def __init__(self, path=None):
+        self.path = path
+        self.records = []
+
+    def __call__(self, info):
+        self.records.append(info)
+
+    def summary(self):
+        '''
+        Total time and share of each phase, number of iterations, peak 
+        memory and the bounding phase of the collected iterations.
+        '''
+        total = {phase: sum(r['t_'+phase] for r in self.records) 
+                 for phase in IterationHooks.phases}
+        ttotal = max(sum(total.values()), 1e-12)
+        mems = [r['mem'] for r in self.records if r['mem'] is not None]
+        gpu_mems = [r['gpu_mem'] for r in self.records if r['gpu_mem'] is not None]
+        return {'iters': len(self.records), 
+                'time': total, 
+                'share': {phase: t/ttotal for (phase, t) in total.items()},
+                'bound': max(total, key=total.get) if self.records else None,
+                'mem': max(mems) if mems else None,
+                'gpu_mem': max(gpu_mems) if gpu_mems else None}
+
+    def report(self):
+        '''
+        Print the summary of the profile.
+        '''
+        s = self.summary()
+        print('Profile of {} iterations: '.format(s['iters']) + ', '.join(
+              '{} {:.2f}s ({:.0%})'.format(phase, s['time'][phase], s['share'][phase]) 
+              for phase in IterationHooks.phases) + ' -> {}-bound'.format(s['bound']))
+        if s['mem'] is not None:
+            print('  peak memory {:.1f} MB'.format(s['mem']/2**20) + ('' if s['gpu_mem'] 
+                  is None else ', peak GPU memory {:.1f} MB'.format(s['gpu_mem']/2**20)))
+
+    def save(self, path=None):
+        '''
+        Save the summary and the per-iteration columns of the profile as 
+        JSON to `path` (the `path` of the profiler by default).
+        '''
+        path = self.path if path is None else path
+        columns = {key: [r[key] for r in self.records] 
+                   for key in (self.records[0] if self.records else [])}
+        with open(path, 'w') as f:
+            json.dump({'summary': self.summary(), 'columns': columns}, f, 
+                      default=float)
+
+class IterationLog:
+    '''
+    Built-in callback of the `IterationHooks` appending a line of CSV per 
+    iteration to the file `path` as the run goes.
+    '''
+    columns = ('solver', 'iter', 'stage', 'sigma', 't_proj', 't_denoise', 
+               't_iqa', 'res', 'mem', 'gpu_mem')
+
+    def __init__(self, path):
+        self.path = path
+        if not os.path.exists(path):
+            with open(path, 'w') as f:
+                f.write(','.join(self.columns) + '\n')
+
+    def __call__(self, info):
+        with open(self.path, 'a') as f:
+            f.write(','.join('' if info[key] is None else str(info[key]) 
+                             for key in self.columns) + '\n')
+
+class IQAMonitor:
+    '''
+    Throttled and asynchronous image quality assessment (IQA) of the 
+    iterations of the plug-and-play (PnP) solvers, i.e., the PSNR against the
+    ground truth `X_orig` of every `every`-th iteration and of the last 
+    iteration of each sigma stage, printed for every fifth evaluation.
+
+    The PSNR is calculated in a background thread on a snapshot of the 
+    reconstruction (after the `transform`, e.g., the re-mosaicking of the 
+    Bayer planes, also done in the background), so that the solver never 
+    waits for it, and collected by `results` at the end of the run.
+
+    Parameters
+    ----------
+    X_orig : ndarray, optional
+        Ground truth (normalized), B x H x W x nmask for a batch. The IQA is
+        disabled without it.
+    every : int, optional
+        Interval (in iterations) of the evaluation, every iteration by 
+        default.
+    solver : str, optional
+        Name of the solver printed with the PSNR, e.g., 'GAP-TV'.
+    nbatch : int, optional
+        Batch size of the reconstruction (0 for a single reconstruction).
+    show : bool, optional
+        Enable the IQA (the `show_iqa` of the solvers).
+    background : bool, optional
+        Calculate the PSNR in a background thread (in the solver otherwise).
+    transform : callable, optional
+        Transform of the reconstruction to the layout of `X_orig`.
+    stats : dict, optional
+        Statistics of the solver to report to, where the iterations (from 0)
+        of the evaluations are appended to `stats['iqa_iters']`.
+    '''
+    def __init__(self, X_orig=None, every=1, solver='', nbatch=0, show=True, 
+                 background=True, transform=None, stats=None):
+        self.X_orig = X_orig
+        self.every = max(1, int(every))
+        self.solver = solver
+        self.nbatch = nbatch
+        self.transform = transform
+        self.stats = stats
+        self.enabled = show and X_orig is not None
+        self._executor = (ThreadPoolExecutor(max_workers=1) 
+                          if self.enabled and background else None)
+        self._evals = [] # (iteration, future or PSNR) of the evaluations
+        self._k = -1    # last iteration
+        self._last = -1 # last evaluated iteration
+
+    def _psnr(self, k, x, sigma):
+        if self.transform is not None:
+            x = self.transform(x)
+        p = ([psnr(self.X_orig[ib], x[ib]) for ib in range(self.nbatch)] 
+             if self.nbatch else psnr(self.X_orig, x))
+        if (k+1) % (5*self.every) == 0:
+            if sigma is None:
+                print('  {0} iteration {1: 3d}, PSNR {2:2.2f} dB.'.format(
+                      self.solver, k+1, np.mean(p)))
+            elif sigma < 1:
+                print('  {0} iteration {1: 3d}, sigma {2: 3g}/255, PSNR {3:2.2f} dB.'
+                      .format(self.solver, k+1, sigma*255, np.mean(p)))
+            else:
+                print('  {0} iteration {1: 3d}, sigma {2: 3g}, PSNR {3:2.2f} dB.'
+                      .format(self.solver, k+1, sigma, np.mean(p)))
+        return p
+
+    def _evaluate(self, k, x, sigma):
+        self._last = k
+        if self._executor is None:
+            self._evals.append((k, self._psnr(k, to_numpy(x), sigma)))
+        else: # snapshot, as x is updated in place by the solver
+            self._evals.append((k, self._executor.submit(self._psnr, k, to_numpy(x, copy=True), sigma)))
+
+    def __call__(self, k, x, sigma=None):
+        '''
+        End the iteration `k` (over all the sigma stages) with the 
+        reconstruction `x` at the noise level `sigma` (None for noise 
+        estimation), evaluated if due.
+        '''
+        self._k = k
+        if self.enabled and (k+1) % self.every == 0:
+            self._evaluate(k, x, sigma)
+
+    def stage_end(self, x, sigma=None):
+        '''
+        End a sigma stage with the reconstruction `x`, evaluating its last 
+        iteration if not done yet.
+        '''
+        if self.enabled and self._last < self._k:
+            self._evaluate(self._k, x, sigma)
+
+    def results(self):
+        '''
+        Wait for the pending evaluations and return the sampled PSNR curve 
+        (`psnr_all` of the solvers), reporting the evaluated iterations to 
+        `stats`.
+        '''
+        psnr_all = [p.result() if self._executor is not None else p 
+                    for (_, p) in self._evals]
+        if self._executor is not None:
+            self._executor.shutdown()
+        if self.stats is not None:
+            self.stats.setdefault('iqa_iters', []).extend(k for (k, _) in self._evals)
+        return psnr_all
+
+def bayer_planes(x):
+    '''
+    Zero-copy strided view of a Bayer mosaic `x` (H x W x ...) as its four
+    2-by-2 planes (H/2 x W/2 x ... x 2 x 2), where [..., r, c] indexes the 
+    plane of the pixels at the offset (r, c) of the Bayer pattern.
+    '''
+    (nrow, ncol) = x.shape[:2]
+    (srow, scol) = x.strides[:2]
+    return np.lib.stride_tricks.as_strided(x, 
+                shape=(nrow//2, ncol//2, *x.shape[2:], 2, 2),
+                strides=(2*srow, 2*scol, *x.strides[2:], srow, scol))
+
+def bayer_pack(x):
+    '''
+    Stack the four Bayer planes of the mosaic `x` (H x W x ...) at the last
+    dimension (H/2 x W/2 x ... x 4) in the order of the pattern offsets
+    [0,0], [0,1], [1,0], [1,1] (`RGGB` for an RGGB mosaic).
+    '''
+    planes = bayer_planes(x)
+    return planes.reshape(*planes.shape[:-2], 4)
+
+def bayer_unpack(xall, out=None):
+    '''
+    Inverse of `bayer_pack`, scatter the stacked Bayer planes `xall` 
+    (H/2 x W/2 x ... x 4) back to the mosaic `out` (H x W x ...) in place.
+    '''
+    if out is None:
+        out = np.empty((2*xall.shape[0], 2*xall.shape[1], *xall.shape[2:-1]),
+                       dtype=xall.dtype)
+    bayer_planes(out)[...] = xall.reshape(*xall.shape[:-1], 2, 2)
+    return out
+
+_worker_state = {} # function and constant arguments of the pool workers
+
+def _init_worker(func, args, nthread=None):
+    '''
+    Initialize a pool worker once with the function to run and its constant 
+    arguments (masks, forward model, preloaded denoiser model, ...).
+    '''
+    _worker_state['func'] = func
+    _worker_state['args'] = args
+    if nthread is not None and 'torch' in sys.modules: # share the cores among the workers
+        sys.modules['torch'].set_num_threads(nthread)
+
+def _run_worker(task):
+    '''
+    Run a single task in the pool worker, returning the result and the time.
+    '''
+    begin_time = time.time()
+    res = _worker_state['func'](**_worker_state['args'], **task)
+    return res, time.time() - begin_time
+
+def _cuda_initialized():
+    '''
+    Whether CUDA is initialized in this process (without importing torch).
+    '''
+    return 'torch' in sys.modules and sys.modules['torch'].cuda.is_initialized()
+
+def _pool_context(func, args):
+    '''
+    Start method of the pool workers, 'fork' where available (the workers 
+    inherit the loaded modules and the preloaded models), or 'spawn' (e.g., 
+    on Windows, or once CUDA is initialized in this process, which cannot 
+    be used in forked workers), for which `func` and its constant arguments
+    `args` are pickled to the workers and thus must be module-level 
+    functions and picklable objects (no lambdas or closures).
+    '''
+    cuda = _cuda_initialized()
+    if 'fork' in multiprocessing.get_all_start_methods() and not cuda:
+        return multiprocessing.get_context('fork')
+    try:
+        pickle.dumps((func, args))
+    except (pickle.PicklingError, AttributeError, TypeError) as e:
+        raise ValueError('The function and the arguments of the pool workers '
+                         'must be picklable without the fork start method{} '
+                         '(use module-level functions instead of lambdas or '
+                         'closures): {}'.format(' (CUDA initialized)' if cuda else '', e))
+    return multiprocessing.get_context('spawn')
+
+def parallel_imap(func, tasks, workers=1, **args):
+    '''
+    Lazy version of `parallel_map`, yielding the (result, time) tuples in the
+    same order as `tasks` as soon as they are available. At most 
+    `2*workers` tasks are in flight at once, so that only a few results are
+    held in memory (and `tasks` may be a generator).
+    '''
+    if workers <= 1:
+        for task in tasks:
+            begin_time = time.time()
+            yield func(**args, **task), time.time() - begin_time
+        return
+    nthread = max(1, (os.cpu_count() or 1)//workers)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context(func, args),
+                             initializer=_init_worker,
+                             initargs=(func, args, nthread)) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(_run_worker, task))
+            if len(pending) >= 2*workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+def parallel_map(func, tasks, workers=1, **args):
+    '''
+    Apply `func(**args, **task)` to each task (dict of keyword arguments) of
+    `tasks` with a pool of `workers` processes.
+
+    The constant keyword arguments `args` are handed to each worker only once
+    at start-up instead of with every task. The results are returned in the
+    same order as `tasks`, as a list of (result, time) tuples. With 
+    `workers <= 1` the tasks are run one after another in this process.
+    The workers are forked where available, otherwise spawned (see 
+    `_pool_context`). Once CUDA is initialized in this process (e.g., a 
+    denoiser model on the GPU), the workers are always spawned, since CUDA
+    cannot be used in forked processes, so that `func` and `args` must be
+    picklable and each worker creates its own CUDA context.
+    '''
+    return list(parallel_imap(func, tasks, workers=workers, **args))
+
+def tile_grid(shape, tile=256, halo=32):
+    '''
+    Split an image of `shape` (H x W) into tiles of the core size `tile` 
+    (int or (h, w), clipped at the borders) extended by `halo` pixels on 
+    each side (clipped at the borders).
+
+    Returns
+    -------
+    tiles : list of tuples
+        (core, pad) of each tile, where `core` and `pad` are the (row, col)
+        slices of the core and of the tile with the halo in the image.
+    '''
+    (th, tw) = (tile, tile) if np.isscalar(tile) else tile
+    tiles = []
+    for r0 in range(0, shape[0], th):
+        for c0 in range(0, shape[1], tw):
+            r1 = min(r0+th, shape[0])
+            c1 = min(c0+tw, shape[1])
+            core = (slice(r0, r1), slice(c0, c1))
+            pad = (slice(max(r0-halo, 0), min(r1+halo, shape[0])), 
+                   slice(max(c0-halo, 0), min(c1+halo, shape[1])))
+            tiles.append((core, pad))
+    return tiles
+
+def tile_window(core, pad):
+    '''
+    Blending window of a tile (the size of `pad`), one in the core and 
+    tapering linearly to zero across the halo, so that the overlapping tiles
+    are blended smoothly with the weights normalized by their sum.
+    '''
+    def ramp(c, p):
+        w = np.ones(p.stop-p.start, dtype=np.float32)
+        (nlo, nhi) = (c.start-p.start, p.stop-c.stop) # halo sizes
+        w[:nlo] = np.arange(1, nlo+1) / (nlo+1)
+        if nhi > 0:
+            w[-nhi:] = np.arange(nhi, 0, -1) / (nhi+1)
+        return w
+    return np.outer(ramp(core[0], pad[0]), ramp(core[1], pad[1]))
+
+def pyramid_down(x, factor=2):
+    '''
+    Downsample the images `x` (H x W x ...) by the mean of the `factor` x 
+    `factor` blocks (the borders edge-padded to multiples of `factor`), 
+    e.g., the measurements and the masks of a coarser level of the pyramid,
+    where the block mean of the measurement is the measurement of the block
+    means of the frames with the block means of the masks (exactly for 
+    frames constant over the blocks, approximately for smooth ones). The
+    block means are floating point (float32 for integer and boolean inputs,
+    e.g., the binary masks become fractional ones).
+    '''
+    (h, w) = x.shape[:2]
+    (ph, pw) = (-h % factor, -w % factor)
+    if ph or pw:
+        x = np.pad(x, [(0, ph), (0, pw)] + [(0, 0)]*(x.ndim-2), mode='edge')
+    (h, w) = x.shape[:2]
+    x = x.reshape(h//factor, factor, w//factor, factor, *x.shape[2:])
+    return x.mean(axis=(1, 3), dtype=np.result_type(x.dtype, np.float32))
+
+def pyramid_up(x, shape):
+    '''
+    Bilinear upsampling of the images `x` (h x w x ...) to the size `shape`
+    (H, W), with the pixel centers aligned (as `cv2.resize`) for any number
+    of frames.
+    '''
+    for (axis, n) in enumerate(shape[:2]):
+        m = x.shape[axis]
+        pos = np.clip((np.arange(n) + 0.5)*m/n - 0.5, 0, m-1)
+        i0 = np.floor(pos).astype(int)
+        i1 = np.minimum(i0+1, m-1)
+        wt = (pos - i0).astype(x.dtype).reshape((-1,) + (1,)*(x.ndim-axis-1))
+        x0 = np.take(x, i0, axis=axis)
+        x = x0 + wt*(np.take(x, i1, axis=axis) - x0)
+    return x
+
+class MatFile:
+    '''
+    MATLAB .mat file opened once, with the variables read as a whole or 
+    slice by slice along the last dimension (e.g., one coded measurement 
+    `meas[..., k]` at a time).
+
+    The '-v7.3' .mat files (HDF5) are read lazily with h5py, where each slice
+    is a chunked read of the dataset, while the '-v7.2' and lower versions
+    are loaded at once by `scipy.io.loadmat`. All the arrays are returned in 
+    the MATLAB (H x W x ...) layout as `np.float32(file[key], order='F').
+    transpose()` in the test scripts.
+    '''
+    def __init__(self, matfile, dtype=np.float32):
+        self.matfile = matfile
+        self.dtype = dtype
+        import h5py
+        self.h5 = h5py.is_hdf5(matfile) # MATLAB .mat v7.3
+        if self.h5:
+            self._file = h5py.File(matfile, 'r')
+        else: # MATLAB .mat v7.2 or lower versions
+            self._file = sio.loadmat(matfile)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, key):
+        return key in self._file
+
+    def close(self):
+        if self.h5:
+            self._file.close()
+
+    def shape(self, key):
+        '''
+        Shape of the variable `key` in the MATLAB layout.
+        '''
+        shape = self._file[key].shape
+        return shape[::-1] if self.h5 else shape
+
+    def nslice(self, key):
+        '''
+        Number of slices of the variable `key` along the last dimension (one
+        for a single H x W measurement).
+        '''
+        shape = self.shape(key)
+        return shape[-1] if len(shape) > 2 else 1
+
+    def load(self, key):
+        '''
+        Load the whole variable `key`.
+        '''
+        if self.h5:
+            return np.asarray(self._file[key], dtype=self.dtype, order='F').transpose()
+        return np.asarray(self._file[key], dtype=self.dtype)
+
+    def read(self, key, start, stop=None):
+        '''
+        Read the slices `start:stop` (only `start` if `stop` is None) of the
+        variable `key` along the last dimension, as an H x W (x nslice) array.
+        '''
+        if len(self.shape(key)) < 3: # single measurement
+            x = self.load(key)
+            return x if stop is None else x[...,None]
+        idx = start if stop is None else slice(start, stop)
+        if self.h5: # the first dimension of the HDF5 dataset
+            return np.ascontiguousarray(np.asarray(self._file[key][idx], 
+                                        dtype=self.dtype).transpose())
+        return np.ascontiguousarray(self._file[key][...,idx], dtype=self.dtype)
+
+    def slices(self, key, size=1, start=0, stop=None):
+        '''
+        Generator of (k, x_k) with the slices `x_k` of the variable `key` of 
+        `size` along the last dimension (H x W for `size=1`), from `start` 
+        up to `stop`.
+        '''
+        stop = self.nslice(key) if stop is None else min(stop, self.nslice(key))
+        for k in range(start, stop, size):
+            yield k, self.read(key, k, None if size == 1 else min(k+size, stop))
+
+# source files of the solvers, hashed into the code version of the cache keys
+_SOLVER_SOURCES = ('utils.py', 'pnp_sci_algo.py', 'joint_pnp_sci_algo.py',
+                   'denoisers.py', 'tv_denoisers.py')
+
+def code_version():
+    '''
+    Content hash of the source files of the solvers, changing whenever the
+    code of the solvers or the denoisers changes.
+    '''
+    h = hashlib.sha1()
+    srcdir = os.path.dirname(os.path.abspath(__file__))
+    for fname in _SOLVER_SOURCES:
+        fpath = os.path.join(srcdir, fname)
+        if os.path.exists(fpath):
+            with open(fpath, 'rb') as f:
+                h.update(f.read())
+    return h.hexdigest()
+
+def _update_digest(h, value):
+    '''
+    Update the hash `h` with the content of `value`, i.e., the bytes of the
+    arrays (and tensors), the parameters of the models (with `state_dict`), 
+    the backend and the file or the weights of the frozen denoisers (see 
+    `inference.FrozenDenoiser`), the `repr` of the data types and of the 
+    other values, and only the type of the `callback` (not affecting the 
+    results). Other callables cannot be identified by their content, for 
+    which a TypeError is raised instead of colliding keys.
+    '''
+    if isinstance(value, dict):
+        for key in sorted(value, key=str):
+            h.update(repr(key).encode())
+            if key == 'callback': # profiling hooks, not affecting the results
+                h.update(type(value[key]).__name__.encode())
+            else:
+                _update_digest(h, value[key])
+    elif isinstance(value, (list, tuple)):
+        h.update('{}{}'.format(type(value).__name__, len(value)).encode())
+        for val in value:
+            _update_digest(h, val)
+    elif hasattr(value, 'state_dict'): # model, hashed by its parameters
+        _update_digest(h, value.state_dict())
+    elif hasattr(value, 'detach'): # tensor
+        _update_digest(h, value.detach().cpu().numpy())
+    elif hasattr(value, 'backend') and hasattr(value, 'source'): # frozen denoiser
+        h.update(repr(value.backend).encode())
+        if isinstance(value.source, str) and os.path.isfile(value.source):
+            with open(value.source, 'rb') as f: # exported file
+                h.update(f.read())
+        elif value.source is None:
+            raise TypeError('{} denoiser without source cannot be hashed.'.format(value.backend))
+        else: # weights (and calibration samples)
+            _update_digest(h, value.source)
+    elif isinstance(value, np.dtype) or (isinstance(value, type) and issubclass(value, np.generic)):
+        h.update(np.dtype(value).str.encode())
+    elif isinstance(value, DtypePolicy):
+        h.update(repr(value).encode())
+    elif callable(value):
+        raise TypeError('{} cannot be hashed by its content.'.format(type(value).__name__))
+    elif isinstance(value, np.ndarray):
+        h.update('{}{}'.format(value.dtype, value.shape).encode())
+        h.update(np.ascontiguousarray(value).data)
+    else:
+        h.update(repr(value).encode())
+
+class StageCache:
+    '''
+    Content-addressed disk cache of the results of the solver stages (e.g., 
+    the first-period GAP-TV of the joint solvers), keyed on a content hash of
+    the measurements, the masks, the solver parameters and the code version 
+    (see `code_version`), so that the identical stages of a parameter sweep
+    are reconstructed only once, even across processes.
+
+    Each entry is an .npz file in `cachedir`. The least recently used entries
+    are evicted as soon as the total size exceeds `max_bytes`.
+    '''
+    def __init__(self, cachedir='./results/cache', max_bytes=2**30):
+        self.cachedir = cachedir
+        self.max_bytes = max_bytes
+        self.version = code_version()
+        os.makedirs(cachedir, exist_ok=True)
+
+    def key(self, *values, **params):
+        '''
+        Content hash of the arrays `values` and the parameters `params`, 
+        raising a TypeError for the parameters that cannot be hashed by their
+        content (see `_update_digest`).
+        '''
+        h = hashlib.sha1(self.version.encode())
+        _update_digest(h, values)
+        _update_digest(h, params)
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cachedir, key + '.npz')
+
+    def load(self, key):
+        '''
+        Load the entry `key` as a dict of arrays, or None if not cached.
+        '''
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                entry = {name: data[name] for name in data.files}
+            os.utime(path) # mark as recently used
+        except (OSError, ValueError): # not cached or evicted meanwhile
+            return None
+        return entry
+
+    def save(self, key, **arrays):
+        '''
+        Save the `arrays` as the entry `key` and evict the least recently
+        used entries beyond the size cap.
+        '''
+        tmppath = self._path(key) + '.{}.tmp.npz'.format(os.getpid())
+        np.savez(tmppath, **arrays)
+        os.replace(tmppath, self._path(key)) # atomic for concurrent sweeps
+        self.evict()
+
+    def evict(self):
+        '''
+        Remove the least recently used entries until the total size of the
+        cache fits in `max_bytes`.
+        '''
+        entries = []
+        for fname in os.listdir(self.cachedir):
+            if fname.endswith('.npz') and not fname.endswith('.tmp.npz'):
+                try:
+                    st = os.stat(os.path.join(self.cachedir, fname))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, fname))
+        total = sum(size for (_, size, _) in entries)
+        for (_, size, fname) in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cachedir, fname))
+            except OSError:
+                pass
+            total -= size
+
 def psnr(ref, img):
     '''
     Peak signal-to-noise ratio (PSNR).
@@ -42,6 +1412,7 @@ def show_n_save_res(vdenoise,tdenoise,psnr_denoise,ssim_denoise,psnrall_denoise,
                     save_name, iframe=0, nframe=1, MAXB=255, show_res_flag=1, save_res_flag=1, **kwargs):
     # show res
     if show_res_flag:
+        import matplotlib.pyplot as plt
         # setting
         col_num = Cr//2
         fig_sz = (12, 6.5)
@@ -126,6 +1497,7 @@ def show_n_save_res(vdenoise,tdenoise,psnr_denoise,ssim_denoise,psnrall_denoise,
 
 # save results to images
 def save_rgb_img(img, save_dir, prefix='img', save_format='.jpg', rescale_ch=False):
+    import cv2
     img_num = img.shape[-1]
         
     if not os.path.exists(save_dir):
@@ -150,7 +1522,13 @@ def cli_run(script_name, orig_name, scale, Cr, mask_name, test_algo_flag,
             root_dir = '.', result_path='/results/tmp', iframe=0, nframe=1, MAXB=255,
             show_res_flag=0, save_res_flag=0, log_result_flag=0,
             gaussian_noise_level=0, poisson_noise=0, gamma=0,
-            tv_weight=None, iter_max1=0, sigma1=0, iter_max2=[0], sigma2=[0]):
+            tv_weight=None, iter_max1=0, sigma1=0, iter_max2=[0], sigma2=[0],
+            cache_dir=None, startup_report_flag=0):
+    '''
+    Run the script `script_name` for a single configuration in a new Python
+    process (see `sweep.run_sweep` for the in-process sweeps), printing its
+    startup time (see `startup_report`) with `startup_report_flag`.
+    '''
 
     command_str = ('python {} \
         --orig_name {} \
@@ -175,10 +1553,16 @@ def cli_run(script_name, orig_name, scale, Cr, mask_name, test_algo_flag,
         '--iter_max2 ' + (' {} '*len(iter_max2)) +
         '--sigma2 ' + (' {:.4f} '*len(sigma2))).format(script_name, orig_name, scale, Cr, mask_name, test_algo_flag, root_dir, result_path, iframe, nframe, MAXB,
                 show_res_flag, save_res_flag, log_result_flag, gaussian_noise_level, poisson_noise, gamma, tv_weight, iter_max1, sigma1, *iter_max2, *sigma2)
+    if cache_dir is not None: # stage cache shared by the runs
+        command_str += ' --cache_dir {}'.format(cache_dir)
+    if startup_report_flag:
+        command_str += ' --startup_report_flag 1'
         
     print(command_str)
     os.system(command_str)
     
 def rescale(data):
     _range = np.max(data) - np.min(data)
-    return (data - np.min(data)) / _range
\ No newline at end of file
+    return (data - np.min(data)) / _range
+
+record_import(__name__, _t0)
@@ -6,7 +6,11 @@ import datetime
 import os
 import numpy as np
 import argparse
-from utils import compare_ssim, compare_psnr
+from utils import ssim
+import sys
+# shared image quality assessment of the SCI models (in `[utils]` of the repo)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '[utils]'))
+from sci_metrics import psnr
 
 if not torch.cuda.is_available():
     raise Exception('NO GPU!')
@@ -78,11 +82,9 @@ def test(test_path, epoch, result_path, model, args):
                 out_pic1 = model(meas_re[ii:ii + 1, ::], args)
                 out_pic1 = out_pic1[0, ::]
                 out_save1[ii, :, :, :] = out_pic1[0, :, :, :]
-                for jj in range(args.B):
-                    out_pic_CNN = out_pic1[0, jj, :, :]
-                    gt_t = pic_gt[ii, jj, :, :]
-                    psnr_1 += compare_psnr(gt_t.cpu().numpy() * 255, out_pic_CNN.cpu().numpy() * 255)
-                    ssim_1 += compare_ssim(gt_t.cpu().numpy() * 255, out_pic_CNN.cpu().numpy() * 255)
+                # frame-wise PSNR and SSIM of all the B frames at once on the GPU
+                psnr_1 += psnr(pic_gt[ii] * 255, out_pic1[0] * 255, 255.).sum().item()
+                ssim_1 += ssim(pic_gt[ii] * 255, out_pic1[0] * 255).sum().item()
 
             psnr_cnn[i] = psnr_1 / (meas.shape[0] * args.B)
             ssim_cnn[i] = ssim_1 / (meas.shape[0] * args.B)
@@ -14,8 +14,10 @@ import argparse
 import random
 from torch.autograd import Variable
 from tqdm import tqdm
-from skimage.metrics import peak_signal_noise_ratio as compare_psnr
-from skimage.metrics import structural_similarity as compare_ssim
+import sys
+# shared image quality assessment of the SCI models (in `[utils]` of the repo)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '[utils]'))
+from sci_metrics import (psnr, ssim)
 
 os.environ['CUDA_VISIBLE_DEVICES'] = '0'
 n_gpu = torch.cuda.device_count()
@@ -93,11 +95,10 @@ def test(test_path, epoch, result_path, model, args):
                 out_pic1 = model(meas_re[ii:ii + 1, ::], args)
                 out_pic1 = out_pic1[0, ::]
                 out_save1[ii, :, :, :] = out_pic1[0, :, :, :]
-                for jj in range(args.B):
-                    out_pic_CNN = out_pic1[0, jj, :, :]
-                    gt_t = pic_gt[ii, jj, :, :]
-                    psnr_1 += compare_psnr(gt_t.cpu().numpy(), out_pic_CNN.cpu().numpy())
-                    ssim_1 += compare_ssim(gt_t.cpu().numpy(), out_pic_CNN.cpu().numpy())
+                # frame-wise PSNR and SSIM of all the B frames at once on the GPU, with
+                # the data ranges skimage assumes for float images (1 and 2)
+                psnr_1 += psnr(pic_gt[ii], out_pic1[0], 1.).sum().item()
+                ssim_1 += ssim(pic_gt[ii], out_pic1[0], 2.).sum().item()
 
             psnr_cnn[i] = psnr_1 / (meas.shape[0] * args.B)
             ssim_cnn[i] = ssim_1 / (meas.shape[0] * args.B)
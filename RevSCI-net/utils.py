@@ -1,8 +1,12 @@
 import torch
 import scipy.io as scio
 import numpy as np
-import cv2
-import math
+import os
+import sys
+
+# shared image quality assessment of the SCI models (in `[utils]` of the repo)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '[utils]'))
+import sci_metrics
 
 
 def generate_masks(mask_path):
@@ -34,26 +38,10 @@ def time2file_name(time):
 
 
 def ssim(img1, img2):
-    C1 = (0.01 * 255) ** 2
-    C2 = (0.03 * 255) ** 2
-
-    img1 = img1.astype(np.float64)
-    img2 = img2.astype(np.float64)
-    kernel = cv2.getGaussianKernel(11, 1.5)
-    window = np.outer(kernel, kernel.transpose())
-
-    mu1 = cv2.filter2D(img1, -1, window)[5:-5, 5:-5]  # valid
-    mu2 = cv2.filter2D(img2, -1, window)[5:-5, 5:-5]
-    mu1_sq = mu1 ** 2
-    mu2_sq = mu2 ** 2
-    mu1_mu2 = mu1 * mu2
-    sigma1_sq = cv2.filter2D(img1 ** 2, -1, window)[5:-5, 5:-5] - mu1_sq
-    sigma2_sq = cv2.filter2D(img2 ** 2, -1, window)[5:-5, 5:-5] - mu2_sq
-    sigma12 = cv2.filter2D(img1 * img2, -1, window)[5:-5, 5:-5] - mu1_mu2
-
-    ssim_map = ((2 * mu1_mu2 + C1) * (2 * sigma12 + C2)) / ((mu1_sq + mu2_sq + C1) *
-                                                            (sigma1_sq + sigma2_sq + C2))
-    return ssim_map.mean()
+    '''SSIM of the images (or the stacks of images ... x H x W) in [0, 255],
+    with the Gaussian window of MATLAB (see `sci_metrics.ssim`)
+    '''
+    return sci_metrics.ssim(img1, img2, 255., mode='matlab')
 
 
 def compare_ssim(img1, img2):
@@ -66,13 +54,8 @@ def compare_ssim(img1, img2):
     if img1.ndim == 2:
         return ssim(img1, img2)
     elif img1.ndim == 3:
-        if img1.shape[2] == 3:
-            ssims = []
-            for i in range(3):
-                ssims.append(ssim(img1, img2))
-            return np.array(ssims).mean()
-        elif img1.shape[2] == 1:
-            return ssim(np.squeeze(img1), np.squeeze(img2))
+        if img1.shape[2] in (1, 3):
+            return sci_metrics.ssim(img1, img2, 255., mode='matlab', channel_axis=2)
 
 
 
@@ -80,8 +63,7 @@ def compare_psnr(img1, img2, shave_border=0):
     height, width = img1.shape[:2]
     img1 = img1[shave_border:height - shave_border, shave_border:width - shave_border]
     img2 = img2[shave_border:height - shave_border, shave_border:width - shave_border]
-    imdff = img1 - img2
-    rmse = math.sqrt(np.mean(imdff ** 2))
-    if rmse == 0:
+    psnr = sci_metrics.psnr(img1, img2, 255., channel_axis=2 if img1.ndim == 3 else None)
+    if np.isinf(psnr):
         return 100
-    return 20 * math.log10(255.0 / rmse)
+    return psnr
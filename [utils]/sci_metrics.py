@@ -0,0 +1,253 @@
+''' Vectorized image quality assessment (PSNR, SSIM and MS-SSIM) of the SCI models
+
+The metrics are calculated at once over whole stacks of images, i.e., over the
+last two (spatial) axes H x W of arrays of any leading shape, e.g., B x F x H x W
+reconstructions, either NumPy arrays or torch tensors (on their own device,
+without moving them to the host). They reproduce the numbers reported by the
+SCI models, i.e., the `mode` of the SSIM selects
+
+  'skimage' : `skimage.metrics.structural_similarity` with its default
+              parameters (uniform 7 x 7 window, sample covariance), as used by
+              PnP-SCI, BIRNAT and MetaSCI,
+  'matlab'  : the MATLAB implementation of Wang et al. (Gaussian 11 x 11
+              window with standard deviation 1.5, valid region), as used by
+              RevSCI-net.
+
+Usage (from the model folders):
+
+    import os, sys
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '[utils]'))
+    from sci_metrics import (psnr, ssim, ms_ssim)
+'''
+import numpy as np
+from scipy.ndimage import correlate1d
+
+# weights of the five scales of the MS-SSIM (Wang et al., 2003)
+MS_SSIM_WEIGHTS = (0.0448, 0.2856, 0.3001, 0.2363, 0.1333)
+
+def _is_tensor(x):
+    return type(x).__module__.split('.')[0] == 'torch'
+
+def _gaussian(win_size, sigma):
+    '''
+    Normalized 1-D Gaussian window (as MATLAB's `fspecial`).
+    '''
+    t = np.arange(win_size) - (win_size-1)/2
+    g = np.exp(-t**2/(2*sigma**2))
+    return g/g.sum()
+
+def _window(mode, win_size=None):
+    '''
+    1-D (separable) window and covariance normalization of the SSIM `mode`.
+    '''
+    if mode == 'skimage':
+        win_size = win_size or 7
+        return np.ones(win_size)/win_size, win_size**2/(win_size**2-1)
+    if mode == 'matlab':
+        win_size = win_size or 11
+        return _gaussian(win_size, 1.5*win_size/11), 1.
+    raise ValueError('Unsupported SSIM mode {}!'.format(mode))
+
+def _channels_first(x, y, channel_axis):
+    '''
+    Move the `channel_axis` of the color images in front of H x W.
+    '''
+    if channel_axis is None:
+        return x, y
+    if _is_tensor(x):
+        return x.movedim(channel_axis, -3), y.movedim(channel_axis, -3)
+    return np.moveaxis(x, channel_axis, -3), np.moveaxis(y, channel_axis, -3)
+
+def _as_float(x, y):
+    '''
+    Floating-point copies of the images (double precision on the host, the
+    floating-point type of the tensors on their device).
+    '''
+    if x.shape != y.shape:
+        raise ValueError('Input images must have the same dimensions.')
+    if _is_tensor(x):
+        dtype = x.dtype if x.is_floating_point() else y.dtype if y.is_floating_point() else None
+        if dtype is None:
+            import torch
+            dtype = torch.float32
+        return x.to(dtype), y.to(dtype)
+    return np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+
+def _stack(arrays):
+    if _is_tensor(arrays[0]):
+        import torch
+        return torch.stack(arrays)
+    return np.stack(arrays)
+
+def _filter_valid(x, win):
+    '''
+    Separable correlation of the images `x` (... x H x W) with the 1-D window
+    `win` along both spatial axes, keeping the valid region only.
+    '''
+    n = len(win)
+    if _is_tensor(x):
+        import torch.nn.functional as F
+        shape = x.shape
+        w = x.new_tensor(win)
+        x = x.reshape(-1, 1, shape[-2], shape[-1])
+        x = F.conv2d(F.conv2d(x, w.view(1, 1, n, 1)), w.view(1, 1, 1, n))
+        return x.reshape(shape[:-2] + x.shape[-2:])
+    (h, w) = x.shape[-2:]
+    x = correlate1d(x, win, axis=-2)[..., n//2:h-n+1+n//2, :]
+    x = correlate1d(x, win, axis=-1)[..., n//2:w-n+1+n//2]
+    return x
+
+def _ssim_maps(x, y, data_range, win, cov_norm, K1=0.01, K2=0.03):
+    '''
+    SSIM and contrast-structure maps of the floating-point images `x` and
+    `y`, filtering the five moments at once.
+    '''
+    if min(x.shape[-2:]) < len(win):
+        raise ValueError('Images of {} x {} are smaller than the {} x {} window.'
+                         .format(*x.shape[-2:], len(win), len(win)))
+    C1 = (K1*data_range)**2
+    C2 = (K2*data_range)**2
+    (ux, uy, uxx, uyy, uxy) = _filter_valid(_stack([x, y, x*x, y*y, x*y]), win)
+    vx  = cov_norm*(uxx - ux*ux)
+    vy  = cov_norm*(uyy - uy*uy)
+    vxy = cov_norm*(uxy - ux*uy)
+    cs = (2*vxy + C2)/(vx + vy + C2)
+    return (2*ux*uy + C1)/(ux*ux + uy*uy + C1)*cs, cs
+
+def _spatial_mean(x, channels=False):
+    '''
+    Mean over the spatial axes (and the channels) of each image.
+    '''
+    axes = (-3, -2, -1) if channels else (-2, -1)
+    if _is_tensor(x):
+        return x.mean(dim=axes)
+    return x.mean(axis=axes)[()]
+
+def psnr(ref, img, data_range=1., channel_axis=None):
+    '''
+    Peak signal-to-noise ratio (PSNR) of each image of the stack `img`
+    (... x H x W) with respect to the reference `ref`.
+
+    Parameters
+    ----------
+    ref, img : ndarray or torch.Tensor
+        Reference and distorted images of the same shape.
+    data_range : float
+        Peak value (dynamic range) of the images, e.g., 1. or 255.
+    channel_axis : int, optional
+        Axis of the channels of color images, pooled into the MSE of each image.
+
+    Returns
+    -------
+    psnr : ndarray or torch.Tensor
+        PSNR (dB) of each image, of the leading shape of the stack (a scalar
+        for a single image), infinite for identical images.
+    '''
+    (ref, img) = _as_float(*_channels_first(ref, img, channel_axis))
+    mse = _spatial_mean((ref - img)**2, channel_axis is not None)
+    if _is_tensor(mse):
+        return 10*(data_range**2/mse).log10()
+    with np.errstate(divide='ignore'):
+        return 10*np.log10(data_range**2/mse)
+
+def ssim(ref, img, data_range=1., mode='skimage', win_size=None, channel_axis=None):
+    '''
+    Structural similarity (SSIM) index of each image of the stack `img`
+    (... x H x W) with respect to the reference `ref`.
+
+    Parameters
+    ----------
+    ref, img : ndarray or torch.Tensor
+        Reference and distorted images of the same shape.
+    data_range : float
+        Dynamic range of the images, e.g., 1. or 255.
+    mode : {'skimage', 'matlab'}
+        Implementation to reproduce (see the module docstring).
+    win_size : int, optional
+        Side length of the window (7 for 'skimage', 11 for 'matlab').
+    channel_axis : int, optional
+        Axis of the channels of color images, averaged into the SSIM of each
+        image.
+
+    Returns
+    -------
+    ssim : ndarray or torch.Tensor
+        Mean SSIM of each image, of the leading shape of the stack (a scalar
+        for a single image).
+    '''
+    (ref, img) = _as_float(*_channels_first(ref, img, channel_axis))
+    (win, cov_norm) = _window(mode, win_size)
+    (ssim_map, _) = _ssim_maps(ref, img, data_range, win, cov_norm)
+    return _spatial_mean(ssim_map, channel_axis is not None)
+
+def _downsample(x):
+    '''
+    2 x 2 average filtering (with symmetric boundaries) and downsampling by two
+    of the images `x` (... x H x W), as the MATLAB MS-SSIM.
+    '''
+    (h, w) = x.shape[-2:]
+    if _is_tensor(x):
+        import torch.nn.functional as F
+        shape = x.shape
+        x = F.pad(x.reshape(-1, 1, h, w), (0, w % 2, 0, h % 2), mode='replicate')
+        x = F.avg_pool2d(x, 2)
+        return x.reshape(shape[:-2] + x.shape[-2:])
+    if h % 2 or w % 2:
+        pad = [(0, 0)]*(x.ndim-2) + [(0, h % 2), (0, w % 2)]
+        x = np.pad(x, pad, mode='edge')
+    (h, w) = x.shape[-2:]
+    return x.reshape(x.shape[:-2] + (h//2, 2, w//2, 2)).mean(axis=(-3, -1))
+
+def ms_ssim(ref, img, data_range=1., weights=MS_SSIM_WEIGHTS, channel_axis=None):
+    '''
+    Multi-scale structural similarity (MS-SSIM) index (Wang et al., 2003) of
+    each image of the stack `img` (... x H x W) with respect to the
+    reference `ref`, with the Gaussian window of the MATLAB implementation
+    shrunk at the scales smaller than it.
+
+    Parameters
+    ----------
+    ref, img : ndarray or torch.Tensor
+        Reference and distorted images of the same shape.
+    data_range : float
+        Dynamic range of the images, e.g., 1. or 255.
+    weights : sequence of floats
+        Weights of the scales (five scales of Wang et al. by default).
+    channel_axis : int, optional
+        Axis of the channels of color images, averaged at each scale.
+
+    Returns
+    -------
+    ms_ssim : ndarray or torch.Tensor
+        MS-SSIM of each image, of the leading shape of the stack (a scalar for
+        a single image).
+    '''
+    (ref, img) = _as_float(*_channels_first(ref, img, channel_axis))
+    channels = channel_axis is not None
+    nscale = len(weights)
+    res = 1.
+    for iscale in range(nscale):
+        (win, cov_norm) = _window('matlab', min(11, *ref.shape[-2:]))
+        (ssim_map, cs_map) = _ssim_maps(ref, img, data_range, win, cov_norm)
+        if iscale < nscale-1:
+            res = res * _spatial_mean(cs_map, channels)**weights[iscale]
+            (ref, img) = (_downsample(ref), _downsample(img))
+        else:
+            res = res * _spatial_mean(ssim_map, channels)**weights[iscale]
+    return res
+
+def frame_iqa(ref, img, data_range=1., mode='skimage', color=False):
+    '''
+    Frame-wise PSNR and SSIM of the video `img` in the frame-last layout of
+    PnP-SCI, i.e., H x W x nmask (H x W x C x nmask for `color` videos), or of
+    a batch of videos (B x H x W x nmask), as lists (lists of lists).
+    '''
+    axis = -4 if color else -3
+    channel_axis = -1 if color else None
+    if _is_tensor(img):
+        (ref, img) = (ref.movedim(-1, axis), img.movedim(-1, axis))
+    else:
+        (ref, img) = (np.moveaxis(ref, -1, axis), np.moveaxis(img, -1, axis))
+    psnr_ = psnr(ref, img, data_range, channel_axis)
+    ssim_ = ssim(ref, img, data_range, mode, channel_axis=channel_axis)
+    return psnr_.tolist(), ssim_.tolist()